@@ -0,0 +1,655 @@
+#!/usr/bin/python3
+# coding=utf-8
+#
+# Mediensteuerung fuer KODI mit asyncio über den JSON-RPC TCP Kanal (Port 9090)
+
+import sys
+import json
+import codecs
+import asyncio
+import logging
+import threading
+import concurrent.futures
+from time import time
+from KodiControl import KodiException, KodiControl
+from KodiNotify import KodiNotifyThread
+from KodiRequest import KodiRequestBuilder
+from KodiResponse import KodiResponse
+from ProcessSupervisor import ProcessSupervisor
+
+__author__ = 'Dirk'
+__copyright__ = 'Copyright 2017'
+__license__ = 'GPL'
+__version__ = '0.1'
+
+
+class AsyncKodiControl:
+    """
+    asyncio Variante von KodiControl mit denselben Methoden (als Coroutinen) und denselben Rückgaben.
+    Alle Anfragen laufen über eine TCP Verbindung, jede bekommt eine eigene id,
+    die Antworten werden über die id ihrem Future zugeordnet. So können mehrere
+    Anfragen gleichzeitig unterwegs sein und einzeln abgebrochen werden.
+    Synchroner Code (MainObject) startet die Coroutinen mit submit() oder call() in der Eventloop eines Threads.
+    """
+    DEFAULT_PORT = KodiNotifyThread.DEFAULT_PORT
+    # Timeouts in Sekunden
+    CONNECT_TIMEOUT = 3
+    REQUEST_TIMEOUT = 5
+    # call(): Wartezeit auf eine Coroutine mit mehreren Anfragen (z.B. player_all_stop)
+    CALL_TIMEOUT = 3 * REQUEST_TIMEOUT
+    RECV_SIZE = 4096
+
+    def __init__(self, logger, host="localhost", port=DEFAULT_PORT, timeout=REQUEST_TIMEOUT, supervisor=None):
+        """
+        Konstruktor
+        :param logger: Programmlogger
+        :param host: Host, auf dem KODI läuft
+        :param port: TCP Port der JSON-RPC Schnittstelle
+        :param timeout: Standard Timeout je Anfrage in Sekunden
+        :param supervisor: ProcessSupervisor für den KODI (z.B. von KodiControl) oder None für einen eigenen
+        """
+        self.log = logger
+        self.kodiHost = host
+        self.kodiPort = port
+        self.timeout = timeout
+        self.reader = None
+        self.writer = None
+        self.readTask = None
+        self.connectLock = None
+        self.pending = {}
+        self.requestBuilder = KodiRequestBuilder()
+        self.decoder = json.JSONDecoder()
+        self.playerStartTime = int(0)
+        self.jsonVersion = None
+        self.callBackNotify = None
+        self.supervisor = supervisor
+        if self.supervisor is None:
+            self.supervisor = ProcessSupervisor(self.log, KodiControl.mediaPlayerName)
+        self.loop = None
+        self.loopThread = None
+        self.log.debug("init async, %s:%d..." % (self.kodiHost, self.kodiPort))
+
+    def set_on_notify(self, callback):
+        """
+        Callback für Notifications, die über dieselbe Verbindung kommen
+        :param callback: Funktion mit (methode, data)
+        :return: None
+        """
+        self.callBackNotify = callback
+
+    async def connect(self):
+        """
+        Verbindung aufbauen (wird bei Bedarf von send_request gemacht)
+        :return: Erfolgreich?
+        """
+        if self.connectLock is None:
+            self.connectLock = asyncio.Lock()
+        async with self.connectLock:
+            if self.writer is not None:
+                return True
+            try:
+                self.reader, self.writer = await asyncio.wait_for(
+                    asyncio.open_connection(self.kodiHost, self.kodiPort), AsyncKodiControl.CONNECT_TIMEOUT)
+            except (OSError, asyncio.TimeoutError) as msg:
+                self.log.error("can't connect to kodi %s:%d: %s" % (self.kodiHost, self.kodiPort, msg))
+                return False
+            self.readTask = asyncio.ensure_future(self.__read_loop(self.reader))
+            self.log.debug("async connection to kodi established...")
+            return True
+
+    async def close(self):
+        """Verbindung schliessen, offene Anfragen enden mit KodiException"""
+        writer = self.writer
+        self.writer = None
+        self.reader = None
+        if self.readTask is not None:
+            self.readTask.cancel()
+            self.readTask = None
+        if writer is not None:
+            writer.close()
+        self.__fail_pending("connection closed")
+
+    def __fail_pending(self, reason):
+        """
+        privat, alle offenen Anfragen mit Fehler beenden
+        :param reason: Grund
+        :return: None
+        """
+        pending = self.pending
+        self.pending = {}
+        for future in pending.values():
+            if not future.done():
+                future.set_exception(KodiException(reason))
+
+    async def __read_loop(self, reader):
+        """
+        privat, Antworten und Notifications lesen und verteilen
+        :param reader: StreamReader der Verbindung
+        :return: None
+        """
+        buffer = ''
+        # Umlaute können auf zwei Blöcke verteilt sein
+        text_decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        try:
+            while True:
+                data = await reader.read(AsyncKodiControl.RECV_SIZE)
+                if not data:
+                    break
+                buffer += text_decoder.decode(data)
+                messages, buffer = KodiNotifyThread.parse_messages(self.decoder, buffer, self.log)
+                for message in messages:
+                    self.__dispatch(message)
+        except asyncio.CancelledError:
+            return
+        except OSError as msg:
+            self.log.error("error while read from kodi: %s" % msg)
+        # Verbindung ist weg
+        if self.reader is reader:
+            self.log.warning("async connection to kodi lost...")
+            self.writer = None
+            self.reader = None
+            self.readTask = None
+            self.__fail_pending("connection lost")
+
+    def __dispatch(self, message):
+        """
+        privat, Antwort dem wartenden Future zuordnen oder Notification weitergeben
+        :param message: JSON Objekt
+        :return: None
+        """
+        if not isinstance(message, dict):
+            return
+        if 'id' in message and message['id'] is not None:
+            future = self.pending.pop(message['id'], None)
+            if future is None or future.done():
+                # abgebrochene oder abgelaufene Anfrage
+                self.log.debug("answer for unknown id %s" % str(message['id']))
+                return
+            future.set_result(KodiResponse.from_message(message))
+            return
+        if 'method' in message and self.callBackNotify is not None:
+            self.callBackNotify(message['method'], message.get('params', {}).get('data'))
+
+    async def send_request_json(self, method, params=None, timeout=None):
+        """
+        Sende ein Kommando an KODI und warte auf die Antwort
+        Wird die aufrufende Task abgebrochen, wird auch die Anfrage vergessen
+        :param method: JSON-RPC Methode
+        :param params: Parameter als Dictonary oder None
+        :param timeout: Timeout in Sekunden oder None für den Standard
+        :return: KodiResponse (result oder error)
+        """
+        if not await self.connect():
+            return KodiResponse.failure("connection error")
+        req_id, data = self.requestBuilder.build(method, params)
+        future = asyncio.get_running_loop().create_future()
+        self.pending[req_id] = future
+        try:
+            self.writer.write(data)
+            await self.writer.drain()
+            response = await asyncio.wait_for(future, self.timeout if timeout is None else timeout)
+        except asyncio.TimeoutError:
+            self.log.error("timeout while %s (id %d)" % (method, req_id))
+            return KodiResponse.failure("timeout while %s" % method, req_id)
+        except (OSError, KodiException) as msg:
+            self.log.error("error while %s: %s" % (method, msg))
+            return KodiResponse.failure("request error %s" % str(msg), req_id)
+        finally:
+            self.pending.pop(req_id, None)
+        if not response.is_ok():
+            self.log.error('request error: \"%s\"' % str(response.error))
+        return response
+
+    async def is_kodi_running(self):
+        """
+        Läuft KODI (Prozess über den ProcessSupervisor, ohne die Eventloop zu blockieren)
+        :return: True, wenn ja
+        """
+        return await asyncio.get_running_loop().run_in_executor(None, self.supervisor.is_running)
+
+    async def app_start_kodi(self):
+        """
+        Starte KODI
+        :return: Erfolgreich?
+        """
+        loop = asyncio.get_running_loop()
+        self.jsonVersion = None
+        for timer_val in range(20):
+            self.log.debug("kodi not running yet...Try to start (%d)" % int(timer_val))
+            pid_kodi = self.supervisor.spawn(KodiControl.mediaPlayerExec, KodiControl.mediaPlayerParam)
+            self.log.debug("kodi starting with pid %d" % int(pid_kodi))
+            # stirbt der Prozess gleich wieder, sofort neu versuchen
+            if await loop.run_in_executor(None, self.supervisor.wait_exit, 5):
+                self.log.warning("kodi exits while starting...")
+                continue
+            if await self.is_kodi_running():
+                self.log.info("kodi should started...")
+                return True
+        return False
+
+    async def app_quit_kodi(self):
+        """
+        Beende KODI
+        :return: Erfolgreich?
+        """
+        self.log.info("quit kodi...")
+        loop = asyncio.get_running_loop()
+        # gewolltes Ende, nicht als Absturz melden
+        self.supervisor.stop_watch()
+        self.jsonVersion = None
+        await self.is_kodi_running()
+        self.log.debug("result from quit kommando: %s " % str(await self.send_request_json("Application.Quit")))
+        await loop.run_in_executor(None, self.supervisor.wait_exit, 2)
+        for signal_name, wait_time in (('-SIGTERM', 1.2), ('-SIGKILL', 0)):
+            if not await self.is_kodi_running():
+                break
+            # zur Sicherheit beenden, wenn quit nicht klappt
+            self.log.warning("kodi is always run, try system %s..." % signal_name)
+            process = await asyncio.create_subprocess_exec('/usr/bin/pkill', signal_name, 'kodi')
+            await process.wait()
+            if wait_time > 0:
+                await loop.run_in_executor(None, self.supervisor.wait_exit, wait_time)
+        return True
+
+    async def app_get_ping(self):
+        """
+        Erwarte PONG Antwort auf PING beim Kodi
+        :return: Erfolgreich?
+        """
+        return (await self.send_request_json("JSONRPC.Ping")).is_ok()
+
+    async def app_get_json_version(self):
+        """
+        Erfrage JSON API Version vom KODI (wird gemerkt)
+        :return: Version oder None
+        """
+        if self.jsonVersion is None:
+            self.jsonVersion = (await self.send_request_json("JSONRPC.Version")).value()
+        return self.jsonVersion
+
+    async def app_set_volume(self, volume=int(50)):
+        """
+        Lautstärke des KODI setzten
+        :param volume: Lautstärke
+        :return: Antwort oder None
+        """
+        return (await self.send_request_json("Application.SetVolume", {"volume": int(volume)})).value()
+
+    async def app_get_picture_duration(self):
+        """
+        Anzeigedauer der Bilder in der Diashow lesen
+        :return: Anzeigedauer in Sekunden oder None
+        """
+        params = {"setting": "slideshow.staytime"}
+        result = (await self.send_request_json("Settings.GetSettingValue", params)).value()
+        if isinstance(result, dict) and isinstance(result.get("value"), int):
+            return result["value"]
+        return None
+
+    async def app_set_picture_duration(self, seconds):
+        """
+        Anzeigedauer der Bilder in der Diashow setzen (globale Einstellung im Profil des KODI)
+        :param seconds: Anzeigedauer in Sekunden
+        :return: Antwort von KODI oder None
+        """
+        params = {"setting": "slideshow.staytime", "value": int(seconds)}
+        return (await self.send_request_json("Settings.SetSettingValue", params)).value()
+
+    async def gui_goto_home(self):
+        """HOME Screen der GUI ansteuern"""
+        return (await self.send_request_json("Input.Home")).value()
+
+    async def gui_show_info_notification(self, title, message, timeout):
+        """Show Info in GUI"""
+        return await self.gui_show_notification(title, message, timeout, "info")
+
+    async def gui_show_warn_notification(self, title, message, timeout):
+        """Show Warnung in der GUI"""
+        return await self.gui_show_notification(title, message, timeout, "warning")
+
+    async def gui_show_err_notification(self, title, message, timeout):
+        """Show Fehlermeldung in der GUI"""
+        return await self.gui_show_notification(title, message, timeout, "error")
+
+    async def gui_show_notification(self, title, message, timeout, m_type):
+        """
+        Zeige eine Nachricht vom Typ m_type in der GUI an
+        :param title: Titel der Nachricht
+        :param message: die Nachricht selber
+        :param timeout: Anzeigedauer
+        :param m_type: Typ der Nachricht
+        :return: Antwort vom KODI oder None
+        """
+        params = {"title": title, "message": message, "image": m_type, "displaytime": int(timeout)}
+        return (await self.send_request_json("GUI.ShowNotification", params)).value()
+
+    async def player_get_players(self, which="all"):
+        """
+        Welche Player vom Typ which gibt es
+        :param which: Typ der Player
+        :return: Playerliste oder None
+        """
+        return (await self.send_request_json("Player.GetPlayers", {"media": which})).value()
+
+    async def player_get_playing(self):
+        """
+        Welche Player spielen Medien ab?
+        :return: Liste der Player oder None
+        """
+        result = (await self.send_request_json("Player.GetActivePlayers")).value()
+        if isinstance(result, list):
+            return result
+        return None
+
+    def player_get_play_time(self):
+        """
+        Spielzeit seit dem letzten Öffnen
+        :return: Spielzeit in Sekunden
+        """
+        return int(time()) - self.playerStartTime
+
+    def player_is_play_time_over(self, duration):
+        """
+        Ist die Spielzeit duration schon vorbei?
+        :param duration: avisierte Spielzeit
+        :return: ist die Zeit um?
+        """
+        return int(self.playerStartTime + duration) < int(time())
+
+    async def player_ppen_playlist(self, playlistid, position=0):
+        """
+        Öffne eine Playlist mit ID
+        :param playlistid: welche Playlist öffnen?
+        :param position: ab welchem Eintrag (zum Fortsetzen)
+        :return: Erfolgreich oder None
+        """
+        self.playerStartTime = int(time())
+        params = {"item": {"playlistid": int(playlistid), "position": int(position)}}
+        return (await self.send_request_json("Player.Open", params)).value()
+
+    async def player_open_file(self, file_name):
+        """
+        öffne Mediendatei zum abspielen
+        :param file_name: dateiname der Mediendatei
+        :return: Antwort von KODI oder None
+        """
+        self.playerStartTime = int(time())
+        return (await self.send_request_json("Player.Open", {"item": {"file": file_name}})).value()
+
+    async def player_set_repeat(self, playerid, repeat="all"):
+        """
+        Wiederholung des Players setzen
+        :param playerid: id des Players
+        :param repeat: "off", "one" oder "all"
+        :return: Antwort von KODI oder None
+        """
+        params = {"playerid": int(playerid), "repeat": repeat}
+        return (await self.send_request_json("Player.SetRepeat", params)).value()
+
+    async def player_get_position(self):
+        """
+        Position des aktiven Players (zum späteren Fortsetzen)
+        :return: Dictonary mit playerid, type, playlistid, position, time (Sekunden) oder None
+        """
+        players = await self.player_get_playing()
+        if not players:
+            return None
+        player = players[0]
+        params = {"playerid": int(player["playerid"]), "properties": ["playlistid", "position", "time"]}
+        result = (await self.send_request_json("Player.GetProperties", params)).value()
+        if not isinstance(result, dict):
+            return None
+        play_time = result.get("time", {})
+        seconds = play_time.get("hours", 0) * 3600 + play_time.get("minutes", 0) * 60 + play_time.get("seconds", 0)
+        return {"playerid": player["playerid"], "type": player.get("type"), "playlistid": result.get("playlistid"),
+                "position": result.get("position"), "time": seconds}
+
+    async def player_seek_time(self, playerid, seconds):
+        """
+        Springe im Medium an eine Zeit
+        :param playerid: id des Players
+        :param seconds: Zeit in Sekunden
+        :return: Antwort von KODI oder None
+        """
+        seconds = int(seconds)
+        play_time = {"hours": seconds // 3600, "minutes": (seconds // 60) % 60, "seconds": seconds % 60,
+                     "milliseconds": 0}
+        version = await self.app_get_json_version()
+        if version is not None and int(version["version"]["major"]) >= 10:
+            # ab API 10 (KODI 18) als {"time": ...}
+            play_time = {"time": play_time}
+        params = {"playerid": int(playerid), "value": play_time}
+        return (await self.send_request_json("Player.Seek", params)).value()
+
+    async def player_stop(self, playerid):
+        """
+        Stoppe Player mit playerid
+        :param playerid: id des Players
+        :return: Antwort von KODI oder None
+        """
+        self.playerStartTime = 0
+        return (await self.send_request_json("Player.Stop", {"playerid": int(playerid)})).value()
+
+    async def player_all_stop(self):
+        """
+        Stoppe ALLE Player (gleichzeitig)
+        :return: Erfolgreich?
+        """
+        player_arr = await self.player_get_playing()
+        if player_arr is None:
+            return True
+        await asyncio.gather(*[self.player_stop(player["playerid"]) for player in player_arr])
+        self.playerStartTime = 0
+        return True
+
+    async def player_pause_toggle(self, playerid):
+        """
+        wechsle den Pausezustand des Players playerid
+        :param playerid: id des Players
+        :return: erfolg oder None
+        """
+        params = {"playerid": int(playerid), "play": "toggle"}
+        return (await self.send_request_json("Player.PlayPause", params)).value()
+
+    async def playlist_get_lists(self):
+        """
+        gib alle Playlists zurück
+        :return: Liste oder None
+        """
+        return (await self.send_request_json("Playlist.GetPlaylists")).value()
+
+    async def playlist_clear_list(self, listid):
+        """
+        Leere Playlist mit der ID listid
+        :param listid: id der Liste
+        :return: Erfolgreich oder None
+        """
+        return (await self.send_request_json("Playlist.Clear", {"playlistid": int(listid)})).value()
+
+    async def playlist_clear_all(self):
+        """
+        Leere alle Playlists (gleichzeitig)
+        :return: Erfolgreich?
+        """
+        lists = await self.playlist_get_lists()
+        if lists is None:
+            return False
+        await asyncio.gather(*[self.playlist_clear_list(play_list["playlistid"]) for play_list in lists])
+        return True
+
+    async def __playlist_of_type(self, prefix):
+        """
+        privat, id der ersten Playlist eines Typs
+        :param prefix: Typ (video, picture, audio)
+        :return: id oder None
+        """
+        lists = await self.playlist_get_lists()
+        if lists is None:
+            return None
+        for play_list in lists:
+            if play_list["type"].startswith(prefix):
+                return int(play_list["playlistid"])
+        return None
+
+    async def playlist_get_video_list(self):
+        """
+        Gib die Video Playlist zurück
+        :return: id oder None
+        """
+        return await self.__playlist_of_type("video")
+
+    async def playlist_get_picture_list(self):
+        """
+        Gib die Bilder Playliste zurück
+        :return: id oder None
+        """
+        return await self.__playlist_of_type("picture")
+
+    async def playlist_add_item(self, listid, item):
+        """
+        füge der Liste listid einen Eintrag item hinzu
+        :param listid: Liste zum zufügen
+        :param item: Eintag
+        :return: Erfolg oder None
+        """
+        params = {"item": {"file": item}, "playlistid": int(listid)}
+        return (await self.send_request_json("Playlist.Add", params)).value()
+
+    async def playlist_add_items(self, listid, items):
+        """
+        füge der Liste listid alle Einträge items mit einer Anfrage hinzu
+        :param listid: Liste zum zufügen
+        :param items: Liste der Dateien
+        :return: Erfolg oder None
+        """
+        params = {"item": [{"file": item} for item in items], "playlistid": int(listid)}
+        return (await self.send_request_json("Playlist.Add", params)).value()
+
+    def start_loop_thread(self):
+        """
+        eigene Eventloop in einem Thread starten, damit synchroner Code (MainObject)
+        Anfragen mit submit() starten kann, ohne zu blockieren
+        :return: Eventloop
+        """
+        if self.loop is None:
+            self.loop = asyncio.new_event_loop()
+            self.loopThread = threading.Thread(target=self.loop.run_forever, daemon=True)
+            self.loopThread.start()
+        return self.loop
+
+    def submit(self, coroutine):
+        """
+        Coroutine in der Eventloop des Threads starten
+        :param coroutine: z.B. self.player_get_playing()
+        :return: concurrent.futures.Future (result(timeout), cancel())
+        """
+        return asyncio.run_coroutine_threadsafe(coroutine, self.start_loop_thread())
+
+    def call(self, coroutine, timeout=CALL_TIMEOUT):
+        """
+        Coroutine in der Eventloop des Threads ausführen und auf das Ergebnis warten
+        :param coroutine: z.B. self.player_open_file(name)
+        :param timeout: maximale Wartezeit in Sekunden
+        :return: Ergebnis der Coroutine oder None bei Timeout
+        """
+        future = self.submit(coroutine)
+        try:
+            return future.result(timeout)
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            self.log.error("timeout while async call...")
+            return None
+
+    def stop_loop_thread(self):
+        """Verbindung schliessen und die Eventloop des Threads beenden"""
+        if self.loop is None:
+            return
+        asyncio.run_coroutine_threadsafe(self.close(), self.loop).result(2)
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.loopThread.join(2)
+        self.loop.close()
+        self.loop = None
+        self.loopThread = None
+
+
+async def run_stub_server(port, delays, log):
+    """
+    einfacher Ersatz für den KODI TCP Kanal: beantwortet Anfragen nach einer Verzögerung je Methode,
+    die Antworten kommen also in anderer Reihenfolge zurück als die Anfragen
+    :param port: TCP Port
+    :param delays: Dictonary methode -> Verzögerung in Sekunden
+    :param log: Logger
+    :return: asyncio Server
+    """
+    decoder = json.JSONDecoder()
+    results = {"JSONRPC.Ping": "pong", "Player.GetActivePlayers": [{"playerid": 1, "type": "video"}],
+               "Playlist.GetPlaylists": [{"playlistid": 0, "type": "audio"}, {"playlistid": 1, "type": "video"}]}
+
+    async def answer(writer, request):
+        await asyncio.sleep(delays.get(request["method"], 0.01))
+        response = {"jsonrpc": "2.0", "id": request["id"], "result": results.get(request["method"], "OK")}
+        writer.write(json.dumps(response).encode('utf-8'))
+        if request["method"] == "Player.Open":
+            note = {"jsonrpc": "2.0", "method": "Player.OnPlay", "params": {"data": {}, "sender": "xbmc"}}
+            writer.write(json.dumps(note).encode('utf-8'))
+
+    async def handle(reader, writer):
+        buffer = ''
+        try:
+            while True:
+                data = await reader.read(4096)
+                if not data:
+                    break
+                buffer += data.decode('utf-8')
+                messages, buffer = KodiNotifyThread.parse_messages(decoder, buffer, log)
+                for message in messages:
+                    asyncio.ensure_future(answer(writer, message))
+        except (asyncio.CancelledError, ConnectionError):
+            pass
+        writer.close()
+        log.debug("stub client closed...")
+
+    return await asyncio.start_server(handle, '127.0.0.1', port)
+
+
+async def stub_test(log):
+    """
+    Test gegen den Stub: ein langsamer Status Aufruf blockiert das Öffnen eines POI Mediums nicht
+    :param log: Logger
+    :return: None
+    """
+    port = 19091
+    server = await run_stub_server(port, {"Player.GetActivePlayers": 2.0, "Player.Open": 0.05}, log)
+    kodi = AsyncKodiControl(log, '127.0.0.1', port, timeout=3)
+    kodi.set_on_notify(lambda method, data: log.info("notification %s" % method))
+    start = time()
+    status = asyncio.ensure_future(kodi.player_get_playing())
+    opened = await kodi.player_open_file("/media/usb/POI/test.mp4")
+    log.info("player_open_file %s after %.0f ms while status call in flight" % (opened, (time() - start) * 1000.0))
+    players = await status
+    log.info("player_get_playing %s after %.0f ms" % (players, (time() - start) * 1000.0))
+    # Abbruch einer Anfrage
+    slow = asyncio.ensure_future(kodi.player_get_playing())
+    await asyncio.sleep(0.1)
+    slow.cancel()
+    try:
+        await slow
+    except asyncio.CancelledError:
+        log.info("status call cancelled, pending requests: %d" % len(kodi.pending))
+    log.info("ping %s, timeout case: %s" % (await kodi.app_get_ping(),
+                                            await kodi.send_request_json("Player.GetActivePlayers", timeout=0.2)))
+    await kodi.close()
+    server.close()
+    await server.wait_closed()
+
+
+def main():
+    """Main zum Testen mit dem Stub Server"""
+    log = logging.getLogger("async-kodi")
+    log.setLevel(logging.DEBUG)
+    log.addHandler(logging.StreamHandler(sys.stdout))
+    asyncio.run(stub_test(log))
+
+
+if __name__ == '__main__':
+    main()
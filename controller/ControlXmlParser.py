@@ -3,6 +3,9 @@
 import logging
 import logging.handlers
 import xml.etree.ElementTree as ET
+from PoiStore import PoiStore
+from PoiCache import PoiCache
+from GeoIndex import GeoGridIndex
 
 __author__ = 'Dirk'
 __copyright__ = 'Copyright 2017'
@@ -34,7 +37,7 @@ class ControlXmlParser:
         """
         Parse die datei
         :param ctrl_file: XML Steuerdatei oder None
-        :return:
+        :return: Liste der POI (Dictonarys)
         """
         if ctrl_file:
             self.controlFile = ctrl_file
@@ -44,29 +47,118 @@ class ControlXmlParser:
         xml_root = tree.getroot()
         # die Positionen in eine Liste parken
         for pos in xml_root:
-            # die Listeneinträge als Dictonary erzeugen
-            single_pos = {'type': pos.tag}
-            media_list = []
-            for item in pos:
-                # einen Eintrag ins Dictonary
-                if item.tag == "medium":
-                    media_list.append(item.text)
-                elif item.tag == "radius" or item.tag == "dir":
-                    if item.text is not None:
-                        single_pos[item.tag] = int(item.text)
-                    else:
-                        single_pos[item.tag] = -1
-                else:
-                    single_pos[item.tag] = item.text
-            single_pos["medium"] = media_list
             # dass Dictonary in die Liste
-            self.POI.append(single_pos)
+            self.POI.append(self.__parse_position(pos))
         # die Liste gebe ich nun zurück
         return self.POI
 
+    def parse_control_store(self, ctrl_file=None, streaming=True):
+        """
+        Parse die Datei in einen Spaltenspeicher (lat/lon als float, Strings interniert)
+        :param ctrl_file: XML Steuerdatei oder None
+        :param streaming: True: iterparse, jedes Element wird nach dem Einlesen verworfen,
+                          False: erst den ganzen Baum aufbauen (ET.parse)
+        :return: PoiStore
+        """
+        if ctrl_file:
+            self.controlFile = ctrl_file
+        self.log.debug("start parsing xml file into poi store...")
+        store = PoiStore()
+        if streaming:
+            for poi in self.iter_control_file():
+                store.append(poi)
+        else:
+            tree = ET.parse(self.controlFile)
+            for pos in tree.getroot():
+                store.append(self.__parse_position(pos))
+        self.log.debug("start parsing xml file into poi store...OK (%d entrys)" % len(store))
+        return store
+
+    def iter_control_file(self, ctrl_file=None):
+        """
+        Generator, liefert die POI (Dictonarys) während des Parsens,
+        jedes fertige Element wird gleich wieder freigegeben
+        :param ctrl_file: XML Steuerdatei oder None
+        :return: Generator der POI
+        """
+        if ctrl_file:
+            self.controlFile = ctrl_file
+        xml_root = None
+        depth = 0
+        for event, elem in ET.iterparse(self.controlFile, events=('start', 'end')):
+            if event == 'start':
+                if xml_root is None:
+                    xml_root = elem
+                depth += 1
+                continue
+            depth -= 1
+            if depth == 1:
+                # ein Kind der Wurzel (position/stop) ist komplett
+                yield self.__parse_position(elem)
+                # das Element und die Referenz in der Wurzel loswerden
+                xml_root.clear()
+
+    def load_control_store(self, ctrl_file=None, cache_file=None, cell_size=GeoGridIndex.DEFAULT_CELL_SIZE):
+        """
+        PoiStore laden: aus dem Cache neben der Steuerdatei, wenn die Datei unverändert
+        ist (mtime und Größe, nur bei Abweichung sha1), sonst parsen und den Cache neu schreiben
+        :param ctrl_file: XML Steuerdatei oder None
+        :param cache_file: Cachedatei oder None (dann Steuerdatei + PoiCache.SUFFIX)
+        :param cell_size: Zellengröße der Gitterindizes, die mit in den Cache kommen
+        :return: PoiStore
+        """
+        if ctrl_file:
+            self.controlFile = ctrl_file
+        if cache_file is None:
+            cache_file = self.controlFile + PoiCache.SUFFIX
+        cache = PoiCache(self.log, cache_file)
+        # erst nur stat, gelesen wird die Steuerdatei erst, wenn mtime oder Größe abweichen
+        store = cache.load(cache.source_signature(self.controlFile, False), self.controlFile)
+        if store is not None:
+            self.log.debug("poi store from cache %s (%d entrys)..." % (cache_file, len(store)))
+            return store
+        signature = cache.source_signature(self.controlFile)
+        store = self.parse_control_store()
+        # die Gitterindizes gleich mit in den Cache legen
+        store.get_grid_index('position', cell_size)
+        store.get_grid_index('stop', cell_size)
+        cache.save(store, signature)
+        return store
+
+    @staticmethod
+    def __parse_position(pos):
+        """
+        privat, ein Element (position/stop) als Dictonary
+        :param pos: XML Element
+        :return: Dictonary des POI
+        """
+        # die Listeneinträge als Dictonary erzeugen
+        single_pos = {'type': pos.tag}
+        media_list = []
+        for item in pos:
+            # einen Eintrag ins Dictonary
+            if item.tag == "medium":
+                media_list.append(item.text)
+            elif item.tag == "radius" or item.tag == "dir":
+                if item.text is not None:
+                    single_pos[item.tag] = int(item.text)
+                else:
+                    single_pos[item.tag] = -1
+            else:
+                single_pos[item.tag] = item.text
+        single_pos["medium"] = media_list
+        return single_pos
+
 
 def main():
-    """Main zum Testen"""
+    """
+    Main zum Testen
+    python3 ControlXmlParser.py --bench [anzahl]  vergleicht ET.parse mit iterparse (Zeit und maximale RSS)
+    """
+    import sys
+    if len(sys.argv) > 1 and sys.argv[1] in ('--bench', '--bench-run'):
+        bench_main(sys.argv)
+        return
     loglevel = logging.DEBUG
     log = logging.getLogger("mediaplay")
     log.setLevel(loglevel)
@@ -98,5 +190,55 @@ def main():
     for item in stops:
         print(item)
 
+
+def bench_main(argv):
+    """
+    Vergleich ET.parse gegen iterparse, nur zum Messen (Module werden erst hier geladen)
+    :param argv: Kommandozeile (--bench [anzahl] oder --bench-run modus datei)
+    :return: None
+    """
+    import os
+    import sys
+    import time
+    import resource
+    import tempfile
+    import subprocess
+
+    def make_bench_file(file_name, count):
+        """große Steuerdatei mit count POI erzeugen"""
+        with open(file_name, 'w', encoding='utf-8') as xml_file:
+            xml_file.write('<?xml version="1.0" encoding="UTF-8"?>\n<controlroot>\n')
+            for num in range(count):
+                tag = 'stop' if num % 3 == 0 else 'position'
+                xml_file.write('  <%s>\n    <title>Ort %d</title>\n    <lat>%.7f</lat>\n    <lon>%.7f</lon>\n'
+                               '    <radius>%d</radius>\n    <notice>Notiz zum Ort %d</notice>\n'
+                               '    <medium>ort%04d.jpg</medium>\n  </%s>\n'
+                               % (tag, num, 52.0 + (num % 1000) * 0.001, 10.0 + (num // 1000) * 0.001,
+                                  100 + num % 900, num, num % 500, tag))
+            xml_file.write('</controlroot>\n')
+
+    if argv[1] == '--bench-run':
+        # ein Messlauf im eigenen Prozess, damit die maximale RSS stimmt
+        mode, file_name = argv[2], argv[3]
+        start = time.time()
+        store = ControlXmlParser(logging.getLogger("mediaplay"), file_name).parse_control_store(
+            streaming=(mode == 'stream'))
+        duration = time.time() - start
+        print("%s %d %.3f %d" % (mode, len(store), duration, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss))
+        return
+    count = int(argv[2]) if len(argv) > 2 else 50000
+    fd, file_name = tempfile.mkstemp(suffix=".xml")
+    os.close(fd)
+    try:
+        make_bench_file(file_name, count)
+        print("control file with %d entrys, %d bytes" % (count, os.path.getsize(file_name)))
+        for mode in ('tree', 'stream'):
+            out = subprocess.check_output([sys.executable, os.path.abspath(__file__), '--bench-run', mode, file_name])
+            mode, entrys, duration, max_rss = out.decode().split()
+            print("%6s: %s entrys in %ss, peak rss %s kB" % (mode, entrys, duration, max_rss))
+    finally:
+        os.remove(file_name)
+
+
 if __name__ == '__main__':
     main()
@@ -0,0 +1,196 @@
+#!/usr/bin/python3
+# coding=utf-8
+#
+# Rahmen für die Nachrichten an das Display (ein Datagramm je Änderung)
+
+import sys
+import struct
+import logging
+from time import time
+
+__author__ = 'Dirk'
+__copyright__ = 'Copyright 2017'
+__license__ = 'GPL'
+__version__ = '0.1'
+
+"""
+Aufbau eines Rahmens:
+    1 Byte Version (0x01), danach Felder als TLV: 1 Byte Typ, 2 Byte Länge (big endian), Wert (UTF-8).
+Alte Textnachrichten ("title:...", "info:...", "clear", "lock", ...) beginnen mit einem Buchstaben
+und werden weiter verstanden.
+Angewendet wird in fester Reihenfolge: clear, lock, title, info, clock, quit.
+"""
+
+VERSION = 0x01
+# größtes Datagramm, so groß ist auch der Empfangspuffer
+MAX_DATAGRAM = 4096
+# längster Text je Feld in Bytes, zusammen begrenzt encode_frame() die Felder auf MAX_DATAGRAM
+MAX_TEXT = 1500
+# Typen der Felder
+FIELD_TITLE = 1
+FIELD_INFO = 2
+FIELD_LOCK = 3
+FIELD_CLOCK = 4
+FIELD_CLEAR = 5
+FIELD_QUIT = 6
+# Werte für FIELD_LOCK
+LOCK_UNDEF = 0
+LOCK_ON = 1
+LOCK_OFF = 2
+# Typ, Länge
+FIELD_HEADER = struct.Struct('>BH')
+# Ende eines gekürzten Textes
+ELLIPSIS = "…"
+
+
+def is_frame(data):
+    """
+    Ist das Datagramm ein Rahmen (sonst alte Textnachricht)?
+    :param data: empfangene Bytes
+    :return: Rahmen?
+    """
+    return len(data) > 0 and data[0] == VERSION
+
+
+def clip_text(text, max_bytes=MAX_TEXT):
+    """
+    Text auf max_bytes (UTF-8) kürzen, sichtbar mit "…" am Ende
+    :param text: Text
+    :param max_bytes: maximale Länge in Bytes
+    :return: UTF-8 Bytes
+    """
+    data = text.encode('utf-8')
+    if len(data) <= max_bytes:
+        return data
+    ellipsis = ELLIPSIS.encode('utf-8')
+    if max_bytes < len(ellipsis):
+        return data[:max(0, max_bytes)].decode('utf-8', 'ignore').encode('utf-8')
+    # an einer Zeichengrenze abschneiden
+    return data[:max_bytes - len(ellipsis)].decode('utf-8', 'ignore').encode('utf-8') + ellipsis
+
+
+def encode_frame(title=None, info=None, lock=None, clock=None, clear=False, quit_app=False):
+    """
+    Rahmen mit allen Änderungen bauen, nicht gesetzte Felder bleiben auf dem Display wie sie sind.
+    Jeder Text bekommt höchstens MAX_TEXT und höchstens den Platz, den die Felder davor übrig lassen.
+    :param title: Überschrift oder None
+    :param info: Infotext oder None
+    :param lock: LOCK_UNDEF, LOCK_ON, LOCK_OFF oder None
+    :param clock: Uhrzeit als Text ("" == unbekannt) oder None
+    :param clear: Anzeige vorher leeren?
+    :param quit_app: Display beenden?
+    :return: Bytes (höchstens MAX_DATAGRAM)
+    """
+    parts = [bytes((VERSION,))]
+    if clear:
+        parts.append(FIELD_HEADER.pack(FIELD_CLEAR, 0))
+    if lock is not None:
+        parts.append(FIELD_HEADER.pack(FIELD_LOCK, 1) + bytes((lock,)))
+    texts = [(field, text) for field, text in ((FIELD_TITLE, title), (FIELD_INFO, info), (FIELD_CLOCK, clock))
+             if text is not None]
+    # Platz für die Texte: Datagramm ohne feste Felder und ohne die Köpfe aller Textfelder
+    rest = MAX_DATAGRAM - sum(len(part) for part in parts) - len(texts) * FIELD_HEADER.size
+    if quit_app:
+        rest -= FIELD_HEADER.size
+    for field, text in texts:
+        value = clip_text(text, min(MAX_TEXT, rest))
+        rest -= len(value)
+        parts.append(FIELD_HEADER.pack(field, len(value)) + value)
+    if quit_app:
+        parts.append(FIELD_HEADER.pack(FIELD_QUIT, 0))
+    return b''.join(parts)
+
+
+def decode_frame(data):
+    """
+    Rahmen auswerten
+    :param data: Bytes
+    :return: Dictonary mit title, info, lock, clock, clear, quit (nur vorhandene Felder)
+    :raises ValueError: falsche Version oder kaputter Rahmen
+    """
+    if not is_frame(data):
+        raise ValueError("not an display frame (version %s)" % (data[:1].hex() or "empty"))
+    update = {}
+    pos = 1
+    while pos < len(data):
+        if pos + FIELD_HEADER.size > len(data):
+            raise ValueError("incomplete field header at %d" % pos)
+        field, length = FIELD_HEADER.unpack_from(data, pos)
+        pos += FIELD_HEADER.size
+        value = data[pos:pos + length]
+        if len(value) != length:
+            raise ValueError("incomplete field %d at %d" % (field, pos))
+        pos += length
+        if field == FIELD_TITLE:
+            update['title'] = value.decode('utf-8', 'replace')
+        elif field == FIELD_INFO:
+            update['info'] = value.decode('utf-8', 'replace')
+        elif field == FIELD_CLOCK:
+            update['clock'] = value.decode('utf-8', 'replace')
+        elif field == FIELD_LOCK and length == 1:
+            update['lock'] = value[0]
+        elif field == FIELD_CLEAR:
+            update['clear'] = True
+        elif field == FIELD_QUIT:
+            update['quit'] = True
+        # unbekannte Felder (neuere Sender) übergehen
+    return update
+
+
+def parse_legacy(message):
+    """
+    alte Textnachricht in dieselbe Form wie decode_frame bringen
+    :param message: Text ("title:...", "info:...", "clear", "lock", "unlock", "undef", "quit")
+    :return: Dictonary (leer, wenn unbekannt)
+    """
+    command, separator, value = message.partition(':')
+    command = command.lower()
+    if separator:
+        if command in ('title', 'info'):
+            return {command: value}
+        return {}
+    if command == 'clear':
+        return {'clear': True}
+    if command == 'lock':
+        return {'lock': LOCK_ON}
+    if command == 'unlock':
+        return {'lock': LOCK_OFF}
+    if command == 'undef':
+        return {'lock': LOCK_UNDEF}
+    if command == 'quit':
+        return {'quit': True}
+    return {}
+
+
+def main():
+    """Main zum Testen: Rahmen gegen einzelne Textnachrichten"""
+    log = logging.getLogger("display")
+    log.setLevel(logging.INFO)
+    log.addHandler(logging.StreamHandler(sys.stdout))
+    frame = encode_frame(title="Rathaus: Marktplatz", info="Erbaut 1523, \"das Blaue Haus\"", lock=LOCK_ON,
+                         clear=True)
+    log.info("frame %d bytes: %s" % (len(frame), decode_frame(frame)))
+    legacy = ["undef", "clear", "title:Rathaus: Marktplatz", "info:Erbaut 1523"]
+    log.info("legacy %d datagrams: %s" % (len(legacy), [parse_legacy(message) for message in legacy]))
+    long_frame = encode_frame(title="T" * 3000, info="ä" * 3000)
+    decoded = decode_frame(long_frame)
+    log.info("long texts: frame %d bytes (max %d), title %d chars, info %d chars, ends with %s"
+             % (len(long_frame), MAX_DATAGRAM, len(decoded['title']), len(decoded['info']), decoded['info'][-1]))
+    # alle Felder gesetzt und jeder Text länger als MAX_TEXT
+    full_frame = encode_frame(title="T" * 3000, info="ä" * 3000, lock=LOCK_ON, clock="ü" * 3000, clear=True,
+                              quit_app=True)
+    decoded = decode_frame(full_frame)
+    if len(full_frame) > MAX_DATAGRAM:
+        log.error("all fields: frame %d bytes exceeds %d" % (len(full_frame), MAX_DATAGRAM))
+    else:
+        log.info("all fields: frame %d bytes (max %d), clock %d chars"
+                 % (len(full_frame), MAX_DATAGRAM, len(decoded['clock'])))
+    loops = 20000
+    start = time()
+    for _ in range(loops):
+        decode_frame(frame)
+    log.info("decode: %.2f us per frame" % ((time() - start) / loops * 1e6))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,149 @@
+#!/usr/bin/python3
+# coding=utf-8
+#
+# schnelle Entfernungsberechnung für kleine Radien (statt geopy vincenty)
+
+from math import cos, sin, asin, sqrt, radians
+import random
+import logging
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+__author__ = 'Dirk'
+__copyright__ = 'Copyright 2017'
+__license__ = 'GPL'
+__version__ = '0.1'
+
+"""
+Die POI Radien liegen zwischen 18 Metern und 1500 Metern. Für solche Entfernungen ist
+die Erde lokal eine Ebene. Mit den Krümmungsradien des WGS84 Ellipsoids an der mittleren
+Breite ist der Fehler gegenüber vincenty (iterativ, Ellipsoid) unter einem Millimeter
+auf 2 km. Haversine (Kugel) ist bis zu 0.5% daneben, reicht aber auch für die Radien.
+Mit error_bounds() wird das gegen geopy geprüft (wenn geopy installiert ist).
+"""
+
+# WGS84 Ellipsoid
+WGS84_A = 6378137.0
+WGS84_F = 1 / 298.257223563
+WGS84_E2 = WGS84_F * (2 - WGS84_F)
+# mittlerer Erdradius (IUGG) für haversine
+EARTH_RADIUS = 6371008.8
+
+
+def planar_meters(lat1, lon1, lat2, lon2):
+    """
+    Entfernung zweier Punkte in Metern, lokal eben gerechnet
+    (Meridian- und Querkrümmungsradius des Ellipsoids an der mittleren Breite)
+    :param lat1: Breite Punkt 1 (Grad)
+    :param lon1: Länge Punkt 1 (Grad)
+    :param lat2: Breite Punkt 2 (Grad)
+    :param lon2: Länge Punkt 2 (Grad)
+    :return: Entfernung in Metern
+    """
+    lat1 = float(lat1)
+    lat2 = float(lat2)
+    phi = radians((lat1 + lat2) * 0.5)
+    sin_phi = sin(phi)
+    w2 = 1.0 - WGS84_E2 * sin_phi * sin_phi
+    w = sqrt(w2)
+    # Querkrümmungsradius (prime vertical) und Meridiankrümmungsradius
+    r_n = WGS84_A / w
+    r_m = r_n * (1.0 - WGS84_E2) / w2
+    d_y = r_m * radians(lat2 - lat1)
+    d_x = r_n * cos(phi) * radians(float(lon2) - float(lon1))
+    return sqrt(d_x * d_x + d_y * d_y)
+
+
+def haversine_meters(lat1, lon1, lat2, lon2):
+    """
+    Entfernung zweier Punkte in Metern auf der Kugel (haversine)
+    :param lat1: Breite Punkt 1 (Grad)
+    :param lon1: Länge Punkt 1 (Grad)
+    :param lat2: Breite Punkt 2 (Grad)
+    :param lon2: Länge Punkt 2 (Grad)
+    :return: Entfernung in Metern
+    """
+    lat1 = radians(float(lat1))
+    lat2 = radians(float(lat2))
+    sin_dlat = sin((lat2 - lat1) * 0.5)
+    sin_dlon = sin(radians(float(lon2) - float(lon1)) * 0.5)
+    h = sin_dlat * sin_dlat + cos(lat1) * cos(lat2) * sin_dlon * sin_dlon
+    return 2.0 * EARTH_RADIUS * asin(min(1.0, sqrt(h)))
+
+
+# die Funktion für den GPS Takt
+distance_meters = planar_meters
+
+
+def batch_distances(lat, lon, lats, lons):
+    """
+    Entfernungen von einem Punkt zu vielen Punkten auf einmal (lokal eben)
+    mit numpy in einem Aufruf, ohne numpy als Schleife
+    :param lat: Breite des Bezugspunktes
+    :param lon: Länge des Bezugspunktes
+    :param lats: Breiten der Kandidaten (Sequenz/array/ndarray)
+    :param lons: Längen der Kandidaten (Sequenz/array/ndarray)
+    :return: Entfernungen in Metern (ndarray oder Liste)
+    """
+    if numpy is None:
+        return [planar_meters(lat, lon, p_lat, p_lon) for p_lat, p_lon in zip(lats, lons)]
+    lat = float(lat)
+    lats = numpy.asarray(lats, dtype=numpy.float64)
+    lons = numpy.asarray(lons, dtype=numpy.float64)
+    phi = numpy.radians((lats + lat) * 0.5)
+    sin_phi = numpy.sin(phi)
+    w2 = 1.0 - WGS84_E2 * sin_phi * sin_phi
+    w = numpy.sqrt(w2)
+    r_n = WGS84_A / w
+    r_m = r_n * (1.0 - WGS84_E2) / w2
+    d_y = r_m * numpy.radians(lats - lat)
+    d_x = r_n * numpy.cos(phi) * numpy.radians(lons - float(lon))
+    return numpy.hypot(d_x, d_y)
+
+
+def error_bounds(samples=2000, max_dist=2000.0, center=(52.731559, 10.247012)):
+    """
+    Maximalen Fehler der schnellen Funktionen gegen geopy (vincenty/geodesic) bestimmen
+    :param samples: Anzahl zufälliger Punktpaare
+    :param max_dist: maximale Entfernung in Metern
+    :param center: Mittelpunkt der Stichprobe
+    :return: Dictonary mit maximalem Fehler in Metern je Funktion oder None ohne geopy
+    """
+    try:
+        from geopy import distance as geo_distance
+    except ImportError:
+        return None
+    reference = getattr(geo_distance, 'vincenty', None) or geo_distance.geodesic
+    rnd = random.Random(4711)
+    max_err = {'planar': 0.0, 'haversine': 0.0}
+    d_deg = max_dist / 111132.0
+    for _ in range(samples):
+        lat1 = center[0] + rnd.uniform(-1.0, 1.0)
+        lon1 = center[1] + rnd.uniform(-1.0, 1.0)
+        lat2 = lat1 + rnd.uniform(-d_deg, d_deg) * 0.7
+        lon2 = lon1 + rnd.uniform(-d_deg, d_deg)
+        ref = reference((lat1, lon1), (lat2, lon2)).meters
+        max_err['planar'] = max(max_err['planar'], abs(planar_meters(lat1, lon1, lat2, lon2) - ref))
+        max_err['haversine'] = max(max_err['haversine'], abs(haversine_meters(lat1, lon1, lat2, lon2) - ref))
+    return max_err
+
+
+def main():
+    """Main zum Testen"""
+    log = logging.getLogger("geodistance")
+    log.setLevel(logging.DEBUG)
+    log.addHandler(logging.StreamHandler())
+    bounds = error_bounds()
+    if bounds is None:
+        log.warning("geopy not installed, can't check error bounds")
+    else:
+        log.info("max error vs vincenty up to 2000m: planar %.4fm, haversine %.4fm"
+                 % (bounds['planar'], bounds['haversine']))
+    log.info("distance Bahnhof -> Zentrum: %.2fm" % distance_meters(52.7406917, 10.2307383, 52.7336967, 10.2352417))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+#!/usr/bin/python3
+# coding=utf-8
+#
+# Räumlicher Index (Gitter) für die POI und Haltestellen
+
+from math import cos, floor, isnan, radians
+
+__author__ = 'Dirk'
+__copyright__ = 'Copyright 2017'
+__license__ = 'GPL'
+__version__ = '0.1'
+
+
+class GeoGridIndex:
+    """
+    Gitterindex für Geokoordinaten
+    Die POI werden einmalig in Zellen (Bucket-Tabelle) einsortiert,
+    bei einer Abfrage werden nur die Zellen in der Nähe der
+    aktuellen Position durchsucht
+    """
+    # Meter pro Breitengrad (Mittelwert, reicht für die Zelleneinteilung)
+    METERS_PER_DEG_LAT = 111132.0
+    # Kantenlänge einer Zelle in Metern
+    DEFAULT_CELL_SIZE = int(1500)
+    # minimaler cos(lat), damit die Zellen an den Polen nicht entarten
+    MIN_COS_LAT = 0.01
+
+    def __init__(self, cell_size=DEFAULT_CELL_SIZE):
+        """
+        Konstruktor
+        :param cell_size: Kantenlänge einer Zelle in Metern
+        """
+        self.cellSize = cell_size
+        self.cellLat = cell_size / GeoGridIndex.METERS_PER_DEG_LAT
+        self.cellLon = self.cellLat
+        self.cells = {}
+        self.count = 0
+
+    def build(self, lats, lons, indices):
+        """
+        Index über Koordinatenspalten aufbauen (einmalig, nicht im GPS Takt)
+        :param lats: Breiten (z.B. PoiStore.lat)
+        :param lons: Längen (z.B. PoiStore.lon)
+        :param indices: Indizes der POI, die in den Index sollen
+        :return: Anzahl der einsortierten POI
+        """
+        self.cells = {}
+        self.count = 0
+        # ohne gültige Koordinaten (NaN) kann der POI nie getroffen werden
+        valid = [idx for idx in indices if not (isnan(lats[idx]) or isnan(lons[idx]))]
+        if len(valid) == 0:
+            return 0
+        #
+        # die Breite der Zellen in Längengraden an der mittleren Breite festmachen
+        #
+        ref_lat = sum(lats[idx] for idx in valid) / len(valid)
+        self.cellLon = self.cellLat / max(cos(radians(ref_lat)), GeoGridIndex.MIN_COS_LAT)
+        for idx in valid:
+            key = self.__cell_of(lats[idx], lons[idx])
+            self.cells.setdefault(key, []).append(idx)
+        self.count = len(valid)
+        return self.count
+
+    def set_cells(self, cell_lon, cells):
+        """
+        fertige Zellen übernehmen (z.B. aus dem Cache der Steuerdatei)
+        :param cell_lon: Zellenbreite in Längengraden
+        :param cells: Dictonary (zeile, spalte) -> Liste der Indizes
+        :return: Anzahl der POI
+        """
+        self.cellLon = cell_lon
+        self.cells = cells
+        self.count = sum(len(bucket) for bucket in cells.values())
+        return self.count
+
+    def __cell_of(self, lat, lon):
+        """
+        privat, Zellenschlüssel einer Koordinate
+        :param lat: Breite (float)
+        :param lon: Länge (float)
+        :return: Zellenschlüssel (zeile, spalte)
+        """
+        return int(floor(lat / self.cellLat)), int(floor(lon / self.cellLon))
+
+    def query(self, lat, lon, radius):
+        """
+        Kandidaten im Umkreis finden
+        Es werden nur die Zellen angesehen, die das Rechteck um den Kreis berühren,
+        die genaue Entfernung muss der Aufrufer selber prüfen
+        :param lat: Breite der aktuellen Position
+        :param lon: Länge der aktuellen Position
+        :param radius: Radius in Metern
+        :return: Liste der Indizes
+        """
+        if self.count == 0:
+            return []
+        lat = float(lat)
+        lon = float(lon)
+        d_lat = radius / GeoGridIndex.METERS_PER_DEG_LAT
+        d_lon = d_lat / max(cos(radians(lat)), GeoGridIndex.MIN_COS_LAT)
+        row_min, col_min = self.__cell_of(lat - d_lat, lon - d_lon)
+        row_max, col_max = self.__cell_of(lat + d_lat, lon + d_lon)
+        candidates = []
+        for row in range(row_min, row_max + 1):
+            for col in range(col_min, col_max + 1):
+                bucket = self.cells.get((row, col))
+                if bucket is not None:
+                    candidates.extend(bucket)
+        return candidates
+
+    def __len__(self):
+        """Anzahl der POI im Index"""
+        return self.count
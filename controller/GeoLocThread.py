@@ -2,13 +2,15 @@
 # coding=utf-8
 # 
 
-from geopy.distance import vincenty
-from time import sleep, time
-from threading import Thread, Lock
+from time import time
+from threading import Thread, Lock, Event
 import signal
 import logging
 import logging.handlers
 from GpsdConnect import GPSDSocket, DataStream
+from GeoIndex import GeoGridIndex
+from GeoDistance import distance_meters, batch_distances
+from PoiStore import PoiStore
 
 __author__ = 'Dirk'
 __copyright__ = 'Copyright 2017'
@@ -33,15 +35,22 @@ class GeoLocationThread(Thread):
     STOP_GETOUT = int(18)
     # Zeit in Sekunden bis das nächste mal die Orte gefiltert werden    
     TIME_TO_POIFILTER = 8
+    # minimaler Abstand in Sekunden zwischen zwei ausgewerteten Positionen
+    MIN_PROCESS_INTERVAL = 0.5
+    # maximale Wartezeit auf Daten vom gpsd, danach wird die Abbruchbedingung geprüft
+    DATA_TIMEOUT = 10
+    # Wartezeit in Sekunden vor einem neuen Verbindungsversuch
+    RECONNECT_TIME = 2
     # Eichenstrasse 33, Eschede
     HOMECOORD = {"lat": "52.731559", "lon": "10.247012"}
 
-    def __init__(self, logger, host="127.0.0.1", port=2947):
+    def __init__(self, logger, host="127.0.0.1", port=2947, min_interval=MIN_PROCESS_INTERVAL):
         """
         Konstruktor
         :param logger: Sytemlogger
         :param host: Host, auf dem GPSD läuft
         :param port: Port des GPST auf dem Host
+        :param min_interval: minimaler Abstand zwischen zwei ausgewerteten Positionen in Sekunden
         """
         Thread.__init__(self)
         if int(logger.getEffectiveLevel()) < 20:
@@ -53,16 +62,24 @@ class GeoLocationThread(Thread):
         self.gpsdHost = host
         self.gpsdPort = port
         self.gpsdSocket = GPSDSocket(self.log)
-        self.gpsdDataStream = DataStream(self.log)
+        self.gpsdDataStream = DataStream(self.log, classes=('TPV',))  # nur TPV wird gebraucht
         # thread bezogen
         self.watchdogTime = time() + GeoLocationThread.TIME_TO_POIFILTER
         self.isGpsdConnected = False
         self.isRunning = False
+        self.quitEvent = Event()
+        self.minInterval = min_interval
+        self.lastProcessTime = 0
         self.gpsPosition = None
+        self.poiStore = PoiStore()
         self.POI = []
         self.STOPS = []
+        self.poiIndex = GeoGridIndex(GeoLocationThread.POI_RADIUS)
+        self.stopIndex = GeoGridIndex(GeoLocationThread.POI_RADIUS)
         self.hitPoi = None
         self.hitStop = None
+        self.hitStopReleased = False   # Haltestelle schon wieder freigegeben (innerer Kreis verlassen)
+        self.hitStopArrived = False    # Haltestelle erreicht (im inneren Kreis gewesen)
         self.currPois = []
         self.currStops = []
         self.callBackHitLocation = None
@@ -84,6 +101,9 @@ class GeoLocationThread(Thread):
         """Thread beenden"""
         self.log.info("== initiate gps-thread shutdown ==")
         self.isRunning = False
+        # wartenden Thread sofort wecken
+        self.quitEvent.set()
+        self.gpsdSocket.wakeup()
 
     def is_thread_running(self):
         """
@@ -102,7 +122,7 @@ class GeoLocationThread(Thread):
             self.log.debug("gpsd connect...")
             # Verbinden mit defaults
             self.log.debug("gpsd connection...")
-            if self.gpsdSocket.connect():
+            if self.gpsdSocket.connect(self.gpsdHost, self.gpsdPort):
                 self.log.debug("gpsd connection ok, socket watch...")
                 if self.gpsdSocket.watch():
                     self.log.debug("gpsd socket watch...OK")
@@ -129,7 +149,6 @@ class GeoLocationThread(Thread):
             # versuche die Position zu bestimmen
             # wenn ein 2d-Fix vorhanden ist
             #
-            sleep(2)
             # verbunden mit gpsd?
             if not self.isGpsdConnected:
                 self.log.warning("gpsd not connected...")
@@ -143,6 +162,9 @@ class GeoLocationThread(Thread):
                     self.log.info("gpsd now connected...")
                     if self.callBackLockGPS is not None:
                         self.callBackLockGPS(self.isGpsLock)
+                # etwas warten, quit_thread() beendet das Warten sofort
+                if self.quitEvent.wait(GeoLocationThread.RECONNECT_TIME):
+                    continue
                 self.reconnect()
                 continue
             #
@@ -154,63 +176,82 @@ class GeoLocationThread(Thread):
     def __read_data(self):
         """
         privat, lese daten vom gpsd
-        die gps daten sind lock geschützt, da auch von ausserhalb zugegriffen werden kann
-        daher muss gleichzeitiger zugriff verboten sein
-        das ist threadsave...
+        blockiert, bis gpsd eine Zeile schickt oder quit_thread() den Thread weckt,
+        ausgewertet werden nur TPV Nachrichten, höchstens alle self.minInterval Sekunden
         :return: None
         """
-        # Alle vorhanden Daten lesen
-        for gpsData in self.gpsdSocket:
+        while self.isRunning:
+            gps_data = self.gpsdSocket.next(GeoLocationThread.DATA_TIMEOUT)
             # immer die Abbruchbedingung in der sicht behalten
             if not self.isRunning:
                 return
-            if gpsData:
-                # es gibt Daten!
-                self.log.debug("get current position...")
-                self.gpsdDataStream.unpack(gpsData)
-                try:
-                    # feststellen, ob es einen lock vom GPS gibt
-                    self.log.debug("mode: %d, pos: lat: %s, lon %s" % (
-                        int(self.gpsdDataStream.TPV['mode']), self.gpsdDataStream.TPV['lat'],
-                        self.gpsdDataStream.TPV['lon']))
-                    mode = int(self.gpsdDataStream.TPV['mode'])
-                except:
-                    # etwas ging schief, also auch kein lock
-                    mode = -1
-                    self.log.warning("gps cant read (mode)...")
-                    self.lock.acquire()
-                    self.gpsPosition = None
-                    self.lock.release()
-                # mode auswerten (1=nix, 2=2D lock, 3=3d lock)
-                if mode < 2:
-                    # kein GPS lock
-                    self.log.debug("no gps lock. go away...")
-                    self.lock.acquire()
-                    self.gpsPosition = None
-                    self.lock.release()
-                    # hat sich das verändert zu vorher?
-                    if self.isGpsLock:
-                        self.isGpsLock = False
-                        # gibt es einen Callback?
-                        if self.callBackLockGPS is not None:
-                            self.callBackLockGPS(self.isGpsLock)
-                    # ein datensatz gelesen, zurück 
-                    return
-                # da ist GPS lock, war das vorher schon so?
-                if not self.isGpsLock:
-                    # nein. benachrichtigen
-                    self.isGpsLock = True
-                    # ist da ein Callback?
-                    if self.callBackLockGPS is not None:
-                        self.callBackLockGPS(self.isGpsLock)
-                    # dann noch fix den Bereich der POI in der Nähe filtern
-                    self.currPois = self.filter_poi_circle(self.POI, "POI")
-                    self.currStops = self.filter_poi_circle(self.STOPS, "STOP")
-                # jetzt die GPS Daten lesen
-                self.__get_gps_pos()
-            if not self.isRunning:
+            if gps_data is None:
+                # timeout oder geweckt, nichts zu tun
+                continue
+            if not gps_data:
+                # gpsd hat die Verbindung beendet
+                self.log.warning("gpsd closed connection...")
+                self.gpsdSocket.close()
+                self.isGpsdConnected = False
                 return
-            sleep(.5)
+            # nur TPV Nachrichten enthalten die Position
+            if self.gpsdDataStream.unpack(gps_data) != 'TPV':
+                continue
+            now = time()
+            if now - self.lastProcessTime < self.minInterval:
+                continue
+            self.lastProcessTime = now
+            self.__process_fix()
+
+    def __process_fix(self):
+        """
+        privat, eine neue Position vom gpsd auswerten
+        die gps daten sind lock geschützt, da auch von ausserhalb zugegriffen werden kann
+        daher muss gleichzeitiger zugriff verboten sein
+        das ist threadsave...
+        :return: None
+        """
+        # es gibt Daten!
+        self.log.debug("get current position...")
+        tpv = self.gpsdDataStream.TPV
+        try:
+            # feststellen, ob es einen lock vom GPS gibt
+            mode = int(tpv.mode)
+            self.log.debug("mode: %d, pos: lat: %s, lon %s" % (mode, tpv.lat, tpv.lon))
+        except:
+            # etwas ging schief, also auch kein lock
+            mode = -1
+            self.log.warning("gps cant read (mode)...")
+            self.lock.acquire()
+            self.gpsPosition = None
+            self.lock.release()
+        # mode auswerten (1=nix, 2=2D lock, 3=3d lock)
+        if mode < 2:
+            # kein GPS lock
+            self.log.debug("no gps lock. go away...")
+            self.lock.acquire()
+            self.gpsPosition = None
+            self.lock.release()
+            # hat sich das verändert zu vorher?
+            if self.isGpsLock:
+                self.isGpsLock = False
+                # gibt es einen Callback?
+                if self.callBackLockGPS is not None:
+                    self.callBackLockGPS(self.isGpsLock)
+            # ein datensatz gelesen, zurück 
+            return
+        # da ist GPS lock, war das vorher schon so?
+        if not self.isGpsLock:
+            # nein. benachrichtigen
+            self.isGpsLock = True
+            # ist da ein Callback?
+            if self.callBackLockGPS is not None:
+                self.callBackLockGPS(self.isGpsLock)
+            # dann noch fix den Bereich der POI in der Nähe filtern
+            self.currPois = self.filter_poi_circle(self.poiIndex, "POI")
+            self.currStops = self.filter_poi_circle(self.stopIndex, "STOP")
+        # jetzt die GPS Daten lesen
+        self.__get_gps_pos()
 
     def __get_gps_pos(self):
         """
@@ -226,11 +267,14 @@ class GeoLocationThread(Thread):
         try:
             # zugreifen auf Position mit Locking
             self.log.debug("read pos...")
+            tpv = self.gpsdDataStream.TPV
+            if tpv.lat is None or tpv.lon is None:
+                raise ValueError("no position in TPV")
             self.gpsPosition = \
-                {'lat': self.gpsdDataStream.TPV['lat'],
-                 'lon': self.gpsdDataStream.TPV['lon'],
-                 'speed': self.gpsdDataStream.TPV['speed'],
-                 'course': self.gpsdDataStream.TPV['track']}
+                {'lat': tpv.lat,
+                 'lon': tpv.lon,
+                 'speed': tpv.speed,
+                 'course': tpv.track}
         except:
             self.log.error("can't read position...")
             # daten entsperren
@@ -246,8 +290,8 @@ class GeoLocationThread(Thread):
             # TIME_TO_POIFILTER Sekunden sind wieder rum
             self.watchdogTime = time() + GeoLocationThread.TIME_TO_POIFILTER
             # lade die Liste der infrage kommenden POI neu 
-            self.currPois = self.filter_poi_circle(self.POI, "POI")
-            self.currStops = self.filter_poi_circle(self.STOPS, "STOPS")
+            self.currPois = self.filter_poi_circle(self.poiIndex, "POI")
+            self.currStops = self.filter_poi_circle(self.stopIndex, "STOPS")
         # ist die Position und ein Callback verfügbar?
         # TODO: nach der simulation wieder kommentar entfernen
         # if self.callBackHitLocation is None:
@@ -290,15 +334,15 @@ class GeoLocationThread(Thread):
         for poi in self.currStops:
             poi_dest = (poi["lat"], poi["lon"])
             # Bin ich im Umkreis?
-            distance = vincenty(myself, poi_dest).meters
+            distance = distance_meters(myself[0], myself[1], poi_dest[0], poi_dest[1])
             if distance < poi['radius']:
                 # schon benachrichtigt?
                 if self.hitStop is None:
                     # nein, benachrichtigen und merken
                     self.hitStop = poi
                     # Kennzeichne, ich bin noch nicht ausgefahren
-                    self.hitStop["released"] = False
-                    self.hitStop['arrived'] = False
+                    self.hitStopReleased = False
+                    self.hitStopArrived = False
                     self.log.info("HIT an bus stop area: %s distance: %d" % (poi["title"], int(distance)))
                     if self.callBackHitLocation is not None:
                         self.callBackHitLocation(poi)
@@ -306,15 +350,15 @@ class GeoLocationThread(Thread):
                 else:
                     # ein Treffer ist schon da.
                     # ist es derselbe Punkt?
-                    if self.hitStop["lat"] == poi["lat"] and self.hitStop["lat"] == poi["lat"]:
+                    if self.hitStop == poi:
                         # ist derselbe Punkt, relaxen, nix zu tun
                         return
                     else:
                         # der Treffer ist neu, gib Nachricht an das Programm
                         self.hitStop = poi
                         # Kennzeichne, ich bin noch nicht ausgefahren
-                        self.hitStop["released"] = False
-                        self.hitStop['arrived'] = False
+                        self.hitStopReleased = False
+                        self.hitStopArrived = False
                         self.log.info("HIT an new bus stop area: %s distance: %d" % (poi["title"], int(distance)))
                         if self.callBackHitLocation is not None:
                             self.callBackHitLocation(poi)
@@ -325,7 +369,7 @@ class GeoLocationThread(Thread):
         for poi in self.currPois:
             poi_dest = (poi["lat"], poi["lon"])
             # Bin ich im Umkreis?
-            distance = vincenty(myself, poi_dest).meters
+            distance = distance_meters(myself[0], myself[1], poi_dest[0], poi_dest[1])
             if distance < poi["radius"]:
                 # schon benachrichtigt?
                 if self.hitPoi is None:
@@ -338,7 +382,7 @@ class GeoLocationThread(Thread):
                 else:
                     # ein Treffer ist schon da.
                     # ist es derselbe Punkt?
-                    if self.hitPoi["lat"] == poi["lat"] and self.hitPoi["lat"] == poi["lat"]:
+                    if self.hitPoi == poi:
                         # ist derselbe Punkt, relaxen, nix zu tun
                         return
                     else:
@@ -359,13 +403,13 @@ class GeoLocationThread(Thread):
         # da ist ein Treffer für Haltestellen aktuell, 
         # also teste mal ob das noch passt
         poi_dest = (self.hitStop["lat"], self.hitStop["lon"])
-        distance = vincenty(myself, poi_dest).meters
+        distance = distance_meters(myself[0], myself[1], poi_dest[0], poi_dest[1])
         #
         # bin ich im engeren Kreis der Haltestelle?
         #
         if distance < GeoLocationThread.STOP_GETOUT:
-            if self.hitStop["arrived"] is False:
-                self.hitStop["arrived"] = True
+            if self.hitStopArrived is False:
+                self.hitStopArrived = True
                 self.log.info("bus stop arrived, dinstance: %d" % distance )
             # ich bin noch im Bereich, alles andere kann warten
             # nichts weiter unternehmen
@@ -377,17 +421,17 @@ class GeoLocationThread(Thread):
         if GeoLocationThread.STOP_GETOUT < distance < self.hitStop['radius'] + 5:
             # bin noch im Bereich aber schon weg von der Haltestelle
             # Anzeige freigeben, aber HIT noch sperren
-            if self.hitStop["released"] is True:
+            if self.hitStopReleased is True:
                 # die haltestelle wurde wieder frei gegeben, bin aber noch im äußeren Kreis
                 # also nicht weiter untenehmen
                 return True
             else:
-                if self.hitStop["arrived"] is True:
+                if self.hitStopArrived is True:
                     # wurde noch nicht freigegeben, aber schon aus dem inneren Kreis daher mach ich das jetzt
                     self.log.info(
                         "UNHIT an bus stop location: %s, distance: %d, bus station is lock while distance is wide enough."
                         % (self.hitStop["title"], distance))
-                    self.hitStop["released"] = True
+                    self.hitStopReleased = True
                     # teile das dem parent-Prozess mit, wenn csallback definiert wurde
                     if self.callBackHitLocation is not None:
                         self.callBackHitLocation(None)
@@ -408,7 +452,7 @@ class GeoLocationThread(Thread):
         # also teste mal ob das noch passt
         poi_dest = (self.hitPoi["lat"], self.hitPoi["lon"])
         # bin ich noch im Bereich?
-        distance = vincenty(myself, poi_dest).meters
+        distance = distance_meters(myself[0], myself[1], poi_dest[0], poi_dest[1])
         radius = self.hitPoi["radius"] + 50
         if distance < radius:
             # bin noch im Bereich, alles andere kann warten
@@ -424,12 +468,14 @@ class GeoLocationThread(Thread):
             self.callBackHitLocation(None)
         return False
 
-    def filter_poi_circle(self, poi_list, notice=""):
+    def filter_poi_circle(self, poi_index, notice=""):
         """
         filtere aus allen POI in einem Radius (GeoLocationThread.POI_RADIUS)
         heraus. Das ist gut für die performance, ich muss nicht alle 0.5 Sekunden
         alle POI vergleichen, wenn die weiter weg sind....
-        :param poi_list: Liste der POI
+        Über den Gitterindex werden nur die Zellen in der Nähe angesehen,
+        der Aufwand hängt nicht mehr von der Größe der Steuerdatei ab
+        :param poi_index: Gitterindex der POI (GeoGridIndex)
         :param notice: Bemerkung für debug
         :return: reduzierte Liste der POI
         """
@@ -444,39 +490,48 @@ class GeoLocationThread(Thread):
         if myself is None:
             # ok, keine Position, nichts zu tun
             return m_pois
-        # Die ganze Liste durchsuchen
-        for poi in poi_list:
-            poi_dest = (poi["lat"], poi["lon"])
+        # nur die Kandidaten aus den benachbarten Zellen durchsuchen
+        store = self.poiStore
+        candidates = poi_index.query(myself[0], myself[1], GeoLocationThread.POI_RADIUS)
+        # alle Kandidaten in einem Aufruf bewerten
+        distances = batch_distances(myself[0], myself[1],
+                                    [store.lat[idx] for idx in candidates], [store.lon[idx] for idx in candidates])
+        for idx, distance in zip(candidates, distances):
             # Bin ich im Umkreis?
-            distance = vincenty(myself, poi_dest).meters
             if distance < GeoLocationThread.POI_RADIUS:
-                m_pois.append(poi)
+                m_pois.append(store.view(idx))
         self.log.debug("current circle of pois has %d entrys %s" % (len(m_pois), notice))
         return m_pois
 
     def set_pois(self, pois):
         """
         setze die Liste der POI's für den Thread
-        :param pois: Liste der Points of interest
+        :param pois: PoiStore oder Liste der Points of interest
         :return: None
         """
+        if not isinstance(pois, PoiStore):
+            pois = PoiStore.from_poi_list(pois)
         # Zugriff auf synchronisiert
         self.log.debug("filter pois...")
         self.lock.acquire()
-        self.POI = [poi for poi in pois if poi['type'] == 'position']
-        self.STOPS = [poi for poi in pois if poi['type'] == 'stop']
+        self.poiStore = pois
+        poi_indices = pois.indices_of_type('position')
+        stop_indices = pois.indices_of_type('stop')
         #
         # sorge für einen Radius un dafür dass er korrekt ist
         #
-        for poi in self.STOPS:
-            try:
-                # korrigiere den Radius wenn notwendig
-                if poi['radius'] is None or poi['radius'] < GeoLocationThread.STOP_GETOUT:
-                    # falls kein Radius definiert ist oder kleiner als der innere Bereich
-                    poi['radius'] = GeoLocationThread.STOP_COMIN
-            except KeyError:
-                # erzeuge den Radius, wenn er fehlt
-                poi['radius'] = GeoLocationThread.STOP_COMIN
+        for idx in stop_indices:
+            # korrigiere den Radius wenn notwendig
+            if pois.radius[idx] < GeoLocationThread.STOP_GETOUT:
+                # falls kein Radius definiert ist oder kleiner als der innere Bereich
+                pois.radius[idx] = GeoLocationThread.STOP_COMIN
+        self.POI = [pois.view(idx) for idx in poi_indices]
+        self.STOPS = [pois.view(idx) for idx in stop_indices]
+        #
+        # räumlichen Index einmalig aufbauen, dann muss pro Fix nicht mehr alles durchsucht werden
+        #
+        self.poiIndex = pois.get_grid_index('position', GeoLocationThread.POI_RADIUS)
+        self.stopIndex = pois.get_grid_index('stop', GeoLocationThread.POI_RADIUS)
         self.lock.release()
         self.log.debug("filter pois...OK")
 
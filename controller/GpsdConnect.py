@@ -3,9 +3,13 @@
 from __future__ import print_function
 
 import json
-import select
+import selectors
 import socket
 import logging
+import sys
+import threading
+from collections import deque
+from time import time
 
 """
 GPS3 (gps3.py) is a Python 2.7-3.5 GPSD interface (http://www.catb.org/gpsd)
@@ -43,11 +47,22 @@ PROTOCOL = 'json'  # "
 
 class GPSDSocket(object):
     """Establish a socket with gpsd, by which to send commands and receive data."""
+    RECV_SIZE = 4096  # bytes per recv() on the non-blocking socket
 
     def __init__(self, logging):
         self.streamSock = None
         self.response = None
         self.log = logging
+        # persistenter Puffer: unvollständige Zeile und fertige, noch nicht abgeholte Zeilen
+        self.readBuffer = bytearray()
+        self.lineQueue = deque()
+        self.isEof = False
+        # selector für blockierendes Warten, dazu ein Socketpaar zum Aufwecken von aussen
+        self.selector = selectors.DefaultSelector()
+        self.wakeupRecv, self.wakeupSend = socket.socketpair()
+        self.wakeupRecv.setblocking(False)
+        self.wakeupSend.setblocking(False)
+        self.selector.register(self.wakeupRecv, selectors.EVENT_READ)
         self.log.debug("create GPSDSocket object...OK")
 
     def connect(self, host=HOST, port=GPSD_PORT):
@@ -56,15 +71,16 @@ class GPSDSocket(object):
             host: default host='127.0.0.1'
             port: default port=2947
         """
+        self.__unregister()
         for alotta_stuff in socket.getaddrinfo(host, port, 0, socket.SOCK_STREAM):
             family, socktype, proto, _canonname, host_port = alotta_stuff
             try:
                 self.log.debug("connect...")
                 self.log.debug("create socket...")
-                self.streamSock = socket.socket(family, socktype, proto)
-                self.streamSock.connect(host_port)
+                stream_sock = socket.socket(family, socktype, proto)
+                stream_sock.connect(host_port)
                 self.log.debug("connect socket...")
-                self.streamSock.setblocking(False)
+                self.attach(stream_sock)
                 self.log.debug("connect...OK")
                 return True
             except (OSError, IOError) as error:
@@ -72,6 +88,19 @@ class GPSDSocket(object):
                 self.log.error("GPS3 gpsd connection at \'{0}\' on port \'{1}\' failed".format(host, port))
                 return False
 
+    def attach(self, stream_sock):
+        """Use an already connected stream socket (connect() or a replayed stream).
+        Arguments:
+            stream_sock: connected stream socket, is switched to non-blocking
+        """
+        self.__unregister()
+        self.streamSock = stream_sock
+        self.streamSock.setblocking(False)
+        self.selector.register(self.streamSock, selectors.EVENT_READ)
+        self.readBuffer = bytearray()
+        self.lineQueue.clear()
+        self.isEof = False
+
     def watch(self, enable=True, gpsd_protocol=PROTOCOL, devicepath=None):
         """watch gpsd in various gpsd_protocols or devices.
         Arguments:
@@ -118,31 +147,120 @@ class GPSDSocket(object):
         """Return empty unless new data is ready for the client.
         Arguments:
             timeout: Default timeout=0  range zero to float specifies a time-out as a floating point
-        number in seconds.  Will sit and wait for timeout seconds.  When the timeout argument is omitted
-        the function blocks until at least one file descriptor is ready. A time-out value of zero specifies
-        a poll and never blocks.
+        number in seconds.  Will sit and wait for timeout seconds.  A timeout of None blocks until
+        data arrives or wakeup() is called. A time-out value of zero specifies a poll and never blocks.
+        Returns:
+            the next complete line from gpsd (without newline), None on timeout/wakeup
+            or while a line is still incomplete, '' if gpsd closed the connection
         """
-        try:
-            waitin, _waitout, _waiterror = select.select((self.streamSock,), (), (), timeout)
-            if not waitin:
+        # erst die Zeilen abholen, die schon im Puffer sind
+        if self.lineQueue:
+            self.response = self.lineQueue.popleft()
+            return self.response
+        if self.isEof:
+            return ''
+        if self.streamSock is None:
+            return None
+        is_readable = False
+        for key, _mask in self.selector.select(timeout):
+            if key.fileobj is self.wakeupRecv:
+                # geweckt, Weckbytes verwerfen
+                self.__drain_wakeup()
                 return None
-            else:
-                gpsd_response = self.streamSock.makefile()  # '.makefile(buffering=4096)' In strictly Python3
-                self.response = gpsd_response.readline()
+            is_readable = True
+        if not is_readable:
+            return None
+        self.__fill_buffer()
+        if self.lineQueue:
+            self.response = self.lineQueue.popleft()
             return self.response
+        if self.isEof:
+            return ''
+        return None
 
-        except StopIteration as error:
-            self.log.error("The readline exception in GPSDSocket.next is--> {}".format(error))
-            return None
+    def __fill_buffer(self):
+        """privat, alles lesen was der Socket hat und in Zeilen zerlegen"""
+        while True:
+            try:
+                chunk = self.streamSock.recv(GPSDSocket.RECV_SIZE)
+            except (BlockingIOError, InterruptedError):
+                break
+            except (OSError, IOError) as error:
+                self.log.error("GPSDSocket recv fail with {}".format(error))
+                self.isEof = True
+                break
+            if not chunk:
+                # gpsd hat die Verbindung geschlossen
+                self.isEof = True
+                break
+            self.readBuffer += chunk
+            if len(chunk) < GPSDSocket.RECV_SIZE:
+                # Socket ist leer, spart einen recv() mit EAGAIN
+                break
+        end = self.readBuffer.rfind(b'\n')
+        if end < 0:
+            return
+        for line in self.readBuffer[:end].split(b'\n'):
+            line = line.strip()
+            if line:
+                self.lineQueue.append(line.decode('utf-8', 'replace'))
+        del self.readBuffer[:end + 1]
 
     __next__ = next  # Workaround for changes in iterating between Python 2.7 and 3
 
+    def wakeup(self):
+        """wake up a blocking next() from another thread (e.g. to quit)"""
+        try:
+            self.wakeupSend.send(b'\0')
+        except (OSError, IOError):
+            # Puffer voll, es wird sowieso schon geweckt
+            pass
+
+    def __drain_wakeup(self):
+        """privat, alle Weckbytes lesen"""
+        try:
+            while self.wakeupRecv.recv(64):
+                pass
+        except (OSError, IOError):
+            pass
+
+    def __unregister(self):
+        """privat, alten stream socket aus dem selector nehmen"""
+        if self.streamSock is not None:
+            try:
+                self.selector.unregister(self.streamSock)
+            except (KeyError, ValueError):
+                pass
+
     def close(self):
         """turn off stream and close socket"""
         if self.streamSock:
+            self.__unregister()
             self.watch(enable=False)
             self.streamSock.close()
         self.streamSock = None
+        self.readBuffer = bytearray()
+        self.lineQueue.clear()
+        self.isEof = False
+
+
+class TpvRecord(object):
+    """Fixed TPV record for the selective DataStream mode, absent values are None"""
+    __slots__ = ('alt', 'climb', 'device', 'epc', 'epd', 'eps', 'ept', 'epv', 'epx', 'epy', 'lat', 'lon', 'mode',
+                 'speed', 'tag', 'time', 'track')
+
+    def __init__(self):
+        for key in self.__slots__:
+            setattr(self, key, None)
+
+    def fill(self, fresh_data):
+        """Take over the values of a decoded TPV object"""
+        for key in self.__slots__:
+            setattr(self, key, fresh_data.get(key))
+
+    def __getitem__(self, key):
+        """dict like access, e.g. record['lat']"""
+        return getattr(self, key)
 
 
 class DataStream(object):
@@ -168,34 +286,80 @@ class DataStream(object):
         # 'AIS': {}  # see: http://catb.org/gpsd/AIVDM.html
         'ERROR': {'message'}}  # TODO: Full suite of possible GPSD output
 
-    def __init__(self, logger):
-        """Potential data packages from gpsd for a generator of class attribute dictionaries"""
+    CLASS_TAG = '"class"'  # gpsd always writes the class first: {"class":"TPV",...
+
+    def __init__(self, logger, classes=None):
+        """Potential data packages from gpsd for a generator of class attribute dictionaries
+        Arguments:
+            logger: logger
+            classes: None decodes every class into 'n/a' padded dictionaries (as before),
+                     a tuple like ('TPV',) decodes only these classes, TPV into a TpvRecord
+        """
         self.log = logger
+        self.classes = None if classes is None else frozenset(classes)
         for package_name, dataset in self.packages.items():
+            if self.classes is not None and package_name not in self.classes:
+                continue
             _emptydict = {key: 'n/a' for key in dataset}
             setattr(self, package_name, _emptydict)
 
-        self.DEVICES['devices'] = {key: 'n/a' for key in
-                                   self.packages['DEVICE']}  # How does multiple listed devices work?
+        if self.classes is None or 'DEVICES' in self.classes:
+            self.DEVICES['devices'] = {key: 'n/a' for key in
+                                       self.packages['DEVICE']}  # How does multiple listed devices work?
+        if self.classes is not None and 'TPV' in self.classes:
+            self.TPV = TpvRecord()
         # self.POLL = {'tpv': self.TPV, 'sky': self.SKY, 'time': 'n/a', 'active': 'n/a'}
 
+    @staticmethod
+    def sniff_class(gpsd_socket_response):
+        """Cheap look at the class tag without decoding the JSON object
+        Returns:
+        the class (e.g. 'SKY') or None if the tag is not at the start of the object
+        """
+        pos = gpsd_socket_response.find(DataStream.CLASS_TAG, 0, 32)
+        if pos < 0:
+            return None
+        start = gpsd_socket_response.find('"', pos + len(DataStream.CLASS_TAG), pos + 16) + 1
+        if start <= 0:
+            return None
+        end = gpsd_socket_response.find('"', start, start + 16)
+        if end < 0:
+            return None
+        return gpsd_socket_response[start:end]
+
     def unpack(self, gpsd_socket_response):
         """Sets new socket data as DataStream attributes in those initialised dictionaries
         Arguments:
             gpsd_socket_response (json object):
         Provides:
         self attribute dictionaries, e.g., self.TPV['lat'], self.SKY['gdop']
+        in the selective mode TPV is a TpvRecord, e.g. self.TPV.lat
+        Returns:
+        the gpsd class of the unpacked package (e.g. 'TPV') or None,
+        in the selective mode also the sniffed class of a skipped package
         Raises:
         AttributeError: 'str' object has no attribute 'keys' when the device falls out of the system
         ValueError, KeyError: most likely extra, or mangled JSON data, should not happen, but that
         applies to a lot of things.
         """
+        if self.classes is not None:
+            package_name = self.sniff_class(gpsd_socket_response)
+            if package_name is not None and package_name not in self.classes:
+                # nicht abonniert, nicht dekodieren
+                return package_name
         try:
             fresh_data = json.loads(gpsd_socket_response)  # The reserved word 'class' is popped from JSON object class
             package_name = fresh_data.pop('class', 'ERROR')  # gpsd data package errors are also 'ERROR'.
+            if self.classes is not None:
+                if package_name not in self.classes:
+                    return package_name
+                if package_name == 'TPV':
+                    self.TPV.fill(fresh_data)
+                    return package_name
             package = getattr(self, package_name, package_name)  # packages are named for JSON object class
             for key in package.keys():
                 package[key] = fresh_data.get(key, 'n/a')  # Restores 'n/a' if key is absent in the socket response
+            return package_name
 
         except AttributeError:  # 'str' object has no attribute 'keys'
             self.log.error("There is an unexpected exception in DataStream.unpack")
@@ -206,8 +370,100 @@ class DataStream(object):
             return
 
 
+def make_sample_stream(seconds=600, rate=10):
+    """Build a gpsd JSON stream like 'gpspipe -w' records it (SKY/TPV/GST at rate Hz)
+    Arguments:
+        seconds: length of the stream
+        rate: messages per second and class
+    Returns:
+        the stream as bytes
+    """
+    sky = {'class': 'SKY', 'device': '/dev/ttyUSB0', 'hdop': 0.9, 'vdop': 1.2, 'pdop': 1.5,
+           'satellites': [{'PRN': prn, 'el': 40, 'az': prn * 20, 'ss': 30, 'used': True} for prn in range(1, 13)]}
+    lines = []
+    for step in range(seconds * rate):
+        stamp = '2017-07-12T05:%02d:%02d.%dZ' % (step // (60 * rate) % 60, step // rate % 60, step % rate)
+        lat = 52.7406917 + step * 1e-6
+        lon = 10.2307383 + step * 1e-6
+        lines.append(json.dumps(sky, separators=(',', ':')))
+        lines.append(json.dumps({'class': 'TPV', 'device': '/dev/ttyUSB0', 'mode': 3, 'time': stamp, 'ept': 0.005,
+                                 'lat': lat, 'lon': lon, 'alt': 74.5, 'track': 12.3, 'speed': 8.1, 'climb': 0.0},
+                                separators=(',', ':')))
+        lines.append(json.dumps({'class': 'GST', 'device': '/dev/ttyUSB0', 'time': stamp, 'rms': 1.7,
+                                 'major': 3.1, 'minor': 2.2, 'orient': 30.0, 'lat': 2.4, 'lon': 2.1, 'alt': 3.3},
+                                separators=(',', ':')))
+    return ('\n'.join(lines) + '\n').encode('utf-8')
+
+
+def replay_stream(stream, chunk_size=1448):
+    """Send a recorded stream over a socket pair in TCP sized chunks"""
+    reader, writer = socket.socketpair()
+
+    def writer_thread():
+        for pos in range(0, len(stream), chunk_size):
+            writer.sendall(stream[pos:pos + chunk_size])
+        writer.close()
+    threading.Thread(target=writer_thread, daemon=True).start()
+    return reader
+
+
+def benchmark(stream, log):
+    """Throughput of the persistent line buffer against the former makefile() per read
+    Arguments:
+        stream: recorded gpsd output (bytes)
+        log: logger
+    Returns:
+        dict {'buffered': (lines, seconds), 'makefile': (lines, seconds)}
+    """
+    result = {}
+    # persistenter Puffer
+    gpsd_socket = GPSDSocket(log)
+    gpsd_socket.attach(replay_stream(stream))
+    lines = 0
+    start = time()
+    while True:
+        line = gpsd_socket.next(None)
+        if line is None:
+            continue
+        if not line:
+            break
+        lines += 1
+    result['buffered'] = (lines, time() - start)
+    gpsd_socket.streamSock.close()
+    # so wie vorher: pro lesbarem Socket ein makefile() und eine Zeile
+    sock = replay_stream(stream)
+    sock.setblocking(False)
+    selector = selectors.DefaultSelector()
+    selector.register(sock, selectors.EVENT_READ)
+    lines = 0
+    start = time()
+    while True:
+        selector.select(1.0)
+        try:
+            line = sock.makefile().readline()
+        except (OSError, IOError, TypeError):
+            continue
+        if not line:
+            break
+        lines += 1
+    result['makefile'] = (lines, time() - start)
+    sock.close()
+    return result
+
+
 if __name__ == '__main__':
-    print(__doc__)
+    # Benchmark: python3 GpsdConnect.py [aufgezeichneter gpsd stream, z.B. von 'gpspipe -w']
+    bench_log = logging.getLogger("gpsd")
+    bench_log.addHandler(logging.StreamHandler())
+    if len(sys.argv) > 1:
+        with open(sys.argv[1], 'rb') as stream_file:
+            gpsd_stream = stream_file.read()
+    else:
+        gpsd_stream = make_sample_stream()
+    expected = len([line for line in gpsd_stream.split(b'\n') if line.strip()])
+    for name, (count, seconds) in sorted(benchmark(gpsd_stream, bench_log).items()):
+        print('{0:>9}: {1:7d} of {2} lines in {3:.3f}s ({4:.0f} lines/s)'.format(
+            name, count, expected, seconds, count / max(seconds, 1e-9)))
 
 #
 # Someday a cleaner Python interface will live here
@@ -2,11 +2,15 @@
 # coding=utf-8
 
 import os
+import sys
 import threading
 import signal
 import socket
 import logging
 import logging.handlers
+import selectors
+from time import time, sleep
+import DisplayProtocol
 
 log_file = "/var/log/mediaplayer/ipcserver_thread.log"
 socket_file = "/home/pi/mediaplayer/controller/ipc.sock"
@@ -16,7 +20,11 @@ class IpcUnixThreadedServer(threading.Thread):
     """
     KLasse für die Interprozesskommunikation (Hauptprogram mit
     zweitdisplay)
+    Der Thread schläft in select() bis ein Datagramm kommt oder quit_thread()
+    über eine Pipe weckt (kein Timeout, also keine Arbeit im Leerlauf).
     """
+    # maximale Größe eines Datagramms (größere werden erkannt und verworfen, nicht abgeschnitten)
+    RECV_SIZE = DisplayProtocol.MAX_DATAGRAM
 
     def __init__(self, logger, sock_file):
         """
@@ -28,17 +36,36 @@ class IpcUnixThreadedServer(threading.Thread):
         self.log = logger
         self.log.debug("constructor...")
         self.uSockFile = sock_file
-        self.eventCallback = None
+        # Empfänger der Nachrichten, wird bei Änderung ersetzt (der Thread liest ohne Lock)
+        self.eventCallbacks = ()
+        self.callbackLock = threading.Lock()
         self.isRunning = False
+        # Pipe zum Wecken des Threads bei quit_thread()
+        self.wakeRead, self.wakeWrite = os.pipe()
+        os.set_blocking(self.wakeRead, False)
+        os.set_blocking(self.wakeWrite, False)
+        self.wakeCount = 0
+        self.messageCount = 0
+        self.truncCount = 0
 
     def __del__(self):
         """Destruktor"""
         self.log.debug("destructor...")
+        for fd in (self.wakeRead, self.wakeWrite):
+            try:
+                os.close(fd)
+            except OSError:
+                pass
     
     def quit_thread(self):
         """Thread beenden"""
         self.log.info("== initiate unix-socket-server-thread shutdown...==")
         self.isRunning = False
+        try:
+            os.write(self.wakeWrite, b'q')
+        except OSError:
+            # Pipe voll, der Thread wird ohnehin geweckt
+            pass
 
     def is_thread_running(self):
         """
@@ -55,36 +82,95 @@ class IpcUnixThreadedServer(threading.Thread):
             os.remove(self.uSockFile)
         self.log.debug("Opening server socket...")
         server = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
-        # blockend mit TIMEOUT damit der thread beendet werden kann
-        server.setblocking(True)
-        server.settimeout(0.2)
+        # nicht blockierend, gewartet wird in select()
+        server.setblocking(False)
         server.bind(self.uSockFile)
+        selector = selectors.DefaultSelector()
+        selector.register(server, selectors.EVENT_READ)
+        selector.register(self.wakeRead, selectors.EVENT_READ)
         self.log.info("listening...")
         # Hauptschleife  
         while self.isRunning:
-            # empfange Daten (blockierend mit timeout)
+            events = selector.select()
+            self.wakeCount += 1
+            for key, _mask in events:
+                if key.fileobj is server:
+                    self.__drain(server)
+                else:
+                    try:
+                        os.read(self.wakeRead, 64)
+                    except OSError:
+                        pass
+        self.log.info("Unix socket shutting down...")
+        selector.close()
+        server.close()
+        os.remove(self.uSockFile)
+
+    def __drain(self, server):
+        """
+        privat, alle wartenden Datagramme lesen und verteilen
+        Rahmen (DisplayProtocol) gehen als Bytes an die Callbacks, alte Textnachrichten als Text
+        :param server: Socket
+        :return: None
+        """
+        while self.isRunning:
             try:
-                datagram = server.recv(1024)
-            except socket.timeout:
+                datagram, _ancdata, flags, _address = server.recvmsg(IpcUnixThreadedServer.RECV_SIZE)
+            except (BlockingIOError, InterruptedError):
+                return
+            if flags & socket.MSG_TRUNC:
+                # der Rest ist verloren, lieber nichts als einen halben Rahmen anzeigen
+                self.truncCount += 1
+                self.log.error("datagram longer than %d bytes dropped..." % IpcUnixThreadedServer.RECV_SIZE)
                 continue
             if not datagram:
                 continue
+            self.messageCount += 1
+            if DisplayProtocol.is_frame(datagram):
+                message = datagram
             else:
-                message = datagram.decode('utf-8')
-                self.log.debug(message)
-                if self.eventCallback is not None:
-                    self.eventCallback(message)
-        self.log.info("Unix socket shutting down...")
-        server.close()
-        os.remove(self.uSockFile)
+                message = datagram.decode('utf-8', 'replace')
+            self.log.debug(message)
+            for callback in self.eventCallbacks:
+                callback(message)
 
     def set_on_recive(self, callback):
         """
-        Setzte einen Event-Callback
-        :param callback:
+        Setzte einen Event-Callback (ersetzt alle anderen)
+        :param callback: Funktion mit (nachricht) oder None
         :return:
         """
-        self.eventCallback = callback
+        self.callbackLock.acquire()
+        self.eventCallbacks = () if callback is None else (callback,)
+        self.callbackLock.release()
+
+    def add_on_recive(self, callback):
+        """
+        weiteren Event-Callback anmelden
+        :param callback: Funktion mit (nachricht)
+        :return: None
+        """
+        self.callbackLock.acquire()
+        if callback not in self.eventCallbacks:
+            self.eventCallbacks = self.eventCallbacks + (callback,)
+        self.callbackLock.release()
+
+    def remove_on_recive(self, callback):
+        """
+        Event-Callback abmelden
+        :param callback: angemeldete Funktion
+        :return: None
+        """
+        self.callbackLock.acquire()
+        self.eventCallbacks = tuple(cb for cb in self.eventCallbacks if cb != callback)
+        self.callbackLock.release()
+
+    def get_stats(self):
+        """
+        Statistik
+        :return: Dictonary mit wakeups, messages, truncated
+        """
+        return {'wakeups': self.wakeCount, 'messages': self.messageCount, 'truncated': self.truncCount}
 
 
 def on_recive(msg):
@@ -120,5 +206,40 @@ def server_main():
     server_thread.join()
     log.debug("thread ended....")
 
+def idle_test():
+    """Test beim debuggen: CPU im Leerlauf, Datagramme in einem Schub, Zeit bis zum Ende"""
+    log = logging.getLogger("ipctest")
+    log.setLevel(logging.INFO)
+    log.addHandler(logging.StreamHandler(sys.stdout))
+    test_socket = "/tmp/ipc-test-%d.sock" % os.getpid()
+    server_thread = IpcUnixThreadedServer(log, test_socket)
+    received = []
+    server_thread.add_on_recive(received.append)
+    server_thread.add_on_recive(lambda msg: None)
+    server_thread.start()
+    sleep(0.2)
+    cpu = os.times()
+    sleep(2)
+    cpu_idle = (os.times().user - cpu.user) + (os.times().system - cpu.system)
+    log.info("idle 2 s: %.1f ms cpu, %d wakeups" % (cpu_idle * 1000.0, server_thread.get_stats()['wakeups']))
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+    for num in range(100):
+        client.sendto(("info:%d" % num).encode('utf-8'), test_socket)
+    sleep(0.2)
+    log.info("100 datagrams: %d received, stats %s" % (len(received), server_thread.get_stats()))
+    client.sendto(DisplayProtocol.encode_frame(title="Titel", info="Info", clear=True), test_socket)
+    client.sendto(b"info:" + b"x" * IpcUnixThreadedServer.RECV_SIZE, test_socket)
+    sleep(0.2)
+    log.info("frame: %s, stats %s" % (DisplayProtocol.decode_frame(received[-1]), server_thread.get_stats()))
+    start = time()
+    server_thread.quit_thread()
+    server_thread.join()
+    log.info("thread ended after %.2f ms" % ((time() - start) * 1000.0))
+    client.close()
+
+
 if __name__ == '__main__':
-    server_main()
+    if len(sys.argv) > 1 and sys.argv[1] == "test":
+        idle_test()
+    else:
+        server_main()
@@ -4,12 +4,17 @@
 
 
 import requests
-import psutil
-from time import sleep, time
-import re
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from time import time
+from threading import Lock
 import subprocess
-import os
 import logging
+from urllib.parse import urlparse
+from KodiNotify import KodiNotifyThread
+from ProcessSupervisor import ProcessSupervisor
+from KodiResponse import KodiResponse
+from KodiRequest import KodiRequestBuilder
 
 
 class KodiException(Exception):
@@ -25,51 +30,228 @@ class KodiControl:
     """
     Klasse fuer die Kommunikation mit KODI
     """
-    # headers = { 'Content-Type': 'application/json', 'Accept': 'application/json' }
-    woParamTemplate = '{"jsonrpc": "2.0", "id": "1", "method": "%s"}'
-    paramTemplate = '{"jsonrpc": "2.0", "id": "1", "method": "%s", "params": %s }'
     mediaPlayerExec = '/usr/bin/kodi'
     mediaPlayerParam = '-fs'
     mediaPlayerName = 'kodi'
-    rxError = re.compile(".*['\"]error['\"].*", re.IGNORECASE)
-    rxPlOpen = re.compile(".*['\"]Player.Open['\"].*", re.IGNORECASE)
-
-    def __init__(self, logger=None, url="http://localhost:8080/jsonrpc"):
+    # Timeouts (verbinden, lesen) in Sekunden
+    CONNECT_TIMEOUT = 3
+    READ_TIMEOUT = 5
+    # Wiederholungen nur für den Verbindungsaufbau (Kommando ist dann noch nicht beim KODI)
+    CONNECT_RETRIES = 2
+    RETRY_BACKOFF = 0.2
+    # Keep-Alive Verbindungen im Pool
+    POOL_SIZE = 2
+    # Lebensdauer der zwischengespeicherten Antworten (Playlists, Version, Player) in Sekunden
+    CACHE_TTL = 600
+    # Notifications, nach denen der Zwischenspeicher nicht mehr stimmt
+    CACHE_INVALIDATE = ('System.OnRestart', 'System.OnWake', 'System.OnQuit', 'Application.OnQuit',
+                        KodiNotifyThread.EVENT_CONNECT, KodiNotifyThread.EVENT_DISCONNECT)
+
+    def __init__(self, logger=None, url="http://localhost:8080/jsonrpc",
+                 timeout=(CONNECT_TIMEOUT, READ_TIMEOUT), retries=CONNECT_RETRIES, cache_ttl=CACHE_TTL):
         """
         Konstruktor
         :param logger: Programmlogger
         :param url: Verbindungs-URL für KODI-API
+        :param timeout: (verbinden, lesen) in Sekunden
+        :param retries: Wiederholungen beim Verbindungsaufbau
+        :param cache_ttl: Lebensdauer zwischengespeicherter Antworten in Sekunden (0 == aus)
         """
         self.log = logger
         self.playerUrl = url
         self.playerStartTime = int(0)
+        self.timeout = timeout
+        # Anfragen als POST Body mit vorbereitetem Anfang je Methode und steigenden ids
+        self.requestBuilder = KodiRequestBuilder()
+        self.httpAdapter = None
+        self.session = self.__make_session(retries)
+        self.notifyThread = None
+        self.callBackConnect = None
+        self.supervisor = ProcessSupervisor(self.log, self.mediaPlayerName)
+        # Zwischenspeicher für selten veränderte Antworten: Schlüssel -> (Ablaufzeit, Antwort)
+        self.cacheTtl = cache_ttl
+        self.responseCache = {}
+        self.cacheLock = Lock()
+        self.cacheHits = 0
+        self.cacheMisses = 0
         self.log.debug("init, url: %s..." % self.playerUrl)
 
     def __del__(self):
         """Destruktor"""
         self.log.debug("destructor...")
+        self.close()
+
+    def __make_session(self, retries):
+        """
+        privat, HTTP Session mit Keep-Alive Pool erzeugen
+        :param retries: Wiederholungen beim Verbindungsaufbau
+        :return: requests.Session
+        """
+        # nur Verbindungsfehler wiederholen, ein gelesenes Kommando (z.B. Player.Open) nie doppelt schicken
+        retry = Retry(total=retries, connect=retries, read=0, status=0, redirect=0,
+                      backoff_factor=KodiControl.RETRY_BACKOFF)
+        self.httpAdapter = HTTPAdapter(pool_connections=1, pool_maxsize=KodiControl.POOL_SIZE, max_retries=retry)
+        session = requests.Session()
+        session.mount('http://', self.httpAdapter)
+        session.mount('https://', self.httpAdapter)
+        return session
+
+    def close(self):
+        """Verbindungen im Pool und den Kanal für Notifications schließen"""
+        self.stop_notify_listener()
+        session = getattr(self, 'session', None)
+        if session is not None:
+            session.close()
+
+    def start_notify_listener(self, port=KodiNotifyThread.DEFAULT_PORT):
+        """
+        Thread für die Notifications des KODI (TCP JSON-RPC) starten
+        :param port: TCP Port der JSON-RPC Schnittstelle
+        :return: KodiNotifyThread
+        """
+        if self.notifyThread is None:
+            host = urlparse(self.playerUrl).hostname or "localhost"
+            self.notifyThread = KodiNotifyThread(self.log, host, port)
+            self.notifyThread.set_on_notify(self.__on_notify)
+            self.notifyThread.start()
+        return self.notifyThread
+
+    def get_notify_listener(self):
+        """
+        laufender Thread für die Notifications
+        :return: KodiNotifyThread oder None
+        """
+        return self.notifyThread
+
+    def stop_notify_listener(self):
+        """Thread für die Notifications beenden"""
+        self.callBackConnect = None
+        notify = getattr(self, 'notifyThread', None)
+        if notify is not None:
+            notify.clear_on_media_end()
+            notify.clear_on_notify()
+            notify.quit_thread()
+            notify.join(2)
+            self.notifyThread = None
+
+    def set_on_kodi_connect(self, callback):
+        """
+        Callback, wenn der Kanal für Notifications (wieder) verbunden ist, z.B. nach einem Neustart des KODI
+        :param callback: Funktion ohne Parameter, wird im Notify Thread aufgerufen
+        :return: None
+        """
+        self.callBackConnect = callback
+
+    def clear_on_kodi_connect(self):
+        """Callback für das Verbinden löschen"""
+        self.callBackConnect = None
+
+    def __on_notify(self, method, _data):
+        """
+        privat, Callback für alle Notifications vom KODI
+        :param method: Methode der Notification
+        :param _data: Daten der Notification
+        :return: None
+        """
+        if method in KodiControl.CACHE_INVALIDATE:
+            self.log.debug("invalidate response cache on %s..." % method)
+            self.invalidate_cache()
+        callback = self.callBackConnect
+        if method == KodiNotifyThread.EVENT_CONNECT and callback is not None:
+            callback()
+
+    def __cached_request(self, key, method, expected, params=None):
+        """
+        privat, Anfrage über den Zwischenspeicher, nur gültige Antworten vom erwarteten Typ werden gemerkt
+        (das "OK" nach einem Timeout in send_request_json ist keine Antwort des KODI)
+        :param key: Schlüssel im Zwischenspeicher
+        :param method: JSON-RPC Methode
+        :param expected: Typ des Ergebnisses (list oder dict)
+        :param params: Parameter als Dictonary oder None
+        :return: Antwort oder None
+        """
+        now = time()
+        self.cacheLock.acquire()
+        entry = self.responseCache.get(key)
+        if entry is not None and entry[0] > now:
+            self.cacheHits += 1
+            self.cacheLock.release()
+            return entry[1]
+        self.cacheMisses += 1
+        self.cacheLock.release()
+        response = self.send_request_json(method, params)
+        if not response.is_ok():
+            return None
+        if not isinstance(response.result, expected):
+            self.log.warning("unexpected result for %s: %s" % (method, str(response.result)))
+            return None
+        if self.cacheTtl > 0:
+            self.cacheLock.acquire()
+            self.responseCache[key] = (now + self.cacheTtl, response.result)
+            self.cacheLock.release()
+        return response.result
+
+    def invalidate_cache(self, key=None):
+        """
+        Zwischenspeicher leeren
+        :param key: nur diesen Eintrag (z.B. "Playlist.GetPlaylists") oder None für alle
+        :return: None
+        """
+        self.cacheLock.acquire()
+        if key is None:
+            self.responseCache.clear()
+        else:
+            self.responseCache.pop(key, None)
+        self.cacheLock.release()
+
+    def get_cache_stats(self):
+        """
+        Statistik des Zwischenspeichers
+        :return: Dictonary mit hits, misses, entries
+        """
+        return {'hits': self.cacheHits, 'misses': self.cacheMisses, 'entries': len(self.responseCache)}
+
+    def get_connection_stats(self):
+        """
+        Statistik des Verbindungspools
+        :return: Dictonary mit requests, connections (neu aufgebaut) und reused
+        """
+        # nur vorhandene Pools ansehen, ein neu angelegter Pool würde den benutzten verdrängen
+        pools = self.httpAdapter.poolmanager.pools
+        stats = {'requests': 0, 'connections': 0}
+        for key in pools.keys():
+            pool = pools.get(key)
+            if pool is not None:
+                stats['requests'] += pool.num_requests
+                stats['connections'] += pool.num_connections
+        stats['reused'] = max(0, stats['requests'] - stats['connections'])
+        return stats
 
     def is_kodi_running(self):
         """
         Läuft KODI
         :return: True, wenn ja
         """
-        for pid in psutil.pids():
-            p = psutil.Process(pid)
-            if p.name() == self.mediaPlayerName:
-                self.log.debug("kodi is running...")
-                return True
+        # gemerkte PID prüfen, nur wenn die weg ist alle Prozesse durchsuchen
+        if self.supervisor.is_running():
+            self.log.debug("kodi is running (pid %s)..." % str(self.supervisor.get_pid()))
+            return True
         self.log.debug("kodi is NOT running...")
         return False
 
     def app_start_kodi(self):
         """Starte KODI"""
+        # neuer Prozess, gemerkte Antworten gelten nicht mehr
+        self.invalidate_cache()
         # laeuft nicht, ich versuch mal zu starten
         for timerVal in range(20):
             self.log.debug("kodi not running yet...Try to start (%d)" % int(timerVal))
-            pid_kodi = os.spawnl(os.P_NOWAIT, self.mediaPlayerExec, self.mediaPlayerParam)
+            pid_kodi = self.supervisor.spawn(self.mediaPlayerExec, self.mediaPlayerParam)
             self.log.debug("kodi starting with pid %d" % int(pid_kodi))
-            sleep(5)
+            # stirbt der Prozess gleich wieder, sofort neu versuchen
+            if self.supervisor.wait_exit(5):
+                self.log.warning("kodi exits while starting...")
+                continue
             if self.is_kodi_running():
                 self.log.info("kodi should started...")
                 return True
@@ -81,15 +263,18 @@ class KodiControl:
         :return: Erfolgreich?
         """
         self.log.info("quit kodi...")
-        cmd = self.woParamTemplate % "Application.Quit"
-        self.log.debug("result from quit kommando: %s " % str(self.send_request_json(cmd)))
-        sleep(2)
+        # gewolltes Ende, nicht als Absturz melden
+        self.supervisor.stop_watch()
+        self.invalidate_cache()
+        self.is_kodi_running()
+        self.log.debug("result from quit kommando: %s " % str(self.send_request_json("Application.Quit")))
+        self.supervisor.wait_exit(2)
         if self.is_kodi_running():
             # zur Sicherheit killen, wenn quit nicht klappt
             self.log.warning("kodi is always run, try system term...")
             subprocess.run(['/usr/bin/pkill', '-SIGTERM', 'kodi'])
             self.log.warning("kodi is always run, try system term...OK")
-            sleep(1.2)
+            self.supervisor.wait_exit(1.2)
         if self.is_kodi_running():
             # zur Sicherheit killen, wenn quit nicht klappt
             self.log.warning("kodi is always run, try system kill...")
@@ -97,21 +282,36 @@ class KodiControl:
             self.log.warning("kodi is always run, try system kill...OK")
         return True
 
+    def set_on_kodi_exit(self, callback):
+        """
+        Callback, wenn der KODI Prozess endet (Absturz), wird sofort über pidfd gemeldet
+        :param callback: Funktion mit (pid)
+        :return: Wird ein Prozess überwacht?
+        """
+        if not self.is_kodi_running():
+            return False
+        return self.supervisor.start_watch(callback)
+
+    def clear_on_kodi_exit(self):
+        """Callback für das Ende des KODI Prozesses löschen"""
+        self.supervisor.stop_watch()
+
+    def get_process_stats(self):
+        """
+        Statistik der Prozessüberwachung
+        :return: Dictonary mit pid, starts, restarts, exits, scans
+        """
+        return self.supervisor.get_stats()
+
     def app_get_ping(self):
         """
         Erwarte PONG Antwort auf PING beim Kodi
         :return: Erfolgreich?
         """
         self.log.debug("getPing...")
-        cmd = self.woParamTemplate % "JSONRPC.Ping"
-        try:
-            result = self.send_request_json(cmd)
-            self.log.debug("answer for ping: %s" % str(result))
-            if self.rxError.match(str(result)) is None:
-                return True
-            return False
-        except KodiException:
-            return False
+        response = self.send_request_json("JSONRPC.Ping")
+        self.log.debug("answer for ping: %s" % str(response))
+        return response.is_ok()
 
     def app_get_json_version(self):
         """
@@ -119,11 +319,7 @@ class KodiControl:
         :return: Version oder None
         """
         self.log.debug("getJsonVersion...")
-        cmd = self.woParamTemplate % "JSONRPC.Version"
-        result = self.send_request_json(cmd)
-        if self.rxError.match(str(result)) is None:
-            return result
-        return None
+        return self.__cached_request("JSONRPC.Version", "JSONRPC.Version", dict)
 
     def app_set_volume(self, volume=int(50)):
         """
@@ -132,21 +328,12 @@ class KodiControl:
         :return: Antwort oder None
         """
         self.log.debug("app_set_volume...")
-        params = '{ "volume": %d}' % int(volume)
-        cmd = self.paramTemplate % ("Application.SetVolume", params)
-        result = self.send_request_json(cmd)
-        if self.rxError.match(str(result)) is None:
-            return result
-        return None
+        return self.send_request_json("Application.SetVolume", {"volume": int(volume)}).value()
 
     def gui_goto_home(self):
         """HOME Screen der GUI ansteuern"""
         self.log.debug("goto homescreen...")
-        cmd = self.woParamTemplate % "Input.Home"
-        result = self.send_request_json(cmd)
-        if self.rxError.match(str(result)) is None:
-            return result
-        return None
+        return self.send_request_json("Input.Home").value()
 
     def gui_show_info_notification(self, title, message, timeout):
         """
@@ -188,13 +375,8 @@ class KodiControl:
         :return: Antwort vom KODI oder None
         """
         self.log.debug("show notification %s..." % m_type)
-        params = '{ "title": "%s", "message": "%s", "image": "%s", "displaytime": %d }' \
-            % (title, message, m_type, timeout)
-        cmd = self.paramTemplate % ("GUI.ShowNotification", params)
-        result = self.send_request_json(cmd)
-        if self.rxError.match(str(result)) is None:
-            return result
-        return None
+        params = {"title": title, "message": message, "image": m_type, "displaytime": int(timeout)}
+        return self.send_request_json("GUI.ShowNotification", params).value()
 
     def player_get_players(self, which="all"):
         """
@@ -203,12 +385,8 @@ class KodiControl:
         :return: Playerliste oder None
         """
         self.log.debug("get %s Players..." % which)
-        params = '{ "media": "%s" }' % which
-        cmd = self.paramTemplate % ("Player.GetPlayers", params)
-        result = self.send_request_json(cmd)
-        if self.rxError.match(str(result)) is None:
-            return result
-        return None
+        return self.__cached_request("Player.GetPlayers/%s" % which, "Player.GetPlayers", list,
+                                     {"media": which})
 
     def player_get_playing(self):
         """
@@ -216,8 +394,7 @@ class KodiControl:
         :return:
         """
         self.log.debug("get Playing...")
-        cmd = self.woParamTemplate % "Player.GetActivePlayers"
-        ret_val = self.send_request_json(cmd)
+        ret_val = self.send_request_json("Player.GetActivePlayers").value()
         if isinstance(ret_val, list):
             return ret_val
         return None
@@ -241,20 +418,17 @@ class KodiControl:
             return True
         return False
 
-    def player_ppen_playlist(self, playlistid):
+    def player_ppen_playlist(self, playlistid, position=0):
         """
         Öffne eine Playlist mit ID
         :param playlistid: welche Playlist öffnen?
+        :param position: ab welchem Eintrag (zum Fortsetzen)
         :return: Erfolgreich oder None
         """
         self.playerStartTime = int(time())
-        self.log.debug("open Playlist %d..." % int(playlistid))
-        params = '{ "item": { "playlistid": %s, "position": 0 } }' % int(playlistid)
-        cmd = self.paramTemplate % ("Player.Open", params)
-        result = self.send_request_json(cmd)
-        if self.rxError.match(str(result)) is None:
-            return result
-        return None
+        self.log.debug("open Playlist %d at %d..." % (int(playlistid), int(position)))
+        params = {"item": {"playlistid": int(playlistid), "position": int(position)}}
+        return self.send_request_json("Player.Open", params).value()
 
     def player_open_file(self, file_name):
         """
@@ -264,13 +438,75 @@ class KodiControl:
         """
         self.playerStartTime = int(time())
         self.log.debug("open File %s..." % file_name)
-        params = '{ "item": { "file": "%s" } }' % file_name
-        cmd = self.paramTemplate % ("Player.Open", params)
-        result = self.send_request_json(cmd)
-        if self.rxError.match(str(result)) is None:
-            return result
+        return self.send_request_json("Player.Open", {"item": {"file": file_name}}).value()
+
+    def player_set_repeat(self, playerid, repeat="all"):
+        """
+        Wiederholung des Players setzen
+        :param playerid: id des Players
+        :param repeat: "off", "one" oder "all"
+        :return: Antwort von KODI oder None
+        """
+        self.log.debug("set repeat %s..." % repeat)
+        return self.send_request_json("Player.SetRepeat", {"playerid": int(playerid), "repeat": repeat}).value()
+
+    def player_get_position(self):
+        """
+        Position des aktiven Players (zum späteren Fortsetzen)
+        :return: Dictonary mit playerid, type, playlistid, position, time (Sekunden) oder None
+        """
+        self.log.debug("get player position...")
+        players = self.player_get_playing()
+        if not players:
+            return None
+        player = players[0]
+        params = {"playerid": int(player["playerid"]), "properties": ["playlistid", "position", "time"]}
+        result = self.send_request_json("Player.GetProperties", params).value()
+        if not isinstance(result, dict):
+            return None
+        play_time = result.get("time", {})
+        seconds = play_time.get("hours", 0) * 3600 + play_time.get("minutes", 0) * 60 + play_time.get("seconds", 0)
+        return {"playerid": player["playerid"], "type": player.get("type"), "playlistid": result.get("playlistid"),
+                "position": result.get("position"), "time": seconds}
+
+    def player_seek_time(self, playerid, seconds):
+        """
+        Springe im Medium an eine Zeit
+        :param playerid: id des Players
+        :param seconds: Zeit in Sekunden
+        :return: Antwort von KODI oder None
+        """
+        self.log.debug("seek to %d seconds..." % int(seconds))
+        seconds = int(seconds)
+        play_time = {"hours": seconds // 3600, "minutes": (seconds // 60) % 60, "seconds": seconds % 60,
+                     "milliseconds": 0}
+        version = self.app_get_json_version()
+        if version is not None and int(version["version"]["major"]) >= 10:
+            # ab API 10 (KODI 18) als {"time": ...}
+            play_time = {"time": play_time}
+        return self.send_request_json("Player.Seek", {"playerid": int(playerid), "value": play_time}).value()
+
+    def app_get_picture_duration(self):
+        """
+        Anzeigedauer der Bilder in der Diashow lesen
+        :return: Anzeigedauer in Sekunden oder None
+        """
+        self.log.debug("get slideshow staytime...")
+        result = self.send_request_json("Settings.GetSettingValue", {"setting": "slideshow.staytime"}).value()
+        if isinstance(result, dict) and isinstance(result.get("value"), int):
+            return result["value"]
         return None
 
+    def app_set_picture_duration(self, seconds):
+        """
+        Anzeigedauer der Bilder in der Diashow setzen (globale Einstellung im Profil des KODI)
+        :param seconds: Anzeigedauer in Sekunden
+        :return: Antwort von KODI oder None
+        """
+        self.log.debug("set slideshow staytime %d..." % int(seconds))
+        params = {"setting": "slideshow.staytime", "value": int(seconds)}
+        return self.send_request_json("Settings.SetSettingValue", params).value()
+
     def player_stop(self, playerid):
         """
         Stoppe Player mit playerid
@@ -279,12 +515,7 @@ class KodiControl:
         """
         self.playerStartTime = 0
         self.log.debug("play stop...")
-        params = '{ "playerid": %s }' % playerid
-        cmd = self.paramTemplate % ("Player.Stop", params)
-        result = self.send_request_json(cmd)
-        if self.rxError.match(str(result)) is None:
-            return result
-        return None
+        return self.send_request_json("Player.Stop", {"playerid": int(playerid)}).value()
 
     def player_all_stop(self):
         """
@@ -296,10 +527,9 @@ class KodiControl:
         player_arr = self.player_get_playing()
         if player_arr is None:
             return True
-        for player in player_arr:
-            params = '{ "playerid": %s }' % player["playerid"]
-            cmd = self.paramTemplate % ("Player.Stop", params)
-            self.send_request_json(cmd)
+        # alle in einer Batch Anfrage stoppen
+        commands = [("Player.Stop", {"playerid": int(player["playerid"])}) for player in player_arr]
+        self.send_batch_json(commands)
         self.playerStartTime = 0
         return True
 
@@ -310,12 +540,7 @@ class KodiControl:
         :return: erfolg oder None
         """
         self.log.debug("play Pause toggle...")
-        params = '{ "playerid": %s, "play": "toggle" }' % playerid
-        cmd = self.paramTemplate % ("Player.PlayPause", params)
-        result = self.send_request_json(cmd)
-        if self.rxError.match(str(result)) is None:
-            return result
-        return None
+        return self.send_request_json("Player.PlayPause", {"playerid": int(playerid), "play": "toggle"}).value()
 
     def playlist_get_lists(self):
         """
@@ -323,11 +548,7 @@ class KodiControl:
         :return:
         """
         self.log.debug("get playlists...")
-        cmd = self.woParamTemplate % "Playlist.GetPlaylists"
-        result = self.send_request_json(cmd)
-        if self.rxError.match(str(result)) is None:
-            return result
-        return None
+        return self.__cached_request("Playlist.GetPlaylists", "Playlist.GetPlaylists", list)
 
     def playlist_clear_list(self, listid):
         """
@@ -336,12 +557,7 @@ class KodiControl:
         :return: ERfolgreich oder None
         """
         self.log.debug("clear playlist %d..." % int(listid))
-        params = '{ "playlistid": %d }' % listid
-        cmd = self.paramTemplate % ("Playlist.Clear", params)
-        result = self.send_request_json(cmd)
-        if self.rxError.match(str(result)) is None:
-            return result
-        return None
+        return self.send_request_json("Playlist.Clear", {"playlistid": int(listid)}).value()
 
     def playlist_clear_all(self):
         """
@@ -352,8 +568,12 @@ class KodiControl:
         lists = self.playlist_get_lists()
         if lists is None:
             return False
-        for play_list in lists:
-            self.playlist_clear_list(play_list["playlistid"])
+        # alle in einer Batch Anfrage leeren
+        commands = [("Playlist.Clear", {"playlistid": int(play_list["playlistid"])}) for play_list in lists]
+        responses = self.send_batch_json(commands)
+        for response in responses:
+            if not response.is_ok():
+                self.log.warning("clear playlist failed: %s" % str(response.error))
         return True
 
     def playlist_get_video_list(self):
@@ -394,47 +614,89 @@ class KodiControl:
         :return: Erfolg oder None
         """
         self.log.debug("add item to playlist %d..." % int(listid))
-        params = '{ "item": { "file": "%s" }, "playlistid": %d }' % (item, listid)
-        cmd = self.paramTemplate % ("Playlist.Add", params)
-        result = self.send_request_json(cmd)
-        if None is self.rxError.match(str(result)):
-            return result
-        return None
+        params = {"item": {"file": item}, "playlistid": int(listid)}
+        return self.send_request_json("Playlist.Add", params).value()
 
-    def send_request_json(self, params):
+    def playlist_add_items(self, listid, items):
         """
-        Sende eine JSON codierte Nachricht/Kommando an KODI
-        :param params: Die Nachricht als JSON String
-        :return: Erfolg oder ERROR
+        füge der Liste listid alle Einträge items mit einer Anfrage hinzu
+        :param listid: Liste zum zufügen
+        :param items: Liste der Dateien
+        :return: Erfolg oder None
         """
-        self.log.debug("start get json request...")
-        my_data = {'request': params}
-        self.log.debug("send params to kodi: %s" % str(params))
+        self.log.debug("add %d items to playlist %d..." % (len(items), int(listid)))
+        params = {"item": [{"file": item} for item in items], "playlistid": int(listid)}
+        return self.send_request_json("Playlist.Add", params).value()
+
+    def send_batch_json(self, commands):
+        """
+        Sende mehrere Kommandos als JSON-RPC 2.0 Batch in einer Anfrage an KODI
+        :param commands: Liste von (methode, params als Dictonary oder None)
+        :return: Liste von KodiResponse in der Reihenfolge der Kommandos
+        """
+        if len(commands) == 0:
+            return []
+        self.log.debug("start batch json request with %d commands..." % len(commands))
+        ids, data = self.requestBuilder.build_batch(commands)
+        try:
+            r = self.session.post(self.playerUrl, data=data, headers=KodiRequestBuilder.HEADERS,
+                                  timeout=self.timeout)
+            resp = r.json()
+            self.log.debug("send batch to kodi: OK")
+        except Exception as msg:
+            self.log.error("error while batch request: %s" % str(msg))
+            return [KodiResponse.failure("batch request failed %s" % str(msg))] * len(commands)
+        if not isinstance(resp, list):
+            # fehler für den ganzen Batch (z.B. parse error)
+            self.log.error('batch request error: \"%s\"' % str(resp))
+            return [KodiResponse.from_message(resp)] * len(commands)
+        #
+        # Antworten über die id zuordnen, die Reihenfolge ist nicht garantiert
+        #
+        by_id = {}
+        for answer in resp:
+            response = KodiResponse.from_message(answer)
+            by_id[response.reqId] = response
+        responses = []
+        for cmd_id in ids:
+            response = by_id.get(cmd_id)
+            if response is None:
+                response = KodiResponse.failure("no response for id %d" % cmd_id, cmd_id)
+            if not response.is_ok():
+                self.log.error('batch request error: \"%s\"' % str(response.error))
+            responses.append(response)
+        self.log.debug("batch results: %s" % str(responses))
+        return responses
+
+    def send_request_json(self, method, params=None):
+        """
+        Sende ein Kommando als JSON-RPC POST an KODI
+        :param method: JSON-RPC Methode
+        :param params: Parameter als Dictonary oder None
+        :return: KodiResponse (result oder error)
+        """
+        req_id, data = self.requestBuilder.build(method, params)
+        self.log.debug("send request %d to kodi: %s %s" % (req_id, method, str(params)))
         try:
-            r = requests.get(self.playerUrl, params=my_data, timeout=(3, 5))
+            r = self.session.post(self.playerUrl, data=data, headers=KodiRequestBuilder.HEADERS,
+                                  timeout=self.timeout)
             resp = r.json()
             self.log.debug("send params to kodi: OK")
         except ConnectionRefusedError:
             self.log.error("connection error")
-            return {"error": "connection error"}
+            return KodiResponse.failure("connection error")
         except requests.exceptions.ReadTimeout as msg:
             self.log.error("timeout while GET %s" % str(msg))
-            if None is self.rxError.match(str(msg)):                
-                # TODO: workarround, bei der RASPI Version haengt der aufruf
-                return "OK"
-            return {"error": "timeout while GET %s" % str(msg)}
+            # TODO: workarround, bei der RASPI Version haengt der aufruf
+            return KodiResponse("OK")
         except Exception as msg:
             self.log.error("unexpected error")
-            return {"error": "unexcepcted error %s" % str(msg)}
-        try:
-            ret_val = resp["result"]
-            self.log.debug("request result: %s" % str(ret_val))
-            return ret_val
-        except Exception:
-            self.log.warning("cant't find result from response. try error...")
-            try:
-                ret_val = resp["error"]
-                self.log.error('request error: \"%s\"' % ret_val)
-                return ret_val
-            except Exception:
-                return {"error": "not an valid response from kodi"}
+            return KodiResponse.failure("unexcepcted error %s" % str(msg))
+        response = KodiResponse.from_message(resp)
+        if response.reqId is not None and response.reqId != req_id:
+            self.log.warning("answer for id %s, expected %d" % (str(response.reqId), req_id))
+        if response.is_ok():
+            self.log.debug("request result: %s" % str(response.result))
+        else:
+            self.log.error('request error: \"%s\"' % str(response.error))
+        return response
@@ -0,0 +1,401 @@
+#!/usr/bin/python3
+# coding=utf-8
+#
+# Benachrichtigungen vom KODI über den JSON-RPC TCP Kanal (Port 9090)
+
+import re
+import sys
+import json
+import codecs
+import socket
+import logging
+from time import time, sleep
+from threading import Thread, Lock, Event
+
+__author__ = 'Dirk'
+__copyright__ = 'Copyright 2017'
+__license__ = 'GPL'
+__version__ = '0.1'
+
+
+class KodiNotifyThread(Thread):
+    """
+    Thread, der die Notifications des KODI (Player.OnPlay, Player.OnAVStart, Player.OnStop)
+    vom TCP Kanal liest und über Callbacks weitergibt.
+    KODI schickt die JSON Objekte ohne Trennzeichen hintereinander,
+    deshalb wird mit raw_decode aus einem Puffer gelesen.
+    """
+    DEFAULT_PORT = 9090
+    RECV_SIZE = 4096
+    # größter Puffer für ein unvollständiges Objekt, darüber wird verworfen
+    MAX_BUFFER = 1024 * 1024
+    # Zeichen, die für das Ende eines Objektes zählen (Klammern, Strings, Escape)
+    rxToken = re.compile(r'[{}"\\]')
+    # Wartezeit in Sekunden vor einem neuen Verbindungsversuch
+    RECONNECT_TIME = 2
+    # Timeout für den Verbindungsaufbau
+    CONNECT_TIMEOUT = 3
+    # Notifications, die den Zustand des Players ändern
+    EVENT_PLAY = ('Player.OnPlay', 'Player.OnAVStart', 'Player.OnResume')
+    EVENT_STOP = 'Player.OnStop'
+    # eigene Ereignisse für den Zustand der Verbindung (KODI neu gestartet oder beendet)
+    EVENT_CONNECT = 'Notify.OnConnect'
+    EVENT_DISCONNECT = 'Notify.OnDisconnect'
+
+    def __init__(self, logger, host="localhost", port=DEFAULT_PORT):
+        """
+        Konstruktor
+        :param logger: Programmlogger
+        :param host: Host, auf dem KODI läuft
+        :param port: TCP Port der JSON-RPC Schnittstelle
+        """
+        Thread.__init__(self)
+        self.daemon = True
+        self.log = logger
+        self.kodiHost = host
+        self.kodiPort = port
+        self.sock = None
+        self.isConnected = False
+        self.isRunning = False
+        self.quitEvent = Event()
+        self.lock = Lock()
+        self.decoder = json.JSONDecoder()
+        self.textDecoder = None
+        self.readBuffer = ''
+        self.isPlaying = False
+        self.lastEventTime = 0
+        self.callBackMediaEnd = None
+        self.callBackNotify = None
+        self.log.debug("notify thread for %s:%d instantiate..." % (self.kodiHost, self.kodiPort))
+
+    def set_on_media_end(self, callback):
+        """
+        Callback für das Ende eines Mediums (Player.OnStop mit end == true)
+        :param callback: Funktion ohne Parameter
+        :return: None
+        """
+        self.lock.acquire()
+        self.callBackMediaEnd = callback
+        self.lock.release()
+
+    def clear_on_media_end(self):
+        """Callback für das Ende eines Mediums löschen"""
+        self.set_on_media_end(None)
+
+    def set_on_notify(self, callback):
+        """
+        Callback für alle Notifications
+        :param callback: Funktion mit (methode, data)
+        :return: None
+        """
+        self.lock.acquire()
+        self.callBackNotify = callback
+        self.lock.release()
+
+    def clear_on_notify(self):
+        """Callback für alle Notifications löschen"""
+        self.set_on_notify(None)
+
+    def is_connected(self):
+        """
+        Besteht die Verbindung zum KODI?
+        :return: verbunden?
+        """
+        return self.isConnected
+
+    def is_playing(self):
+        """
+        Spielt der KODI laut Notifications gerade etwas?
+        :return: spielt?
+        """
+        return self.isPlaying
+
+    def quit_thread(self):
+        """
+        Thread beenden, ein blockierendes recv() wird über shutdown() sofort beendet
+        :return: None
+        """
+        self.log.debug("notify thread should quit...")
+        self.isRunning = False
+        self.quitEvent.set()
+        sock = self.sock
+        if sock is not None:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    def run(self):
+        """
+        Hauptschleife des Thread
+        :return: None
+        """
+        self.isRunning = True
+        while self.isRunning:
+            if not self.isConnected:
+                if not self.__connect():
+                    # quit_thread() beendet das Warten sofort
+                    self.quitEvent.wait(KodiNotifyThread.RECONNECT_TIME)
+                    continue
+            self.__read_data()
+        self.__close()
+        self.log.debug("notify thread ends...")
+
+    def __connect(self):
+        """
+        privat, zum KODI verbinden
+        :return: Erfolgreich?
+        """
+        try:
+            self.sock = socket.create_connection((self.kodiHost, self.kodiPort), KodiNotifyThread.CONNECT_TIMEOUT)
+            # blockierend lesen, quit_thread() weckt über shutdown()
+            self.sock.settimeout(None)
+            self.textDecoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+            self.readBuffer = ''
+            self.isConnected = True
+            self.log.info("notify channel to kodi %s:%d connected..." % (self.kodiHost, self.kodiPort))
+            self.__notify_state(KodiNotifyThread.EVENT_CONNECT)
+            return True
+        except OSError as msg:
+            self.log.debug("can't connect notify channel to kodi: %s" % msg)
+            self.__close()
+            return False
+
+    def __close(self):
+        """privat, Verbindung schliessen"""
+        was_connected = self.isConnected
+        self.isConnected = False
+        self.isPlaying = False
+        if self.sock is not None:
+            try:
+                self.sock.close()
+            except OSError:
+                pass
+            self.sock = None
+        if was_connected:
+            self.log.warning("notify channel to kodi closed...")
+            self.__notify_state(KodiNotifyThread.EVENT_DISCONNECT)
+
+    def __notify_state(self, method):
+        """
+        privat, Änderung der Verbindung an den Callback für alle Notifications geben
+        :param method: EVENT_CONNECT oder EVENT_DISCONNECT
+        :return: None
+        """
+        self.lock.acquire()
+        callback_notify = self.callBackNotify
+        self.lock.release()
+        if callback_notify is not None:
+            callback_notify(method, None)
+
+    def __read_data(self):
+        """
+        privat, Daten lesen und alle vollständigen Nachrichten auswerten
+        :return: None
+        """
+        try:
+            data = self.sock.recv(KodiNotifyThread.RECV_SIZE)
+        except OSError as msg:
+            if self.isRunning:
+                self.log.error("error while read notify channel: %s" % msg)
+            self.__close()
+            return
+        if not data:
+            # KODI beendet oder quit_thread()
+            self.__close()
+            return
+        self.readBuffer += self.textDecoder.decode(data)
+        messages, self.readBuffer = self.parse_messages(self.decoder, self.readBuffer, self.log)
+        for message in messages:
+            self.__dispatch(message)
+
+    @staticmethod
+    def object_end(buffer, pos):
+        """
+        Ende des JSON Objektes, das bei pos beginnt (Klammern ausserhalb von Strings zählen)
+        :param buffer: gelesener Text
+        :param pos: Position der öffnenden Klammer
+        :return: Position hinter der schliessenden Klammer oder -1, wenn das Objekt noch nicht vollständig ist
+        """
+        depth = 0
+        in_string = False
+        skip = -1
+        for match in KodiNotifyThread.rxToken.finditer(buffer, pos):
+            index = match.start()
+            if index == skip:
+                # Zeichen nach einem Backslash
+                continue
+            char = buffer[index]
+            if in_string:
+                if char == '\\':
+                    skip = index + 1
+                elif char == '"':
+                    in_string = False
+            elif char == '"':
+                in_string = True
+            elif char == '{':
+                depth += 1
+            elif char == '}':
+                depth -= 1
+                if depth == 0:
+                    return index + 1
+        return -1
+
+    @staticmethod
+    def parse_messages(decoder, buffer, log=None):
+        """
+        alle vollständigen JSON Objekte aus dem Puffer holen.
+        Was kein JSON ist, wird bis zur nächsten "{" verworfen, damit der Puffer nicht
+        an kaputten Bytes hängen bleibt und endlos wächst.
+        :param decoder: json.JSONDecoder
+        :param buffer: gelesener Text
+        :param log: Logger für verworfene Daten oder None
+        :return: (Liste der Objekte, unvollständiger Rest)
+        """
+        messages = []
+        pos = 0
+        length = len(buffer)
+        while True:
+            # Leerzeichen/Zeilenenden zwischen den Objekten überspringen
+            while pos < length and buffer[pos] in ' \t\r\n':
+                pos += 1
+            if pos >= length:
+                return messages, ''
+            try:
+                message, end = decoder.raw_decode(buffer, pos)
+                messages.append(message)
+                pos = end
+                continue
+            except ValueError as msg:
+                error = msg
+            if buffer[pos] == '{':
+                end = KodiNotifyThread.object_end(buffer, pos)
+                if end < 0 and length - pos <= KodiNotifyThread.MAX_BUFFER:
+                    # Objekt noch nicht vollständig
+                    return messages, buffer[pos:]
+                if end < 0:
+                    end = pos + 1
+            else:
+                end = pos
+            # kaputtes Objekt oder kein JSON: bis zur nächsten "{" verwerfen
+            next_pos = buffer.find('{', max(end, pos + 1))
+            if next_pos < 0:
+                next_pos = length
+            if log is not None:
+                log.warning("drop %d bytes from kodi (%s): %r" % (next_pos - pos, error, buffer[pos:next_pos][:200]))
+            pos = next_pos
+
+    def __dispatch(self, message):
+        """
+        privat, eine Nachricht auswerten
+        :param message: JSON Objekt vom KODI
+        :return: None
+        """
+        if not isinstance(message, dict) or 'method' not in message:
+            # Antworten auf Anfragen interessieren hier nicht
+            return
+        method = message['method']
+        data = message.get('params', {}).get('data')
+        self.lastEventTime = time()
+        self.log.debug("kodi notification %s: %s" % (method, str(data)))
+        is_media_end = False
+        if method in KodiNotifyThread.EVENT_PLAY:
+            self.isPlaying = True
+        elif method == KodiNotifyThread.EVENT_STOP:
+            self.isPlaying = False
+            # end == false: gestoppt (z.B. player_all_stop), end == true: Medium ist zu Ende
+            is_media_end = isinstance(data, dict) and data.get('end') is True
+        self.lock.acquire()
+        callback_notify = self.callBackNotify
+        callback_end = self.callBackMediaEnd
+        self.lock.release()
+        if callback_notify is not None:
+            callback_notify(method, data)
+        if is_media_end and callback_end is not None:
+            callback_end()
+
+    @staticmethod
+    def make_logger(_level):
+        """
+        Logger für den Test erzeugen
+        :param _level: Loglevel
+        :return: Logger
+        """
+        log = logging.getLogger("kodi-notify")
+        log.setLevel(_level)
+        handler = logging.StreamHandler(sys.stdout)
+        handler.setFormatter(logging.Formatter("%(asctime)s - %(levelname)s - %(message)s"))
+        log.addHandler(handler)
+        return log
+
+
+def make_notification(method, data):
+    """
+    Notification wie vom KODI erzeugen
+    :param method: z.B. Player.OnStop
+    :param data: Daten der Notification
+    :return: JSON Text
+    """
+    return json.dumps({"jsonrpc": "2.0", "method": method, "params": {"data": data, "sender": "xbmc"}})
+
+
+def run_stub_server(port, events, log):
+    """
+    einfacher Ersatz für den KODI TCP Kanal, schickt die Notifications mit Pausen.
+    Die Nachrichten werden ohne Trennzeichen und in kleinen Stücken geschickt wie beim KODI.
+    :param port: TCP Port
+    :param events: Liste von (pause in Sekunden, methode, data)
+    :param log: Logger
+    :return: Liste der Sendezeiten (time()) je Event
+    """
+    server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    server.bind(('127.0.0.1', port))
+    server.listen(1)
+    send_times = []
+
+    def serve():
+        conn, _addr = server.accept()
+        for pause, method, data in events:
+            sleep(pause)
+            text = make_notification(method, data).encode('utf-8')
+            send_times.append(time())
+            # in zwei Stücken schicken, der Empfänger muss zusammensetzen
+            half = len(text) // 2
+            conn.sendall(text[:half])
+            sleep(0.01)
+            conn.sendall(text[half:])
+        sleep(0.5)
+        conn.close()
+        server.close()
+        log.debug("stub server ends...")
+
+    Thread(target=serve, daemon=True).start()
+    return send_times
+
+
+def main():
+    """Main zum Testen mit dem Stub Server"""
+    log = KodiNotifyThread.make_logger(logging.DEBUG)
+    port = 19090
+    item = {"item": {"type": "movie", "title": "Testvideo"}, "player": {"playerid": 1, "speed": 1}}
+    events = [(0.2, 'Player.OnPlay', item),
+              (0.1, 'Player.OnAVStart', item),
+              (0.3, 'Player.OnStop', {"item": item["item"], "end": False}),
+              (0.2, 'Player.OnPlay', item),
+              (0.5, 'Player.OnStop', {"item": item["item"], "end": True})]
+    send_times = run_stub_server(port, events, log)
+    media_end = Event()
+    notify = KodiNotifyThread(log, '127.0.0.1', port)
+    notify.set_on_media_end(media_end.set)
+    notify.start()
+    if media_end.wait(10):
+        log.info("media end received %.1f ms after send" % ((time() - send_times[-1]) * 1000.0))
+    else:
+        log.error("no media end received!")
+    notify.quit_thread()
+    notify.join(2)
+
+
+if __name__ == '__main__':
+    main()
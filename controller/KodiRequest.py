@@ -0,0 +1,129 @@
+#!/usr/bin/python3
+# coding=utf-8
+#
+# JSON-RPC 2.0 Anfragen an KODI mit vorbereiteten Bytes je Methode
+
+import sys
+import json
+import logging
+from itertools import count
+from time import time
+from urllib.parse import urlencode
+
+__author__ = 'Dirk'
+__copyright__ = 'Copyright 2017'
+__license__ = 'GPL'
+__version__ = '0.1'
+
+
+class KodiRequestBuilder:
+    """
+    Baut die Anfragen als Bytes für einen POST Body.
+    Der feste Teil je Methode ('{"jsonrpc":"2.0","method":"...","id":') wird einmal erzeugt und gemerkt,
+    je Anfrage kommen nur die id und die mit json.dumps kodierten Parameter dazu.
+    Die ids steigen monoton, so lassen sich Antworten sicher zuordnen.
+    """
+    # Header für den POST
+    HEADERS = {'Content-Type': 'application/json'}
+    __PARAMS = b',"params":'
+    __END = b'}'
+
+    def __init__(self):
+        """Konstruktor"""
+        self.prefixes = {}
+        # next() auf itertools.count ist unter dem GIL atomar, also auch aus mehreren Threads sicher
+        self.idCounter = count(1)
+        self.encoder = json.JSONEncoder(ensure_ascii=False, separators=(',', ':'))
+
+    def __prefix(self, method):
+        """
+        privat, fester Teil einer Methode
+        :param method: JSON-RPC Methode
+        :return: Bytes bis zur id
+        """
+        prefix = self.prefixes.get(method)
+        if prefix is None:
+            prefix = ('{"jsonrpc":"2.0","method":%s,"id":' % json.dumps(method)).encode('utf-8')
+            self.prefixes[method] = prefix
+        return prefix
+
+    def next_id(self):
+        """
+        neue id für eine Anfrage
+        :return: id
+        """
+        return next(self.idCounter)
+
+    def encode(self, method, params, req_id):
+        """
+        eine Anfrage mit vorgegebener id kodieren
+        :param method: JSON-RPC Methode
+        :param params: Parameter als Dictonary (oder Liste) oder None
+        :param req_id: id
+        :return: Bytes
+        """
+        if params is None:
+            return b''.join((self.__prefix(method), b'%d' % req_id, KodiRequestBuilder.__END))
+        return b''.join((self.__prefix(method), b'%d' % req_id, KodiRequestBuilder.__PARAMS,
+                         self.encoder.encode(params).encode('utf-8'), KodiRequestBuilder.__END))
+
+    def build(self, method, params=None):
+        """
+        eine Anfrage bauen
+        :param method: JSON-RPC Methode
+        :param params: Parameter als Dictonary oder None
+        :return: (id, Bytes)
+        """
+        req_id = self.next_id()
+        return req_id, self.encode(method, params, req_id)
+
+    def build_batch(self, commands):
+        """
+        Batch Anfrage bauen
+        :param commands: Liste von (methode, params als Dictonary oder None)
+        :return: (Liste der ids in der Reihenfolge der Kommandos, Bytes)
+        """
+        ids = []
+        entries = []
+        for method, params in commands:
+            req_id = self.next_id()
+            ids.append(req_id)
+            entries.append(self.encode(method, params, req_id))
+        return ids, b'[' + b','.join(entries) + b']'
+
+
+def main():
+    """Main zum Testen: alte Vorlagen mit URL Kodierung gegen den Builder"""
+    log = logging.getLogger("request")
+    log.setLevel(logging.INFO)
+    log.addHandler(logging.StreamHandler(sys.stdout))
+    builder = KodiRequestBuilder()
+    param_template = '{"jsonrpc": "2.0", "id": "1", "method": "%s", "params": %s }'
+    file_name = "/media/pi/mediastick/urlaub/tag 01/IMG_0001.jpg"
+    loops = 20000
+    start = time()
+    for _ in range(loops):
+        params = '{ "item": { "file": "%s" } }' % file_name
+        urlencode({'request': param_template % ("Player.Open", params)})
+    old_time = (time() - start) / loops
+    start = time()
+    for _ in range(loops):
+        builder.build("Player.Open", {"item": {"file": file_name}})
+    new_time = (time() - start) / loops
+    log.info("Player.Open: template+urlencode %.2f us, builder %.2f us" % (old_time * 1e6, new_time * 1e6))
+    # Anführungszeichen im Titel zerstören das JSON der alten Vorlage
+    title = 'Das "Blaue" Haus'
+    old = param_template % ("GUI.ShowNotification", '{ "title": "%s", "message": "x" }' % title)
+    try:
+        json.loads(old)
+        log.info("template with quotes: valid")
+    except ValueError as msg:
+        log.info("template with quotes: INVALID (%s)" % msg)
+    _req_id, data = builder.build("GUI.ShowNotification", {"title": title, "message": "x"})
+    log.info("builder with quotes: %s" % json.loads(data.decode('utf-8'))["params"])
+    ids, data = builder.build_batch([("Player.Stop", {"playerid": 1}), ("JSONRPC.Ping", None)])
+    log.info("batch ids %s: %s" % (ids, data.decode('utf-8')))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,154 @@
+#!/usr/bin/python3
+# coding=utf-8
+#
+# Antworten des KODI (JSON-RPC 2.0) einmal in Ergebnis oder Fehler zerlegen
+
+import re
+import sys
+import json
+import logging
+from time import time
+
+__author__ = 'Dirk'
+__copyright__ = 'Copyright 2017'
+__license__ = 'GPL'
+__version__ = '0.1'
+
+
+class KodiError:
+    """
+    Fehler einer Anfrage, vom KODI (code, message, data) oder beim Senden (code None)
+    """
+    __slots__ = ('code', 'message', 'data')
+
+    def __init__(self, code, message, data=None):
+        """
+        Konstruktor
+        :param code: JSON-RPC Fehlercode oder None (Fehler beim Senden)
+        :param message: Fehlertext
+        :param data: weitere Angaben vom KODI oder None
+        """
+        self.code = code
+        self.message = message
+        self.data = data
+
+    def __str__(self):
+        if self.code is None:
+            return str(self.message)
+        return "%s (%s)" % (self.message, self.code)
+
+    def __repr__(self):
+        return "KodiError(%s, %s)" % (self.code, self.message)
+
+
+class KodiResponse:
+    """
+    Antwort auf eine Anfrage: entweder result oder error (KodiError).
+    Die Aufrufer fragen is_ok() statt die ganze Antwort als Text nach "error" zu durchsuchen.
+    """
+    __slots__ = ('result', 'error', 'reqId')
+
+    def __init__(self, result=None, error=None, req_id=None):
+        """
+        Konstruktor
+        :param result: Ergebnis
+        :param error: KodiError oder None
+        :param req_id: id der Anfrage
+        """
+        self.result = result
+        self.error = error
+        self.reqId = req_id
+
+    @staticmethod
+    def from_message(message):
+        """
+        Antwort des KODI zerlegen
+        :param message: dekodiertes JSON Objekt
+        :return: KodiResponse
+        """
+        if not isinstance(message, dict):
+            return KodiResponse.failure("not an valid response from kodi")
+        req_id = message.get('id')
+        if 'result' in message:
+            return KodiResponse(message['result'], None, req_id)
+        error = message.get('error')
+        if isinstance(error, dict):
+            return KodiResponse(None, KodiError(error.get('code'), error.get('message', "unknown error"),
+                                                error.get('data')), req_id)
+        if error is None:
+            error = "not an valid response from kodi"
+        return KodiResponse(None, KodiError(None, str(error)), req_id)
+
+    @staticmethod
+    def failure(message, req_id=None):
+        """
+        Antwort für einen Fehler beim Senden (Verbindung, Timeout, ...)
+        :param message: Fehlertext
+        :param req_id: id der Anfrage
+        :return: KodiResponse
+        """
+        return KodiResponse(None, KodiError(None, message), req_id)
+
+    def is_ok(self):
+        """
+        Ist die Anfrage gelungen?
+        :return: kein Fehler?
+        """
+        return self.error is None
+
+    def value(self, default=None):
+        """
+        Ergebnis oder default bei einem Fehler
+        :param default: Wert bei einem Fehler
+        :return: Ergebnis
+        """
+        if self.error is None:
+            return self.result
+        return default
+
+    def __repr__(self):
+        if self.error is None:
+            return "KodiResponse(result=%s)" % str(self.result)
+        return "KodiResponse(error=%s)" % str(self.error)
+
+
+def main():
+    """Main zum Testen: Zerlegen gegen str() und regulären Ausdruck auf typischen KODI Antworten"""
+    log = logging.getLogger("response")
+    log.setLevel(logging.INFO)
+    log.addHandler(logging.StreamHandler(sys.stdout))
+    rx_error = re.compile(".*['\"]error['\"].*", re.IGNORECASE)
+    items = [{"file": "/media/pi/mediastick/urlaub/IMG_%04d.jpg" % i, "label": "IMG_%04d.jpg" % i,
+              "type": "picture", "title": "Bild %d" % i} for i in range(200)]
+    payloads = {
+        "ping": '{"id":1,"jsonrpc":"2.0","result":"pong"}',
+        "players": '{"id":1,"jsonrpc":"2.0","result":[{"playerid":1,"playertype":"internal","type":"video"}]}',
+        "properties": '{"id":1,"jsonrpc":"2.0","result":{"playlistid":1,"position":3,'
+                      '"time":{"hours":0,"milliseconds":120,"minutes":1,"seconds":5}}}',
+        "playlist 200": json.dumps({"id": 1, "jsonrpc": "2.0", "result": {"items": items,
+                                                                          "limits": {"end": 200, "start": 0,
+                                                                                     "total": 200}}}),
+        "error": '{"error":{"code":-32602,"message":"Invalid params."},"id":1,"jsonrpc":"2.0"}',
+    }
+    loops = 2000
+    for name, text in payloads.items():
+        message = json.loads(text)
+        start = time()
+        for _ in range(loops):
+            result = message.get("result", message.get("error"))
+            rx_failed = rx_error.match(str(result)) is not None
+        rx_time = (time() - start) / loops
+        start = time()
+        for _ in range(loops):
+            typed_failed = not KodiResponse.from_message(message).is_ok()
+        typed_time = (time() - start) / loops
+        log.info("%-13s str()+regex: %8.2f us (error: %s), typed: %6.2f us (error: %s)"
+                 % (name, rx_time * 1e6, rx_failed, typed_time * 1e6, typed_failed))
+    # Titel mit "error" im Text
+    message = {"id": 1, "jsonrpc": "2.0", "result": {"item": {"title": "'error' im Titel"}}}
+    log.info("title with 'error': regex says error: %s, typed says error: %s"
+             % (rx_error.match(str(message["result"])) is not None, not KodiResponse.from_message(message).is_ok()))
+
+
+if __name__ == '__main__':
+    main()
@@ -5,10 +5,14 @@
 from time import time, sleep
 import logging
 import socket
+import concurrent.futures
+from threading import Event
 from KodiControl import KodiException, KodiControl
 from MediaControl import *
 from GeoLocThread import GeoLocationThread
 from ControlXmlParser import ControlXmlParser
+from StickWatcher import StickWatcher
+import DisplayProtocol
 
 """
 KODI Mediaplayer mit GPS Hauptprogramm
@@ -30,6 +34,15 @@ class MainObject:
     Das Hauptobjekt, kapselt alle anderen objekte rund um das Progamm
     """
     DEFAULT_PICTURE_DURATION = int(20)
+    # Betriebsarten: jedes Medium einzeln öffnen oder alle Medien als KODI Playlist (ohne Lücken)
+    PLAY_MODE_SINGLE = "single"
+    PLAY_MODE_PLAYLIST = "playlist"
+    # mit Notifications vom KODI: maximale Wartezeit bis die Abbruchbedingungen geprüft werden
+    EVENT_WATCHDOG = 1.0
+    # mit Notifications vom KODI: trotzdem ab und zu den Player fragen (falls ein Event verloren geht)
+    PLAYER_CHECK_INTERVAL = 30
+    # Rückgabe einer Statusabfrage, die für einen POI oder das Programmende abgebrochen wurde
+    STATUS_INTERRUPTED = object()
 
     """
     Der Konstruktor
@@ -48,7 +61,8 @@ class MainObject:
     Raises:
         None
     """  
-    def __init__(self, logger, kodi_ontrol, media_control, player_url, display_socket, xml_filename):
+    def __init__(self, logger, kodi_ontrol, media_control, player_url, display_socket, xml_filename,
+                 play_mode=PLAY_MODE_SINGLE, kodi_async=None):
         """
         Der Konstruktor
         :param logger: Das Loggerobjekt
@@ -57,12 +71,16 @@ class MainObject:
         :param player_url: KODI URL für JSON API
         :param display_socket: Socket zur Kommunikation mit dem Display
         :param xml_filename:  XML Steuerdatei
+        :param play_mode: PLAY_MODE_SINGLE oder PLAY_MODE_PLAYLIST
+        :param kodi_async: AsyncKodiControl (mit laufender Eventloop) für Status und POI oder None
         """
         self.log = logger
         # Objekte zur Kontrolle von Kodi und den Medien
         self.kodiControl = kodi_ontrol
+        self.kodiAsync = kodi_async
         self.mediaControl = media_control
         self.kodiPictureDuration = MainObject.DEFAULT_PICTURE_DURATION
+        self.playMode = play_mode
         self.gpsThread = GeoLocationThread(self.log)       # Threadobjekt zur Standortüberwachung
         #
         self.playerUrl = player_url                        # URL zur Steuerung des KODI
@@ -75,6 +93,11 @@ class MainObject:
         self.isLocationPlay = False                        # bei True läuft die Anzeige für einen poi
         self.cSockIsConnected = False                      # Verbindung zum Display?
         self.lastConnectTime = 0                           # wann war die lettze Verbindung zum Display
+        self.wakeEvent = Event()                           # weckt das Warten auf das Ende eines Mediums
+        self.mediaEnded = False                            # KODI hat das Ende des Mediums gemeldet
+        self.lastPlayerCheck = 0                           # wann wurde der Player zuletzt gefragt
+        self.kodiExited = False                            # der KODI Prozess ist beendet (Absturz)
+        self.stickWatcher = StickWatcher(self.log, self.controlFile)  # Steuerdatei/Stick über inotify
         self.gpsThread.set_pois(pois)                      # übergebe die gesuchten Standortangaben an den thread
         self.connect_socket(self.unixSocketFile)           # Verbinde zum Display
         #
@@ -83,6 +106,16 @@ class MainObject:
         self.log.debug("set callbacks to geolocation thread...")
         self.gpsThread.set_on_gps_lock(self.gps_lock_callback)
         self.gpsThread.set_on_poi_hit(self.gps_hit_callback)
+        # Notifications vom KODI statt Player.GetActivePlayers im 400ms Takt
+        self.log.debug("start kodi notify listener...")
+        self.kodiControl.start_notify_listener().set_on_media_end(self.media_end_callback)
+        # Absturz des KODI sofort bemerken, nach einem Neustart wieder zurücksetzen
+        self.kodiControl.set_on_kodi_exit(self.kodi_exit_callback)
+        self.kodiControl.set_on_kodi_connect(self.kodi_connect_callback)
+        # Verschwinden des Sticks sofort bemerken, ohne stat je Abfrage
+        self.log.debug("start stick watcher...")
+        self.stickWatcher.set_on_gone(self.stick_gone_callback)
+        self.stickWatcher.start()
         # Thread starten
         self.log.debug("start geolocation thread...")
         self.gpsThread.start() 
@@ -91,18 +124,14 @@ class MainObject:
         """Destruktor"""
         self.log.debug("destructor...")
         self.__stop_gps_thread()
+        self.stickWatcher.clear_on_gone()
+        self.stickWatcher.quit_thread()
         # Display leerren
         self.log.info("clear display...")
         if self.cSockIsConnected:
             try:
-                msg = "undef"
-                self.cSock.send(msg.encode('utf-8'))
-                msg = "clear"
-                self.cSock.send(msg.encode('utf-8'))
-                msg = "title:SHOWSTATUS"
-                self.cSock.send(msg.encode('utf-8'))
-                msg = "info:Show wurde beendet"
-                self.cSock.send(msg.encode('utf-8'))
+                self.cSock.send(DisplayProtocol.encode_frame(lock=DisplayProtocol.LOCK_UNDEF, clear=True,
+                                                             title="SHOWSTATUS", info="Show wurde beendet"))
                 self.cSock.close()            
             except OSError:
                 pass
@@ -146,7 +175,7 @@ class MainObject:
         """
         liest aus der XML Datei die POI Infos aus
         :param ctrl_file: XML Steuerdatei oder None
-        :return: points of interest
+        :return: points of interest (PoiStore)
         """
         # ist eine Datei erwähnt?
         if ctrl_file is not None:
@@ -156,7 +185,7 @@ class MainObject:
         # parse die Datei (da sind die Steierdaten für POI drin)
         parser = ControlXmlParser(self.log, self.controlFile)
         self.log.debug("parse xml file <%s>..." % self.controlFile)
-        pois = parser.parse_control_file()
+        pois = parser.load_control_store()
         del parser
         self.log.debug("parse xml file ...OK")
         return pois
@@ -185,7 +214,10 @@ class MainObject:
         :return: noch in der Spielzeit?
         """
         play_in_progress = False
-        players_array = self.kodiControl.player_get_playing()
+        players_array = self.__kodi_status("player_get_playing")
+        if players_array is MainObject.STATUS_INTERRUPTED:
+            # ein POI (oder das Ende) ist wichtiger, der Aufrufer sieht gleich danach nach
+            return True
         if players_array is None:
             # da spielt nichts
             return play_in_progress
@@ -199,21 +231,154 @@ class MainObject:
             if is_picture:
                 # ein Bild wird gespielt
                 # Zeit abgeleufen?
-                if play_end_time > time():
+                if play_end_time <= time():
                     # das war es
                     return False
         return play_in_progress
 
+    def wait_media_playing(self, is_picture, play_end_time):
+        """
+        etwas warten und dann prüfen, ob das Medium noch gespielt wird.
+        Mit Notifications vom KODI wird auf das Ende des Mediums (oder einen POI, quit) gewartet,
+        ohne Verbindung zum Notify Kanal wird wie bisher der Player gefragt
+        :param is_picture: ist Medium ein Bild?
+        :param play_end_time: Endezeit (für Bild)
+        :return: noch in der Spielzeit?
+        """
+        notify = self.kodiControl.get_notify_listener()
+        if notify is None or not notify.is_connected():
+            # etwas Ruhe bitte... (Resourcen sind wertvoll)
+            sleep(0.4)
+            return self.is_media_playing(is_picture, play_end_time)
+        timeout = MainObject.EVENT_WATCHDOG
+        if is_picture:
+            timeout = max(0.0, min(timeout, play_end_time - time()))
+        self.wakeEvent.wait(timeout)
+        # erst löschen, dann die Zustände prüfen, so geht kein Ereignis verloren
+        self.wakeEvent.clear()
+        if self.mediaEnded or self.kodiExited:
+            return False
+        if is_picture and play_end_time <= time():
+            return False
+        if self.lastPlayerCheck + MainObject.PLAYER_CHECK_INTERVAL < time():
+            self.lastPlayerCheck = time()
+            return self.is_media_playing(is_picture, play_end_time)
+        return True
+
+    def __kodi_call(self, name, *args):
+        """
+        privat, Methode des KODI Clients aufrufen und auf das Ergebnis warten.
+        Mit AsyncKodiControl läuft die Anfrage in dessen Eventloop neben anderen offenen Anfragen,
+        sonst über KodiControl (beide haben dieselben Methoden)
+        :param name: Name der Methode
+        :param args: Parameter
+        :return: Rückgabe der Methode
+        """
+        if self.kodiAsync is None:
+            return getattr(self.kodiControl, name)(*args)
+        return self.kodiAsync.call(getattr(self.kodiAsync, name)(*args))
+
+    def __kodi_post(self, name, *args):
+        """
+        privat, Methode des KODI Clients aufrufen, ohne auf das Ergebnis zu warten (nur mit AsyncKodiControl)
+        :param name: Name der Methode
+        :param args: Parameter
+        :return: None
+        """
+        if self.kodiAsync is None:
+            getattr(self.kodiControl, name)(*args)
+            return
+        self.kodiAsync.submit(getattr(self.kodiAsync, name)(*args))
+
+    def __kodi_status(self, name, *args):
+        """
+        privat, Statusabfrage an den KODI Client. Mit AsyncKodiControl wird beim Warten auf die Antwort
+        auf wakeEvent geachtet: ein POI oder das Programmende brechen die Anfrage ab
+        :param name: Name der Methode
+        :param args: Parameter
+        :return: Rückgabe der Methode oder STATUS_INTERRUPTED
+        """
+        if self.kodiAsync is None:
+            return getattr(self.kodiControl, name)(*args)
+        future = self.kodiAsync.submit(getattr(self.kodiAsync, name)(*args))
+        future.add_done_callback(lambda _future: self.wakeEvent.set())
+        woken = False
+        try:
+            while not future.done():
+                if self.poi is not None or not self.app_running_condition():
+                    self.log.debug("status call %s cancelled..." % name)
+                    future.cancel()
+                    return MainObject.STATUS_INTERRUPTED
+                self.wakeEvent.wait(MainObject.EVENT_WATCHDOG)
+                self.wakeEvent.clear()
+                woken = True
+            return future.result()
+        except concurrent.futures.CancelledError:
+            return MainObject.STATUS_INTERRUPTED
+        finally:
+            if woken:
+                # das Wecken kann auch einem anderen Ereignis gegolten haben, für wait_media_playing erhalten
+                self.wakeEvent.set()
+
+    def media_end_callback(self):
+        """
+        Callback vom KODI Notify Thread, das Medium ist zu Ende
+        :return: None
+        """
+        self.log.debug("kodi reports end of medium...")
+        self.mediaEnded = True
+        self.wakeEvent.set()
+
+    def kodi_exit_callback(self, pid):
+        """
+        Callback von der Prozessüberwachung, der KODI Prozess ist beendet
+        :param pid: PID des KODI
+        :return: None
+        """
+        self.log.fatal("kodi process %d exits..." % pid)
+        self.kodiExited = True
+        self.wakeEvent.set()
+
+    def kodi_connect_callback(self):
+        """
+        Callback vom KODI Notify Thread, der Kanal ist (wieder) verbunden.
+        Nach einem Absturz läuft KODI also wieder: Flag zurücksetzen und den neuen Prozess überwachen
+        :return: None
+        """
+        if not self.kodiExited:
+            return
+        self.log.info("kodi is running again...")
+        self.kodiExited = False
+        self.kodiControl.set_on_kodi_exit(self.kodi_exit_callback)
+
+    def stick_gone_callback(self):
+        """
+        Callback vom StickWatcher: Steuerdatei oder Stick ist weg, Warten sofort beenden
+        :return: None
+        """
+        self.log.debug("stick gone, wake main loop...")
+        self.wakeEvent.set()
+
+    def prepare_play(self):
+        """
+        vor dem Abspielen eines Mediums: Player stoppen und das Ende-Ereignis zurücksetzen
+        :return: None
+        """
+        self.__kodi_call("player_all_stop")
+        self.mediaEnded = False
+        self.lastPlayerCheck = time()
+
     def app_running_condition(self):
         """
         Alle Bedingungen für das Programm noch aktuell?
         :return: Aktuell?
         """
-        # ist die Markerdatei vorhanden?
-        if self.mediaControl.check_file_exist(self.controlFile):
+        # ist die Markerdatei vorhanden? (Flag vom StickWatcher, kein Zugriff auf den Stick)
+        if self.stickWatcher.is_present():
             return self.isRunning
-        # Markerdatei fehlt, Abbruch ist da...
-        self.log.info("marker file is gone (stick disappeared?). End Programm...")
+        # Markerdatei fehlt, Abbruch ist da... (nur einmal melden)
+        if self.isRunning:
+            self.log.info("marker file is gone (stick disappeared?). End Programm...")
         self.isRunning = False
         return self.isRunning
 
@@ -227,18 +392,19 @@ class MainObject:
         self.log.info("play one medium/media for poi (%s)..." % mpoi['title'])
         # spiele dazwischen was vom poi
         if mpoi['medium'] is not None and len(mpoi['medium']) > 0:
-            self.kodiControl.gui_show_info_notification("POI", mpoi['title'], int(15000))
+            # nicht auf die Antwort warten, das Medium soll sofort starten
+            self.__kodi_post("gui_show_info_notification", "POI", mpoi['title'], int(15000))
             # Ok es gibt Medien
             # Liste oder einzeln?
             if len(mpoi['medium']) == 1:
                 # Ein Medium...
                 media_file = mpoi['medium'][0]
-                self.kodiControl.player_all_stop()
+                self.prepare_play()
                 self.log.debug("play_poi: play one medium  on poi (%s)..." % media_file)
                 self.log.info("play medium %s for poi (%s)..." % (media_file, mpoi['title']))
                 # Kodi das Medium spielen lassen
-                ret_val = self.kodiControl.player_open_file("%s/%s"
-                                                            % (self.mediaControl.get_poi_media_dir(), media_file))
+                ret_val = self.__kodi_call("player_open_file",
+                                           "%s/%s" % (self.mediaControl.get_poi_media_dir(), media_file))
                 if ret_val is None:
                     # das klappt nicht
                     self.log.fatal("can't play medium, abort")
@@ -248,7 +414,9 @@ class MainObject:
                 # also bie poi None wird oder die App endet
                 #
                 while self.poi is not None and self.app_running_condition():
-                    sleep(0.5)
+                    # gps_hit_callback weckt sofort, wenn der POI verlassen wird
+                    self.wakeEvent.wait(0.5)
+                    self.wakeEvent.clear()
                 return True
             else:
                 # mehrere Medien
@@ -257,23 +425,20 @@ class MainObject:
                 while self.poi is not None and self.app_running_condition():
                     for media_file in media_list:
                         self.log.info("play medium %s for poi (%s)..." % (media_file, mpoi['title']))
-                        type_of_medium = self.mediaControl.class_of_media(media_file)
-                        is_picture = type_of_medium.startswith("picture")
+                        is_picture = self.mediaControl.is_picture(media_file, True)
                         play_end_time = time() + self.kodiPictureDuration
-                        self.kodiControl.player_all_stop()
+                        self.prepare_play()
                         self.log.debug("play_poi: play next medium in an list on poi (%s)..." % media_file)
                         # Kodi das Medium spielen lassen
-                        ret_val = self.kodiControl.player_open_file("%s/%s"
-                                                                    % (self.mediaControl.get_poi_media_dir(), media_file))
+                        ret_val = self.__kodi_call("player_open_file",
+                                                   "%s/%s" % (self.mediaControl.get_poi_media_dir(), media_file))
                         if ret_val is None:
                             # das klappt nicht
                             self.log.fatal("can't play medium, abort")
                             return False
                         while self.app_running_condition() and self.poi is not None:
-                            # resourcen schonen...
-                            sleep(0.4)
                             # wiel lange spielen?
-                            if self.is_media_playing(is_picture, play_end_time):
+                            if self.wait_media_playing(is_picture, play_end_time):
                                 # das Medium spielt noch, nächste Runde warten
                                 continue
                             else:
@@ -303,6 +468,11 @@ class MainObject:
             return            
         # self.kodiControl.gui_show_info_notification("START", "Beginne show...", int(8000))
         #
+        # Playlist Betrieb, klappt das nicht, geht es unten einzeln weiter
+        #
+        if self.playMode == MainObject.PLAY_MODE_PLAYLIST and not self.playlist_loop():
+            return
+        #
         # ich mache das solange, bis das System aus geht oder die Markerdatei gelöscht wird
         #
         while self.app_running_condition():
@@ -321,15 +491,14 @@ class MainObject:
                 #
                 # das nächste Medium abspielen, was ist es für ein medium?
                 #
-                type_of_medium = self.mediaControl.class_of_media(media_file)
-                is_picture = type_of_medium.startswith("picture")
+                is_picture = self.mediaControl.is_picture(media_file)
                 # Endezeit für Bilder
                 play_end_time = time() + self.kodiPictureDuration
-                self.kodiControl.player_all_stop()
+                self.prepare_play()
                 self.log.debug("play one medium  (%s)..." % media_file)
                 # Kodi das Medium spielen lassen
-                ret_val = self.kodiControl.player_open_file("%s/%s"
-                                                            % (self.mediaControl.get_media_dir(), media_file))
+                ret_val = self.__kodi_call("player_open_file",
+                                           "%s/%s" % (self.mediaControl.get_media_dir(), media_file))
                 #
                 # Den Rückgabewert checken
                 #
@@ -352,9 +521,8 @@ class MainObject:
                         # da ist was, nächstes Medium est danach
                         self.play_poi(self.poi)
                         break
-                    # etwas Ruhe bitte... (Resourcen sind wertvoll)
-                    sleep(0.4)
-                    if self.is_media_playing(is_picture, play_end_time):
+                    # warten auf das Ende des Mediums (oder ein Ereignis)
+                    if self.wait_media_playing(is_picture, play_end_time):
                         # das Medium spielt noch, nächste Runde warten
                         continue
                     else:
@@ -363,7 +531,8 @@ class MainObject:
                 # ende while
                 #
                 # ist der Kodi etwa aus oder anderer fehler?
-                if not self.kodiControl.app_get_ping():
+                # eine für einen POI abgebrochene Abfrage zählt als erreichbar
+                if not self.__kodi_status("app_get_ping"):
                     # der Kodi ist aus/tot/beendet
                     # TODO: Kennzeichne dass KODI nicht reagiert
                     self.log.fatal("kodi not running...")
@@ -376,20 +545,138 @@ class MainObject:
         self.kodiControl.player_all_stop()
         self.kodiControl.gui_show_warn_notification("ENDE", "Show beenden...", int(15000))
         if self.cSockIsConnected:
-            try:
-                msg = "title:STOPP"
-                self.cSock.send(msg.encode('utf-8'))
-                msg = "info:warten bis Programm Ende"
-                self.cSock.send(msg.encode('utf-8'))
-            except:
-                pass
+            self.__send_display(DisplayProtocol.encode_frame(title="STOPP", info="warten bis Programm Ende"))
         self.__stop_gps_thread()
+        self.kodiControl.stop_notify_listener()
         sleep(5)
         self.log.debug("mail loop call final 'self.kodiControl.app_quit_kodi()'...")
         self.kodiControl.app_quit_kodi()
         self.log.debug("mail loop call final 'self.kodiControl.app_quit_kodi()'...OK")
         sleep(3)
 
+    def make_segments(self, media_list):
+        """
+        Medienliste in Abschnitte gleicher Art (Bilder/Videos) teilen,
+        jeder Abschnitt wird eine KODI Playlist
+        :param media_list: Liste der Mediendateien
+        :return: Liste von (ist Bild, Liste der Dateien)
+        """
+        segments = []
+        for media_file in media_list:
+            is_picture = self.mediaControl.is_picture(media_file)
+            if len(segments) == 0 or segments[-1][0] != is_picture:
+                segments.append((is_picture, []))
+            segments[-1][1].append("%s/%s" % (self.mediaControl.get_media_dir(), media_file))
+        return segments
+
+    def start_segment(self, segment, repeat, position=0, seek_time=0):
+        """
+        Abschnitt in die passende KODI Playlist laden und starten
+        :param segment: (ist Bild, Liste der Dateien)
+        :param repeat: Playlist endlos wiederholen (nur ein Abschnitt)?
+        :param position: ab welchem Eintrag
+        :param seek_time: Zeit im Video (Sekunden) zum Fortsetzen
+        :return: Endezeit für Bilder (unendlich bei Wiederholung) oder None bei Fehler
+        """
+        is_picture, files = segment
+        if is_picture:
+            list_id = self.kodiControl.playlist_get_picture_list()
+        else:
+            list_id = self.kodiControl.playlist_get_video_list()
+        if list_id is None:
+            self.log.error("no kodi playlist for %s..." % ("pictures" if is_picture else "videos"))
+            return None
+        self.prepare_play()
+        self.kodiControl.playlist_clear_list(list_id)
+        if self.kodiControl.playlist_add_items(list_id, files) is None:
+            self.log.error("can't fill playlist %d..." % list_id)
+            return None
+        if self.kodiControl.player_ppen_playlist(list_id, position) is None:
+            self.log.error("can't open playlist %d..." % list_id)
+            return None
+        players = self.kodiControl.player_get_playing()
+        if players:
+            player_id = players[0]["playerid"]
+            self.kodiControl.player_set_repeat(player_id, "all" if repeat else "off")
+            if seek_time > 0 and not is_picture:
+                self.kodiControl.player_seek_time(player_id, seek_time)
+        if repeat:
+            return float('inf')
+        return time() + (len(files) - position) * self.kodiPictureDuration
+
+    def playlist_loop(self):
+        """
+        Playlist Betrieb: die Medien werden einmal in KODI Playlists geladen und laufen ohne Lücken,
+        eingegriffen wird nur bei einem POI, danach geht es an der gemerkten Stelle weiter
+        :return: False, wenn das Programm sofort enden muss (KODI tot), sonst True
+        """
+        # Playlists brauchen die vollständige, sortierte Liste (Suche läuft evtl. noch im Hintergrund)
+        self.mediaControl.wait_media_list()
+        segments = self.make_segments(self.mediaControl.get_media_list())
+        if len(segments) == 0:
+            self.log.warning("no media for playlist mode, play single...")
+            return True
+        self.log.info("playlist mode with %d segment(s)..." % len(segments))
+        # slideshow.staytime ist global im Profil des KODI: alten Wert merken und am Ende zurückschreiben
+        old_duration = self.kodiControl.app_get_picture_duration()
+        if old_duration is None:
+            self.log.warning("can't read slideshow staytime, play single...")
+            return True
+        if old_duration != self.kodiPictureDuration:
+            self.kodiControl.app_set_picture_duration(self.kodiPictureDuration)
+        try:
+            return self.__playlist_run(segments)
+        finally:
+            if old_duration != self.kodiPictureDuration:
+                self.log.debug("restore slideshow staytime %d..." % old_duration)
+                self.kodiControl.app_set_picture_duration(old_duration)
+
+    def __playlist_run(self, segments):
+        """
+        privat, Abschnitte als Playlists spielen, bis das Programm endet
+        :param segments: Liste von (ist Bild, Liste der Dateien)
+        :return: False, wenn das Programm sofort enden muss (KODI tot), sonst True
+        """
+        # nur ein Abschnitt: einmal laden und endlos wiederholen
+        repeat = len(segments) == 1
+        while self.app_running_condition():
+            for segment in segments:
+                if not self.app_running_condition():
+                    break
+                is_picture = segment[0]
+                play_end_time = self.start_segment(segment, repeat)
+                if play_end_time is None:
+                    self.log.warning("playlist mode failed, play single...")
+                    return True
+                while self.app_running_condition():
+                    if self.poi is not None:
+                        # Stelle merken, POI spielen, dann weiter an der Stelle
+                        position = self.kodiControl.player_get_position()
+                        self.play_poi(self.poi)
+                        if not self.app_running_condition():
+                            break
+                        if position is None or position["position"] is None or position["position"] < 0:
+                            play_end_time = self.start_segment(segment, repeat)
+                        else:
+                            self.log.debug("resume playlist at %d/%ds..." % (position["position"], position["time"]))
+                            play_end_time = self.start_segment(segment, repeat, position["position"],
+                                                               position["time"])
+                        if play_end_time is None:
+                            return True
+                        continue
+                    if self.wait_media_playing(is_picture, play_end_time):
+                        continue
+                    # zwischen zwei Einträgen meldet KODI evtl. auch ein Ende, dann spielt er aber weiter
+                    if not is_picture and not self.kodiExited and self.is_media_playing(False, 0):
+                        self.mediaEnded = False
+                        continue
+                    break
+                # eine für einen POI abgebrochene Abfrage zählt als erreichbar
+                if not self.__kodi_status("app_get_ping"):
+                    self.log.fatal("kodi not running...")
+                    return False
+        return True
+
     def gps_lock_callback(self, is_lock):
         """
         Callback vom GPS Tread, gps lock hat scih verändert
@@ -404,19 +691,12 @@ class MainObject:
                 # versuche zu verbinden
                 if not self.connect_socket(self.unixSocketFile):
                     return False
-        try:
-            # Sende Nachricht an das Display
-            if is_lock:
-                msg = "lock"
-            else:
-                msg = "unlock"
-            self.cSock.send(msg.encode('utf-8'))
-            return True
-        except OSError as msg:
-            self.lastConnectTime = time()
-            self.log.error("while send to taskwin %s" % msg)
-            self.cSockIsConnected = False
-            return False
+        # Sende Nachricht an das Display
+        if is_lock:
+            lock = DisplayProtocol.LOCK_ON
+        else:
+            lock = DisplayProtocol.LOCK_OFF
+        return self.__send_display(DisplayProtocol.encode_frame(lock=lock))
 
     def gps_hit_callback(self, poi):
         """
@@ -426,6 +706,8 @@ class MainObject:
         """
         self.log.info("gps hit location is %s" % poi)
         self.poi = poi
+        # wartende Schleife sofort wecken
+        self.wakeEvent.set()
         #
         # ist das Display Verbunden
         #
@@ -437,25 +719,28 @@ class MainObject:
         #
         # Verbindung besteht, sende Daten
         #
+        if poi is None:
+            return self.__send_display(DisplayProtocol.encode_frame(clear=True))
+        self.log.info("set display title: %s, msg: %s" % (poi["title"], poi["notice"]))
+        # Titel und Info in einem Datagramm, das Display zeigt beides auf einmal
+        return self.__send_display(DisplayProtocol.encode_frame(title=poi["title"], info=poi["notice"]))
+
+    def __send_display(self, frame):
+        """
+        privat, einen Rahmen (DisplayProtocol) an das Display senden
+        :param frame: Bytes
+        :return: Erfolgreich?
+        """
+        if self.cSock is None:
+            return False
         try:
-            if poi is None:
-                msg = "clear"
-                self.cSock.send(msg.encode('utf-8'))
-                return True
-            self.log.info("set display title: %s, msg: %s" % (poi["title"], poi["notice"]))
-            msg = "title:" + poi["title"]
-            self.cSock.send(msg.encode('utf-8'))
-            msg = "info:" + poi["notice"]
-            self.cSock.send(msg.encode('utf-8'))
+            self.cSock.send(frame)
             return True
         except OSError as msg:
             self.lastConnectTime = time()
             self.log.error("while send to taskwin %s" % msg)
             self.cSockIsConnected = False
             return False
-        except:
-            self.log.error("unknown error while send to taskwin")
-            return False
 
     def quit_app(self):
         """
@@ -467,6 +752,7 @@ class MainObject:
         self.log.info("======================= QUIT APP REQUESTED =======================")
         self.log.info("==================================================================")
         self.isRunning = False
+        self.wakeEvent.set()
 
     def connect_socket(self, ux_sock):
         """
@@ -482,10 +768,7 @@ class MainObject:
             self.cSock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
             self.cSock.connect(ux_sock)
             self.cSockIsConnected = True
-            msg = "undef"
-            self.cSock.send(msg.encode('utf-8'))
-            msg = "clear"
-            self.cSock.send(msg.encode('utf-8'))
+            self.cSock.send(DisplayProtocol.encode_frame(lock=DisplayProtocol.LOCK_UNDEF, clear=True))
             return True
         except OSError as msg:
             self.log.error("while try connect to server socket <%s>: %s" % (ux_sock, msg))
@@ -4,9 +4,12 @@
 
 import subprocess
 import os
-import re
 import logging
 from pathlib import Path
+from threading import Thread, Event
+from MediaManifest import MediaManifest
+from MediaRecord import MediaRecord
+from MountTable import MountTable
 
 __author__ = 'Dirk'
 __copyright__ = 'Copyright 2017'
@@ -19,11 +22,6 @@ class MediaControl:
     Klasse zur Medienkontrolle
     Findet Medien, mountet/unmountet den Mediastick
     """
-    # einige Reguläre Ausdrücke zum Finden von Dateien
-    rxMedia = re.compile(".*\\.(bmp|png|tiff|jpg(e)?|avi|mp4|mp2|ts|mpeg|mkv)$", re.IGNORECASE)
-    rxVideo = re.compile(".*\\.(avi|mp4|mp2|ts|mpeg|mkv)$", re.IGNORECASE)
-    rxPicture = re.compile(".*\\.(bmp|png|tiff|jpg(e)?)$", re.IGNORECASE)
-
     def __init__(self, logger=None, url="http://localhost:8080/jsonrpc"):
         """
         Konstruktor
@@ -34,6 +32,15 @@ class MediaControl:
         self.url = url
         self.mediaDir = str()
         self.mediaList = []
+        # einmal beim Laden klassifiziert (Name -> MediaRecord), Medien und POI Medien
+        self.mediaRecords = {}
+        self.poiRecords = {}
+        # erster Fund und vollständige Liste beim Suchen im Hintergrund
+        self.mediaFirst = Event()
+        self.mediaComplete = Event()
+        self.mediaComplete.set()
+        self.loadThread = None
+        self.mountTable = MountTable(self.log)
         self.log.debug("init...")
 
     def check_symlink(self, symlink):
@@ -73,20 +80,22 @@ class MediaControl:
         :return: ist gemountet oder nicht
         """
         self.log.debug("check mountpoint: %s" % mountpoint)
-        #
-        # frage das Sysetem nach mounts
-        #
-        proc = subprocess.Popen(['df', '-l', '-P'], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        p1, err = proc.communicate()
-        pattern = str(p1)
-        #
-        # filtere nach meinem mountpoint
-        #
-        if pattern.find(mountpoint) > -1:
+        # exakter Vergleich mit der Tabelle des Kernels (statt df und Suche im Text)
+        if self.mountTable.is_mounted(mountpoint):
             self.log.debug("mounted volume %s found..." % mountpoint)
             return True
-        else:
-            self.log.debug("mounted volume %s NOT found..." % mountpoint)
+        self.log.debug("mounted volume %s NOT found..." % mountpoint)
+        return False
+
+    def wait_is_mounted(self, mountpoint, timeout):
+        """
+        warten, bis der Mountpoint eingehängt ist (wacht bei jeder Änderung der Mounts auf)
+        :param mountpoint: der Mountpoint
+        :param timeout: maximale Wartezeit in Sekunden
+        :return: ist gemountet oder nicht
+        """
+        self.log.debug("wait for mountpoint: %s" % mountpoint)
+        return self.mountTable.wait_mounted(mountpoint, timeout)
 
     def mount_usb_device(self, mount_point):
         """
@@ -99,30 +108,109 @@ class MediaControl:
             return False
         return True
 
-    def load_media_list(self, file_path, is_recursive):
+    def load_media_list(self, file_path, is_recursive, wait=True):
         """
         lese Medienliste nichtrekusriv/recursiv vom Datenträger
         zurueck Liste aller gefundenen Dateinamen in relativen Pfaden
+        Ohne gültiges Manifest wird im Hintergrund gesucht, mit wait=False kommt die Liste
+        schon nach dem ersten Fund zurück und wächst dann weiter (sortiert erst am Ende)
         :param file_path: Pfad, in dem gesucht wird
         :param is_recursive: rekursiv suchen oder nur dieses Verzeichnis?
+        :param wait: warten, bis die Liste vollständig ist?
         :return: Liste mit Mediendateien
         """
+        self.wait_media_list()
         self.mediaList = []
+        self.mediaRecords = {}
         self.mediaDir = file_path
         self.log.debug("load medialist from device %s..." % file_path)
-        rawfile_names = os.listdir(file_path)
-        for fileName in rawfile_names:
-            if self.rxMedia.match(fileName):
-                if self.check_file_exist("%s/%s" % (file_path, fileName)):
-                    self.mediaList.append(fileName)
-        self.mediaList.sort()
-        # TODO: Recursiv machen
-        # for root, dirs, files in os.walk( file_path ):
-        #    print("dir: %s files: %s" %(root,files) )
-        #    fileNames = filter( self.rx.match, files )
-        self.log.debug("load medialist from device %s...OK" % file_path)
+        self.load_poi_records()
+        # Manifest vom Stick: gültig nach einem scandir Durchlauf, sonst im Hintergrund neu erstellen
+        manifest = MediaManifest(self.log, file_path, self.class_of_media, is_recursive, ('POI',))
+        entries = manifest.load()
+        if entries is not None:
+            self.mediaRecords = {entry['name']: self.__make_record(entry) for entry in entries}
+            self.mediaList = sorted(self.mediaRecords.keys())
+            self.log.debug("load medialist from manifest %s...OK" % file_path)
+            return self.mediaList
+        self.mediaFirst.clear()
+        self.mediaComplete.clear()
+        self.loadThread = Thread(target=self.__load_thread, args=(manifest,), daemon=True)
+        self.loadThread.start()
+        if wait:
+            self.mediaComplete.wait()
+        else:
+            self.mediaFirst.wait()
         return self.mediaList
 
+    def __load_thread(self, manifest):
+        """
+        privat, Thread: Medien suchen, die Liste füllen und das Manifest schreiben
+        :param manifest: MediaManifest
+        :return: None
+        """
+        try:
+            dir_mtime = manifest.prepare_build()
+            entries = []
+            for entry in manifest.iter_build():
+                entries.append(entry)
+                self.mediaRecords[entry['name']] = self.__make_record(entry)
+                # nur anhängen, andere Threads lesen die Liste schon
+                self.mediaList.append(entry['name'])
+                self.mediaFirst.set()
+            entries.sort(key=lambda item: item['name'])
+            # neue Liste statt sort() auf der Liste, die gerade gelesen wird
+            self.mediaList = [entry['name'] for entry in entries]
+            manifest.save(entries, dir_mtime, manifest.builtDirs)
+            self.log.debug("load medialist from device %s...OK (%d files)" % (manifest.mediaDir, len(entries)))
+        except OSError as msg:
+            self.log.error("can't load medialist from %s: %s" % (manifest.mediaDir, msg))
+        finally:
+            self.mediaFirst.set()
+            self.mediaComplete.set()
+
+    @staticmethod
+    def __make_record(entry):
+        """
+        privat, MediaRecord aus einem Eintrag des Manifestes
+        :param entry: Dictonary mit name, class, duration
+        :return: MediaRecord
+        """
+        return MediaRecord.from_name(entry['name'], entry.get('duration'))
+
+    def load_poi_records(self):
+        """
+        Medien im POI Verzeichnis einmal klassifizieren (POI Listen nennen die Dateien ohne Pfad)
+        :return: Anzahl der POI Medien
+        """
+        records = {}
+        try:
+            with os.scandir(self.get_poi_media_dir()) as entries:
+                for entry in entries:
+                    record = MediaRecord.from_name(entry.name)
+                    if record.mediaType != MediaRecord.TYPE_UNKNOWN and entry.is_file():
+                        records[entry.name] = record
+        except OSError as msg:
+            self.log.debug("no poi media in %s: %s" % (self.get_poi_media_dir(), msg))
+        self.poiRecords = records
+        self.log.debug("%d poi media classified..." % len(records))
+        return len(records)
+
+    def wait_media_list(self, timeout=None):
+        """
+        warten, bis die Medienliste vollständig ist
+        :param timeout: maximale Wartezeit in Sekunden oder None
+        :return: vollständig?
+        """
+        return self.mediaComplete.wait(timeout)
+
+    def is_media_list_complete(self):
+        """
+        Ist die Suche nach Medien beendet?
+        :return: vollständig?
+        """
+        return self.mediaComplete.is_set()
+
     def get_media_list(self):
         """
         Liste der Medien zurueckgeben
@@ -130,6 +218,27 @@ class MediaControl:
         """
         return self.mediaList
 
+    def get_media_record(self, file_name, is_poi=False):
+        """
+        Eintrag zu einer Mediendatei, unbekannte Dateien (z.B. später dazu gekommen) nach der Endung
+        :param file_name: Dateiname (wie in der Medienliste oder POI Liste)
+        :param is_poi: Datei aus dem POI Verzeichnis?
+        :return: MediaRecord
+        """
+        record = (self.poiRecords if is_poi else self.mediaRecords).get(file_name)
+        if record is None:
+            record = MediaRecord.from_name(file_name)
+        return record
+
+    def is_picture(self, file_name, is_poi=False):
+        """
+        Ist die Mediendatei ein Bild?
+        :param file_name: Dateiname (wie in der Medienliste oder POI Liste)
+        :param is_poi: Datei aus dem POI Verzeichnis?
+        :return: Bild?
+        """
+        return self.get_media_record(file_name, is_poi).mediaType == MediaRecord.TYPE_PICTURE
+
     def get_media_dir(self):
         """
         Media-rootdir zurueck geben
@@ -147,16 +256,9 @@ class MediaControl:
     def class_of_media(self, file_name):
         """
         Klassifiziere anhand der Endung den Dateityp nach Bild/Video
-        return "picture" oder "video".
+        return "picture" oder "video" (Tabelle der Endungen in MediaRecord).
         Genau (z.B mit file XXX) ist hier zu teuer
         :param file_name: Dateiname
         :return: Typ der Datei
         """
-        type_of_media = "unknown"
-        self.log.debug("class_of_media test for %s..." % file_name)
-        if self.rxVideo.match(file_name):
-            type_of_media = "video"
-        if self.rxPicture.match(file_name):
-            type_of_media = "picture"
-        self.log.debug("class_of_media test is %s..." % type_of_media)
-        return str(type_of_media)
+        return MediaRecord.TYPE_NAMES[MediaRecord.type_of(file_name)]
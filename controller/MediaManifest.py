@@ -0,0 +1,322 @@
+#!/usr/bin/python3
+# coding=utf-8
+#
+# Manifest der Mediendateien auf dem Stick (Name, Größe, mtime, Art, Dauer)
+
+import os
+import sys
+import json
+import struct
+import logging
+from time import time
+from MediaWalker import MediaWalker
+
+__author__ = 'Dirk'
+__copyright__ = 'Copyright 2017'
+__license__ = 'GPL'
+__version__ = '0.1'
+
+
+class MediaManifest:
+    """
+    Liest und schreibt das Manifest der Medien im Medienverzeichnis.
+    Gültig ist das Manifest, wenn die mtime des Verzeichnisses stimmt und ein
+    os.scandir Durchlauf dieselben Mediendateien findet (Art aus dem Verzeichniseintrag, kein stat je Datei).
+    Rekursiv werden zusätzlich die mtimes aller Unterverzeichnisse verglichen.
+    Eine unter gleichem Namen überschriebene Datei ändert keine Verzeichnis-mtime, die fällt
+    nur mit deep auf (stat je Mediendatei, Größe und mtime werden verglichen).
+    """
+    # eigenes Unterverzeichnis, damit das Schreiben die mtime des Medienverzeichnisses nicht ändert
+    DIR_NAME = ".mediaplayer"
+    FILE_NAME = "media-manifest.json"
+    VERSION = 2
+    # Schlüssel eines Eintrages
+    KEYS = ('name', 'size', 'mtime', 'class', 'duration')
+
+    def __init__(self, logger, media_dir, classify, recursive=False, exclude=(), deep=False):
+        """
+        Konstruktor
+        :param logger: Programmlogger
+        :param media_dir: Medienverzeichnis (Stick)
+        :param classify: Funktion Dateiname -> "picture", "video" oder "unknown"
+        :param recursive: auch Unterverzeichnisse (Namen dann als relative Pfade)
+        :param exclude: Unterverzeichnisse, die nicht dazu gehören (z.B. POI)
+        :param deep: beim Laden jede Mediendatei mit stat prüfen (langsamer, findet überschriebene Dateien)
+        """
+        self.log = logger
+        self.mediaDir = media_dir
+        self.manifestDir = os.path.join(media_dir, MediaManifest.DIR_NAME)
+        self.manifestFile = os.path.join(self.manifestDir, MediaManifest.FILE_NAME)
+        self.classify = classify
+        self.recursive = recursive
+        self.exclude = exclude
+        self.deep = deep
+        # mtimes der Unterverzeichnisse nach iter_build()
+        self.builtDirs = {}
+
+    def __is_media(self, name):
+        """privat, ist die Datei ein Medium?"""
+        return self.classify(name) != "unknown"
+
+    @staticmethod
+    def __file_stat(entry, _rel_path):
+        """
+        privat, Größe und mtime einer Datei aus dem Verzeichniseintrag (läuft im Thread des Walkers)
+        :param entry: DirEntry
+        :param _rel_path: relativer Pfad
+        :return: (Größe, mtime_ns)
+        """
+        stat = entry.stat()
+        return stat.st_size, stat.st_mtime_ns
+
+    def scan_names(self):
+        """
+        Mediendateien mit einem scandir Durchlauf, ohne stat je Datei
+        :return: (Menge der Dateinamen, Dictonary Unterverzeichnis -> mtime_ns)
+        """
+        names = set()
+        dirs = {}
+        if self.recursive:
+            walker = MediaWalker(self.log, self.mediaDir, self.__is_media, self.exclude)
+            for kind, rel_path, value in walker.walk():
+                if kind == MediaWalker.KIND_FILE:
+                    names.add(rel_path)
+                else:
+                    dirs[rel_path] = value
+            return names, dirs
+        with os.scandir(self.mediaDir) as entries:
+            for entry in entries:
+                if self.__is_media(entry.name) and entry.is_file():
+                    names.add(entry.name)
+        return names, dirs
+
+    def scan_files(self):
+        """
+        Mediendateien mit einem scandir Durchlauf und stat je Mediendatei
+        :return: (Dictonary Dateiname -> (Größe, mtime_ns), Dictonary Unterverzeichnis -> mtime_ns)
+        """
+        files = {}
+        dirs = {}
+        if self.recursive:
+            walker = MediaWalker(self.log, self.mediaDir, self.__is_media, self.exclude)
+            for kind, rel_path, value in walker.walk(MediaManifest.__file_stat):
+                if kind == MediaWalker.KIND_FILE:
+                    files[rel_path] = value
+                else:
+                    dirs[rel_path] = value
+            return files, dirs
+        with os.scandir(self.mediaDir) as entries:
+            for entry in entries:
+                if self.__is_media(entry.name) and entry.is_file():
+                    files[entry.name] = MediaManifest.__file_stat(entry, entry.name)
+        return files, dirs
+
+    def load(self):
+        """
+        Manifest laden, wenn es noch zum Verzeichnis passt
+        :return: Liste der Einträge (Dictonarys) oder None
+        """
+        try:
+            with open(self.manifestFile, 'r', encoding='utf-8') as manifest:
+                data = json.load(manifest)
+            if data.get('version') != MediaManifest.VERSION or data.get('recursive') != self.recursive:
+                self.log.debug("media manifest has wrong version...")
+                return None
+            if data.get('dirMtime') != os.stat(self.mediaDir).st_mtime_ns:
+                self.log.debug("media dir changed since manifest...")
+                return None
+            entries = data['entries']
+            if not self.deep:
+                names, dirs = self.scan_names()
+                if dirs != data.get('dirs', {}) or names != {entry['name'] for entry in entries}:
+                    self.log.debug("media files changed since manifest...")
+                    return None
+                return entries
+            files, dirs = self.scan_files()
+            if dirs != data.get('dirs', {}) or len(entries) != len(files):
+                self.log.debug("media files changed since manifest...")
+                return None
+            for entry in entries:
+                # ersetzte Datei unter gleichem Namen: Größe oder mtime weichen ab
+                if files.get(entry['name']) != (entry['size'], entry['mtime']):
+                    self.log.debug("media file %s changed since manifest..." % entry['name'])
+                    return None
+            return entries
+        except FileNotFoundError:
+            self.log.debug("no media manifest %s..." % self.manifestFile)
+        except (OSError, ValueError, KeyError, TypeError) as msg:
+            self.log.warning("media manifest %s not usable: %s" % (self.manifestFile, msg))
+        return None
+
+    def __entry_info(self, entry, rel_path):
+        """
+        privat, Eintrag für das Manifest (läuft im Thread des Walkers)
+        :param entry: DirEntry
+        :param rel_path: relativer Pfad
+        :return: Dictonary
+        """
+        media_class = self.classify(entry.name)
+        stat = entry.stat()
+        duration = None
+        if media_class == "video":
+            duration = mp4_duration(entry.path)
+        return {'name': rel_path, 'size': stat.st_size, 'mtime': stat.st_mtime_ns,
+                'class': media_class, 'duration': duration}
+
+    def prepare_build(self):
+        """
+        vor dem Erstellen: Verzeichnis für das Manifest anlegen und mtime des Medienverzeichnisses lesen
+        :return: mtime_ns des Medienverzeichnisses
+        """
+        try:
+            # vorher anlegen, das ändert die mtime des Medienverzeichnisses nur einmal
+            os.makedirs(self.manifestDir, exist_ok=True)
+        except OSError as msg:
+            self.log.debug("can't create %s: %s" % (self.manifestDir, msg))
+        return os.stat(self.mediaDir).st_mtime_ns
+
+    def iter_build(self):
+        """
+        Einträge neu erstellen und einzeln liefern, sobald sie gefunden sind (stat je Mediendatei,
+        Dauer für MP4 aus dem Dateikopf), danach stehen die Unterverzeichnisse in builtDirs
+        :return: Generator der Einträge (unsortiert)
+        """
+        self.builtDirs = {}
+        if self.recursive:
+            walker = MediaWalker(self.log, self.mediaDir, self.__is_media, self.exclude)
+            for kind, rel_path, value in walker.walk(self.__entry_info):
+                if kind == MediaWalker.KIND_FILE:
+                    yield value
+                else:
+                    self.builtDirs[rel_path] = value
+            return
+        with os.scandir(self.mediaDir) as dir_entries:
+            for entry in dir_entries:
+                if self.__is_media(entry.name) and entry.is_file():
+                    yield self.__entry_info(entry, entry.name)
+
+    def build(self):
+        """
+        Manifest neu erstellen
+        :return: (Liste der Einträge, mtime des Verzeichnisses, mtimes der Unterverzeichnisse)
+        """
+        dir_mtime = self.prepare_build()
+        entries = sorted(self.iter_build(), key=lambda item: item['name'])
+        return entries, dir_mtime, self.builtDirs
+
+    def save(self, entries, dir_mtime, dirs=None):
+        """
+        Manifest schreiben (atomar über eine temporäre Datei)
+        :param entries: Liste der Einträge
+        :param dir_mtime: mtime des Verzeichnisses beim Erstellen
+        :param dirs: mtimes der Unterverzeichnisse (rekursiv)
+        :return: Erfolgreich?
+        """
+        tmp_file = self.manifestFile + ".tmp"
+        try:
+            with open(tmp_file, 'w', encoding='utf-8') as manifest:
+                json.dump({'version': MediaManifest.VERSION, 'recursive': self.recursive, 'dirMtime': dir_mtime,
+                           'dirs': dirs or {}, 'entries': entries}, manifest)
+            os.replace(tmp_file, self.manifestFile)
+            self.log.debug("media manifest %s written..." % self.manifestFile)
+            return True
+        except OSError as msg:
+            # z.B. Stick schreibgeschützt, dann eben ohne Manifest
+            self.log.warning("can't write media manifest %s: %s" % (self.manifestFile, msg))
+            try:
+                os.remove(tmp_file)
+            except OSError:
+                pass
+            return False
+
+    def load_or_build(self):
+        """
+        gültiges Manifest laden oder neu erstellen und speichern
+        :return: Liste der Einträge
+        """
+        entries = self.load()
+        if entries is not None:
+            self.log.debug("media manifest is valid (%d entries)..." % len(entries))
+            return entries
+        entries, dir_mtime, dirs = self.build()
+        self.save(entries, dir_mtime, dirs)
+        return entries
+
+
+def mp4_duration(file_name):
+    """
+    Dauer einer MP4/MOV Datei aus dem mvhd Atom lesen (nur die Köpfe der Atome, kein Dekoder)
+    :param file_name: Videodatei
+    :return: Dauer in Sekunden oder None
+    """
+    try:
+        with open(file_name, 'rb') as video:
+            file_size = os.fstat(video.fileno()).st_size
+            pos = 0
+            end = file_size
+            # oberste Ebene nach moov durchsuchen, dann in moov nach mvhd
+            for wanted in (b'moov', b'mvhd'):
+                found = False
+                while pos + 8 <= end:
+                    video.seek(pos)
+                    size, kind = struct.unpack('>I4s', video.read(8))
+                    header = 8
+                    if size == 1:
+                        size = struct.unpack('>Q', video.read(8))[0]
+                        header = 16
+                    elif size == 0:
+                        size = end - pos
+                    if size < header:
+                        return None
+                    if kind == wanted:
+                        found = True
+                        end = pos + size
+                        pos += header
+                        break
+                    pos += size
+                if not found:
+                    return None
+            # mvhd: version/flags, dann Zeiten je nach Version 32 oder 64 Bit
+            video.seek(pos)
+            version = video.read(1)[0]
+            if version == 1:
+                video.seek(pos + 4 + 16)
+                scale, duration = struct.unpack('>IQ', video.read(12))
+            else:
+                video.seek(pos + 4 + 8)
+                scale, duration = struct.unpack('>II', video.read(8))
+            if scale == 0:
+                return None
+            return round(duration / scale, 3)
+    except (OSError, struct.error, IndexError):
+        return None
+
+
+def main():
+    """Main zum Testen: Manifest für ein Verzeichnis erstellen und Ladezeiten vergleichen"""
+    from MediaControl import MediaControl
+    log = logging.getLogger("manifest")
+    log.setLevel(logging.INFO)
+    log.addHandler(logging.StreamHandler(sys.stdout))
+    if len(sys.argv) < 2:
+        log.error("usage: MediaManifest.py <media dir>")
+        return
+    control = MediaControl(log)
+    manifest = MediaManifest(log, sys.argv[1], control.class_of_media, recursive=True)
+    start = time()
+    entries, dir_mtime, dirs = manifest.build()
+    build_time = time() - start
+    manifest.save(entries, dir_mtime, dirs)
+    start = time()
+    valid = manifest.load()
+    load_time = time() - start
+    manifest.deep = True
+    start = time()
+    valid_deep = manifest.load()
+    log.info("%d entries, build %.1f ms, validate/load %.1f ms, deep %.1f ms, valid: %s/%s"
+             % (len(entries), build_time * 1000.0, load_time * 1000.0, (time() - start) * 1000.0,
+                valid is not None, valid_deep is not None))
+
+
+if __name__ == '__main__':
+    main()
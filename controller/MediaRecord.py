@@ -0,0 +1,137 @@
+#!/usr/bin/python3
+# coding=utf-8
+#
+# kompakter Eintrag je Mediendatei (Art, Endung, Dauer), einmal beim Laden erstellt
+
+import os
+import re
+import sys
+import logging
+from time import time
+
+__author__ = 'Dirk'
+__copyright__ = 'Copyright 2017'
+__license__ = 'GPL'
+__version__ = '0.1'
+
+
+class MediaRecord:
+    """
+    Art, Endung und Dauer einer Mediendatei.
+    Die Art kommt aus einer Tabelle der Endungen, das ersetzt die regulären Ausdrücke je Abspielen.
+    """
+    __slots__ = ('mediaType', 'extension', 'duration')
+    # Art der Datei
+    TYPE_UNKNOWN = 0
+    TYPE_PICTURE = 1
+    TYPE_VIDEO = 2
+    # Namen der Arten wie bisher von class_of_media (auch im Manifest)
+    TYPE_NAMES = ("unknown", "picture", "video")
+    # Endung (klein) -> Art, "jpge" wie im alten Ausdruck jpg(e)?
+    EXTENSIONS = {
+        'bmp': TYPE_PICTURE, 'png': TYPE_PICTURE, 'tiff': TYPE_PICTURE,
+        'jpg': TYPE_PICTURE, 'jpeg': TYPE_PICTURE, 'jpge': TYPE_PICTURE,
+        'avi': TYPE_VIDEO, 'mp4': TYPE_VIDEO, 'mp2': TYPE_VIDEO, 'ts': TYPE_VIDEO,
+        'mpeg': TYPE_VIDEO, 'mkv': TYPE_VIDEO,
+    }
+
+    def __init__(self, media_type, extension, duration=None):
+        """
+        Konstruktor
+        :param media_type: TYPE_PICTURE, TYPE_VIDEO oder TYPE_UNKNOWN
+        :param extension: Endung klein ohne Punkt
+        :param duration: Dauer in Sekunden (Videos) oder None
+        """
+        self.mediaType = media_type
+        self.extension = extension
+        self.duration = duration
+
+    @staticmethod
+    def extension_of(file_name):
+        """
+        Endung einer Datei
+        :param file_name: Dateiname
+        :return: Endung klein ohne Punkt
+        """
+        return os.path.splitext(file_name)[1][1:].lower()
+
+    @staticmethod
+    def type_of(file_name):
+        """
+        Art einer Datei aus der Tabelle der Endungen
+        :param file_name: Dateiname
+        :return: TYPE_PICTURE, TYPE_VIDEO oder TYPE_UNKNOWN
+        """
+        return MediaRecord.EXTENSIONS.get(MediaRecord.extension_of(file_name), MediaRecord.TYPE_UNKNOWN)
+
+    @staticmethod
+    def from_name(file_name, duration=None):
+        """
+        Eintrag aus dem Dateinamen erstellen
+        :param file_name: Dateiname
+        :param duration: Dauer in Sekunden oder None
+        :return: MediaRecord
+        """
+        extension = MediaRecord.extension_of(file_name)
+        return MediaRecord(MediaRecord.EXTENSIONS.get(extension, MediaRecord.TYPE_UNKNOWN), extension, duration)
+
+    def type_name(self):
+        """
+        Name der Art
+        :return: "picture", "video" oder "unknown"
+        """
+        return MediaRecord.TYPE_NAMES[self.mediaType]
+
+    def is_picture(self):
+        """
+        Ist es ein Bild?
+        :return: Bild?
+        """
+        return self.mediaType == MediaRecord.TYPE_PICTURE
+
+    def is_video(self):
+        """
+        Ist es ein Video?
+        :return: Video?
+        """
+        return self.mediaType == MediaRecord.TYPE_VIDEO
+
+    def __repr__(self):
+        return "MediaRecord(%s, %s, %s)" % (self.type_name(), self.extension, self.duration)
+
+
+def main():
+    """Main zum Testen: Nachschlagen im Dictonary gegen die regulären Ausdrücke je Abspielen"""
+    log = logging.getLogger("record")
+    log.setLevel(logging.INFO)
+    log.addHandler(logging.StreamHandler(sys.stdout))
+    rx_video = re.compile(".*\\.(avi|mp4|mp2|ts|mpeg|mkv)$", re.IGNORECASE)
+    rx_picture = re.compile(".*\\.(bmp|png|tiff|jpg(e)?)$", re.IGNORECASE)
+    names = ["urlaub/tag%02d/IMG_%04d.%s" % (i % 30, i, ('jpg', 'JPG', 'mp4', 'png', 'mkv')[i % 5])
+             for i in range(1000)]
+    records = {name: MediaRecord.from_name(name) for name in names}
+    loops = 100
+    start = time()
+    for _ in range(loops):
+        for name in names:
+            type_of_media = "unknown"
+            if rx_video.match(name):
+                type_of_media = "video"
+            if rx_picture.match(name):
+                type_of_media = "picture"
+            type_of_media.startswith("picture")
+    regex_time = (time() - start) / (loops * len(names))
+    start = time()
+    for _ in range(loops):
+        for name in names:
+            records[name].is_picture()
+    table_time = (time() - start) / (loops * len(names))
+    for name in names:
+        old = "picture" if rx_picture.match(name) else ("video" if rx_video.match(name) else "unknown")
+        if old != records[name].type_name():
+            log.error("different class for %s: %s != %s" % (name, old, records[name].type_name()))
+    log.info("regex: %.2f us, record lookup: %.2f us per file" % (regex_time * 1e6, table_time * 1e6))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,137 @@
+#!/usr/bin/python3
+# coding=utf-8
+#
+# rekursive Suche nach Mediendateien mit os.scandir und mehreren Threads
+
+import os
+import sys
+import queue
+import logging
+from time import time
+from threading import Event
+from concurrent.futures import ThreadPoolExecutor
+
+__author__ = 'Dirk'
+__copyright__ = 'Copyright 2017'
+__license__ = 'GPL'
+__version__ = '0.1'
+
+
+class MediaWalker:
+    """
+    Durchsucht einen Verzeichnisbaum parallel (ein scandir je Verzeichnis als Aufgabe im Threadpool).
+    Auf dem langsamen USB Stick warten so mehrere Verzeichnisse gleichzeitig auf das Gerät.
+    Die Funde kommen als Generator, sobald sie da sind, also nicht sortiert.
+    Datei oder Verzeichnis wird aus dem Verzeichniseintrag bestimmt (kein stat je Datei).
+    """
+    DEFAULT_WORKERS = 4
+    # Ergebnisarten
+    KIND_FILE = 'file'
+    KIND_DIR = 'dir'
+    # Ende der Aufgabe eines Verzeichnisses
+    __DONE = object()
+
+    def __init__(self, logger, root, accept, exclude=(), workers=DEFAULT_WORKERS):
+        """
+        Konstruktor
+        :param logger: Programmlogger
+        :param root: Wurzelverzeichnis
+        :param accept: Funktion Dateiname -> gesuchte Datei?
+        :param exclude: Verzeichnisse direkt unter root, die nicht durchsucht werden (z.B. POI)
+        :param workers: Anzahl Threads
+        """
+        self.log = logger
+        self.root = root
+        self.accept = accept
+        self.exclude = set(exclude)
+        self.workers = workers
+
+    def walk(self, file_info=None):
+        """
+        Baum durchsuchen
+        :param file_info: Funktion (DirEntry, relativer Pfad) -> Wert, läuft im Thread (z.B. stat),
+                          None -> kein Wert; gibt sie None zurück, wird die Datei übergangen
+        :return: Generator von (KIND_FILE, relativer Pfad, Wert) und (KIND_DIR, relativer Pfad, mtime_ns)
+        """
+        results = queue.Queue()
+        cancel = Event()
+        pool = ThreadPoolExecutor(max_workers=self.workers)
+
+        def scan(rel_dir):
+            try:
+                if cancel.is_set():
+                    return
+                with os.scandir(os.path.join(self.root, rel_dir) if rel_dir else self.root) as entries:
+                    for entry in entries:
+                        if cancel.is_set():
+                            return
+                        rel_path = entry.name if not rel_dir else rel_dir + "/" + entry.name
+                        if entry.is_dir(follow_symlinks=False):
+                            # versteckte Verzeichnisse (z.B. .mediaplayer) und ausgeschlossene übergehen
+                            if entry.name.startswith('.') or (not rel_dir and entry.name in self.exclude):
+                                continue
+                            mtime = entry.stat(follow_symlinks=False).st_mtime_ns
+                            # erst melden, dann starten: der Verbraucher zählt die offenen Verzeichnisse
+                            results.put((MediaWalker.KIND_DIR, rel_path, mtime))
+                            pool.submit(scan, rel_path)
+                        elif self.accept(entry.name) and entry.is_file():
+                            value = None
+                            if file_info is not None:
+                                try:
+                                    value = file_info(entry, rel_path)
+                                except OSError as msg:
+                                    # nur diese Datei übergehen, nicht den Rest des Verzeichnisses
+                                    self.log.warning("can't read %s: %s" % (rel_path, msg))
+                                    continue
+                                if value is None:
+                                    continue
+                            results.put((MediaWalker.KIND_FILE, rel_path, value))
+            except OSError as msg:
+                self.log.warning("can't scan %s: %s" % (rel_dir or self.root, msg))
+            finally:
+                results.put(MediaWalker.__DONE)
+
+        pool.submit(scan, '')
+        open_dirs = 1
+        try:
+            while open_dirs > 0:
+                item = results.get()
+                if item is MediaWalker.__DONE:
+                    open_dirs -= 1
+                    continue
+                if item[0] == MediaWalker.KIND_DIR:
+                    open_dirs += 1
+                yield item
+        finally:
+            # auch bei vorzeitigem Ende des Verbrauchers die Threads beenden
+            cancel.set()
+            pool.shutdown(wait=True)
+
+
+def main():
+    """Main zum Testen: Baum durchsuchen, Zeit bis zum ersten Fund und gesamt"""
+    log = logging.getLogger("walker")
+    log.setLevel(logging.INFO)
+    log.addHandler(logging.StreamHandler(sys.stdout))
+    if len(sys.argv) < 2:
+        log.error("usage: MediaWalker.py <media dir> [workers]")
+        return
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else MediaWalker.DEFAULT_WORKERS
+    walker = MediaWalker(log, sys.argv[1], lambda name: not name.startswith('.'), workers=workers)
+    start = time()
+    first = None
+    files = 0
+    dirs = 0
+    for kind, _path, _value in walker.walk():
+        if kind == MediaWalker.KIND_FILE:
+            files += 1
+            if first is None:
+                first = time() - start
+        else:
+            dirs += 1
+    log.info("%d files in %d dirs, first after %.1f ms, all after %.1f ms (%d workers)"
+             % (files, dirs, (first or 0) * 1000.0, (time() - start) * 1000.0, workers))
+
+
+if __name__ == '__main__':
+    main()
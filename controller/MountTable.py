@@ -0,0 +1,210 @@
+#!/usr/bin/python3
+# coding=utf-8
+#
+# Tabelle der Mounts direkt aus /proc/self/mountinfo (statt df aufzurufen)
+
+import os
+import re
+import sys
+import select
+import logging
+import subprocess
+from time import time, sleep
+
+__author__ = 'Dirk'
+__copyright__ = 'Copyright 2017'
+__license__ = 'GPL'
+__version__ = '0.1'
+
+
+class MountTable:
+    """
+    Liest die Mounts aus /proc/self/mountinfo und vergleicht Mountpoints exakt.
+    Änderungen der Tabelle meldet der Kernel über poll() (POLLPRI/POLLERR),
+    so muss zwischen zwei Prüfungen nicht fest gewartet werden.
+    """
+    MOUNTINFO = "/proc/self/mountinfo"
+    # Oktale Escapes in mountinfo (Leerzeichen \040, Tab \011, Zeilenende \012, Backslash \134)
+    rxEscape = re.compile(r'\\([0-7]{3})')
+    # Takt, wenn poll() auf mountinfo nicht geht
+    POLL_INTERVAL = 1.0
+
+    def __init__(self, logger, mountinfo=MOUNTINFO):
+        """
+        Konstruktor
+        :param logger: Programmlogger
+        :param mountinfo: Datei mit der Tabelle
+        """
+        self.log = logger
+        self.mountinfo = mountinfo
+        self.watchFile = None
+        self.poller = None
+        self.readCount = 0
+
+    @staticmethod
+    def unescape(field):
+        """
+        Oktale Escapes eines Feldes auflösen
+        :param field: Feld aus mountinfo
+        :return: Text
+        """
+        if '\\' not in field:
+            return field
+        return MountTable.rxEscape.sub(lambda match: chr(int(match.group(1), 8)), field)
+
+    @staticmethod
+    def parse(text):
+        """
+        Inhalt von mountinfo auswerten
+        "36 35 98:0 /mnt1 /mnt/parent rw,noatime master:1 - ext3 /dev/root rw,errors=continue"
+        :param text: Inhalt
+        :return: Dictonary Mountpoint -> (Quelle, Dateisystem, Optionen), spätere Mounts überdecken frühere
+        """
+        mounts = {}
+        for line in text.splitlines():
+            fields = line.split(' ')
+            try:
+                # optionale Felder bis zum Trenner "-"
+                separator = fields.index('-', 6)
+                mount_point = MountTable.unescape(fields[4])
+                mounts[mount_point] = (MountTable.unescape(fields[separator + 2]), fields[separator + 1], fields[5])
+            except (ValueError, IndexError):
+                continue
+        return mounts
+
+    def read(self):
+        """
+        Tabelle lesen
+        :return: Dictonary Mountpoint -> (Quelle, Dateisystem, Optionen)
+        """
+        self.readCount += 1
+        with open(self.mountinfo, 'r', encoding='utf-8', errors='surrogateescape') as info:
+            return self.parse(info.read())
+
+    def is_mounted(self, mount_point):
+        """
+        Ist genau dieser Mountpoint eingehängt?
+        :param mount_point: Mountpoint
+        :return: eingehängt?
+        """
+        try:
+            return os.path.normpath(mount_point) in self.read()
+        except OSError as msg:
+            self.log.error("can't read %s: %s" % (self.mountinfo, msg))
+            return False
+
+    def get_mount(self, mount_point):
+        """
+        Eintrag eines Mountpoints
+        :param mount_point: Mountpoint
+        :return: (Quelle, Dateisystem, Optionen) oder None
+        """
+        try:
+            return self.read().get(os.path.normpath(mount_point))
+        except OSError:
+            return None
+
+    def __open_watch(self):
+        """
+        privat, mountinfo für poll() öffnen, das erste Lesen setzt den Stand
+        :return: Erfolgreich?
+        """
+        if self.poller is not None:
+            return True
+        try:
+            self.watchFile = open(self.mountinfo, 'rb', buffering=0)
+            self.watchFile.read()
+            self.poller = select.poll()
+            self.poller.register(self.watchFile.fileno(), select.POLLPRI | select.POLLERR)
+            return True
+        except (OSError, AttributeError) as msg:
+            self.log.debug("no poll on %s (%s), wait with interval..." % (self.mountinfo, msg))
+            self.close()
+            return False
+
+    def wait_change(self, timeout):
+        """
+        auf eine Änderung der Tabelle warten (ohne poll() einfach den Takt lang)
+        :param timeout: maximale Wartezeit in Sekunden
+        :return: True, wenn sich die Tabelle geändert hat (oder ohne poll() nach dem Takt)
+        """
+        if not self.__open_watch():
+            sleep(min(timeout, MountTable.POLL_INTERVAL))
+            return True
+        events = self.poller.poll(max(0, int(timeout * 1000)))
+        if not events:
+            return False
+        # neu lesen, sonst meldet poll() die Änderung sofort wieder
+        self.watchFile.seek(0)
+        self.watchFile.read()
+        return True
+
+    def wait_mounted(self, mount_point, timeout):
+        """
+        warten, bis der Mountpoint eingehängt ist
+        :param mount_point: Mountpoint
+        :param timeout: maximale Wartezeit in Sekunden
+        :return: eingehängt?
+        """
+        end_time = time() + timeout
+        # vor dem Lesen öffnen, damit keine Änderung dazwischen verloren geht
+        self.__open_watch()
+        while True:
+            if self.is_mounted(mount_point):
+                return True
+            rest = end_time - time()
+            if rest <= 0:
+                return False
+            self.wait_change(rest)
+
+    def close(self):
+        """Überwachung schliessen"""
+        self.poller = None
+        if self.watchFile is not None:
+            self.watchFile.close()
+            self.watchFile = None
+
+
+def main():
+    """Main zum Testen: Tabelle lesen, gegen df messen und (als root) auf einen tmpfs Mount warten"""
+    log = logging.getLogger("mounts")
+    log.setLevel(logging.INFO)
+    log.addHandler(logging.StreamHandler(sys.stdout))
+    table = MountTable(log)
+    mounts = table.read()
+    log.info("%d mounts, / is %s" % (len(mounts), mounts.get('/')))
+    loops = 100
+    start = time()
+    for _ in range(loops):
+        table.is_mounted('/media/pi/mediastick')
+    table_time = (time() - start) / loops
+    start = time()
+    for _ in range(10):
+        subprocess.Popen(['df', '-l', '-P'], stdout=subprocess.PIPE, stderr=subprocess.PIPE).communicate()
+    df_time = (time() - start) / 10
+    log.info("mountinfo: %.3f ms, df: %.3f ms per check" % (table_time * 1000.0, df_time * 1000.0))
+    if os.getuid() != 0:
+        return
+    test_dir = "/tmp/mount test"
+    os.makedirs(test_dir, exist_ok=True)
+    mount_time = []
+
+    def do_mount():
+        sleep(0.5)
+        mount_time.append(time())
+        subprocess.call(['mount', '-t', 'tmpfs', 'none', test_dir])
+
+    from threading import Thread
+    Thread(target=do_mount, daemon=True).start()
+    if table.wait_mounted(test_dir, 5):
+        log.info("mount of '%s' seen after %.2f ms (%s)"
+                 % (test_dir, (time() - mount_time[0]) * 1000.0, table.get_mount(test_dir)))
+        subprocess.call(['umount', test_dir])
+    else:
+        log.error("mount of '%s' not seen" % test_dir)
+    table.close()
+    os.rmdir(test_dir)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,267 @@
+#!/usr/bin/python3
+# coding=utf-8
+#
+# Binärer Cache der Steuerdatei (PoiStore + Gitterindex) neben der XML Datei
+
+import os
+import sys
+import json
+import struct
+import hashlib
+import zlib
+from array import array
+from PoiStore import PoiStore
+from GeoIndex import GeoGridIndex
+
+__author__ = 'Dirk'
+__copyright__ = 'Copyright 2017'
+__license__ = 'GPL'
+__version__ = '0.1'
+
+
+class PoiCacheException(Exception):
+    """
+    Cache ist ungültig, veraltet oder kaputt
+    """
+    def __init__(self, message):
+        super().__init__(message)
+
+
+class PoiCache:
+    """
+    Liest und schreibt den kompilierten Cache der Steuerdatei.
+    Aufbau: Kopf (magic, version, byteorder, mtime, size, sha1 der Quelle, crc32 der Nutzdaten)
+    danach Abschnitte (tag, länge, daten auf ALIGN Bytes ausgerichtet) mit den Spalten des PoiStore,
+    den internierten Tabellen und den Gitterindizes.
+    """
+    SUFFIX = ".cache"
+    MAGIC = b'BPOI'
+    VERSION = 2
+    # Ausrichtung der Daten eines Abschnittes
+    ALIGN = 8
+    # magic, version, byteorder (0=little, 1=big), mtime_ns, size, sha1, crc32, anzahl abschnitte
+    HEADER = struct.Struct('<4sHHqq20sII')
+    SECTION = struct.Struct('<4sI')
+    # Kopf eines Gitterindex: typcode, zellengröße, cellLat, cellLon, anzahl zellen
+    GRID_HEADER = struct.Struct('<iiddi')
+    # Spalten des PoiStore (tag, attribut)
+    COLUMNS = ((b'LAT ', 'lat'), (b'LON ', 'lon'), (b'RAD ', 'radius'), (b'DIR ', 'dir'),
+               (b'TYP ', 'typeCode'), (b'TIT ', 'titleIdx'), (b'NOT ', 'noticeIdx'), (b'MED ', 'mediaIdx'))
+
+    def __init__(self, logger, cache_file):
+        """
+        Konstruktor
+        :param logger: Programmlogger
+        :param cache_file: Datei für den Cache
+        """
+        self.log = logger
+        self.cacheFile = cache_file
+
+    @staticmethod
+    def source_signature(source_file, with_digest=True):
+        """
+        Kennung der Quelldatei (mtime, Größe, sha1)
+        :param source_file: XML Steuerdatei
+        :param with_digest: sha1 bilden (liest die ganze Datei), sonst nur stat
+        :return: (mtime_ns, size, sha1 digest oder None)
+        """
+        stat = os.stat(source_file)
+        if not with_digest:
+            return stat.st_mtime_ns, stat.st_size, None
+        return stat.st_mtime_ns, stat.st_size, PoiCache.source_digest(source_file)
+
+    @staticmethod
+    def source_digest(source_file):
+        """
+        sha1 der Quelldatei
+        :param source_file: XML Steuerdatei
+        :return: sha1 digest
+        """
+        digest = hashlib.sha1()
+        with open(source_file, 'rb') as source:
+            for block in iter(lambda: source.read(65536), b''):
+                digest.update(block)
+        return digest.digest()
+
+    @staticmethod
+    def __byteorder():
+        """privat, Kennung der Bytereihenfolge dieses Systems"""
+        return 0 if sys.byteorder == 'little' else 1
+
+    @staticmethod
+    def __align(pos):
+        """privat, Abstand bis zur nächsten durch ALIGN teilbaren Position"""
+        return -pos % PoiCache.ALIGN
+
+    def load(self, signature, source_file=None):
+        """
+        Cache laden, wenn er zur Quelle passt.
+        Stimmen mtime und Größe, wird die Quelle nicht gelesen. Sonst entscheidet der sha1
+        der Quelle (nur mit source_file), z.B. nach dem Kopieren auf einen neuen Stick.
+        Die Datei wird einmal ganz gelesen und die Abschnitte in eigene arrays kopiert, danach ist
+        sie zu (kein mmap: ein abgezogener Stick darf den laufenden PoiStore nicht mitnehmen).
+        :param signature: Kennung der Quelldatei (source_signature, sha1 darf None sein)
+        :param source_file: XML Steuerdatei für den Vergleich über sha1 oder None
+        :return: PoiStore oder None, wenn es keinen gültigen Cache gibt
+        """
+        try:
+            with open(self.cacheFile, 'rb') as cache:
+                data = cache.read()
+            return self.__decode(data, signature, source_file)
+        except FileNotFoundError:
+            self.log.debug("no poi cache %s..." % self.cacheFile)
+        except (OSError, ValueError, KeyError, IndexError, TypeError, struct.error, PoiCacheException) as msg:
+            # veraltet oder kaputt, dann eben neu parsen
+            self.log.warning("poi cache %s not usable: %s" % (self.cacheFile, msg))
+        return None
+
+    def __check_source(self, header, signature, source_file):
+        """
+        privat, passt der Cache zur Quelle?
+        :param header: Kopf des Cache (ausgepackt)
+        :param signature: Kennung der Quelldatei
+        :param source_file: XML Steuerdatei oder None
+        :return: None
+        :raises PoiCacheException: Quelle geändert
+        """
+        _magic, _version, _byteorder, mtime_ns, size, digest, crc, sections = header
+        if (mtime_ns, size) == tuple(signature[:2]):
+            return
+        source_digest = signature[2]
+        if source_digest is None and source_file is not None:
+            source_digest = self.source_digest(source_file)
+        if source_digest != digest:
+            raise PoiCacheException("source file changed")
+        # gleicher Inhalt mit neuer mtime: Kopf anpassen, beim nächsten Start reicht wieder stat
+        self.log.debug("poi cache %s: source touched, content unchanged..." % self.cacheFile)
+        try:
+            with open(self.cacheFile, 'r+b') as cache:
+                cache.write(self.HEADER.pack(self.MAGIC, self.VERSION, self.__byteorder(), signature[0],
+                                             signature[1], digest, crc, sections))
+        except OSError as msg:
+            self.log.debug("can't update poi cache header: %s" % msg)
+
+    def __decode(self, data, signature, source_file):
+        """
+        privat, Cache aus den Bytes lesen
+        :param data: Inhalt der Cachedatei (bytes)
+        :param signature: Kennung der Quelldatei
+        :param source_file: XML Steuerdatei oder None
+        :return: PoiStore
+        """
+        header = self.HEADER.unpack_from(data, 0)
+        magic, version, byteorder, _mtime_ns, _size, _digest, crc, sections = header
+        if magic != self.MAGIC or version != self.VERSION or byteorder != self.__byteorder():
+            raise PoiCacheException("wrong format")
+        self.__check_source(header, signature, source_file)
+        view = memoryview(data)
+        if zlib.crc32(view[self.HEADER.size:]) != crc:
+            raise PoiCacheException("checksum error")
+        store = PoiStore()
+        pos = self.HEADER.size
+        for _ in range(sections):
+            tag, length = self.SECTION.unpack_from(view, pos)
+            pos += self.SECTION.size
+            pos += self.__align(pos)
+            if pos + length > len(view):
+                raise PoiCacheException("truncated section %s" % tag)
+            self.__decode_section(store, tag, view[pos:pos + length])
+            pos += length
+        count = len(store.lat)
+        for _tag, name in self.COLUMNS:
+            if len(getattr(store, name)) != count:
+                raise PoiCacheException("column %s has wrong length" % name)
+        return store
+
+    def __decode_section(self, store, tag, chunk):
+        """
+        privat, einen Abschnitt in den PoiStore übernehmen
+        :param store: PoiStore
+        :param tag: Kennung des Abschnittes
+        :param chunk: Daten des Abschnittes (memoryview)
+        :return: None
+        """
+        for column_tag, name in self.COLUMNS:
+            if tag == column_tag:
+                column = array(getattr(store, name).typecode)
+                column.frombytes(chunk)
+                setattr(store, name, column)
+                return
+        if tag == b'STR ':
+            store.strings = json.loads(str(chunk, 'utf-8'))
+            store.stringMap = {text: idx for idx, text in enumerate(store.strings)}
+        elif tag == b'MLS ':
+            store.mediaLists = [tuple(media) for media in json.loads(str(chunk, 'utf-8'))]
+            store.mediaMap = {media: idx for idx, media in enumerate(store.mediaLists)}
+        elif tag == b'GIX ':
+            type_code, cell_size, cell_lat, cell_lon, n_cells = self.GRID_HEADER.unpack_from(chunk, 0)
+            table = array('i')
+            table.frombytes(chunk[self.GRID_HEADER.size:])
+            # zeilen, spalten, offsets (n_cells + 1), dann die Indizes
+            rows = table[0:n_cells]
+            cols = table[n_cells:2 * n_cells]
+            offsets = table[2 * n_cells:3 * n_cells + 1]
+            flat = table[3 * n_cells + 1:]
+            cells = {}
+            for cell in range(n_cells):
+                cells[(rows[cell], cols[cell])] = flat[offsets[cell]:offsets[cell + 1]].tolist()
+            grid = GeoGridIndex(cell_size)
+            grid.cellLat = cell_lat
+            grid.set_cells(cell_lon, cells)
+            store.gridIndexes[(type_code, cell_size)] = grid
+        else:
+            raise PoiCacheException("unknown section %s" % tag)
+
+    def save(self, store, signature):
+        """
+        Cache schreiben (atomar über eine temporäre Datei)
+        :param store: PoiStore (mit den gewünschten Gitterindizes)
+        :param signature: Kennung der Quelldatei (source_signature)
+        :return: Erfolgreich?
+        """
+        sections = []
+        for tag, name in self.COLUMNS:
+            sections.append((tag, getattr(store, name).tobytes()))
+        sections.append((b'STR ', json.dumps(store.strings).encode('utf-8')))
+        sections.append((b'MLS ', json.dumps(store.mediaLists).encode('utf-8')))
+        for (type_code, cell_size), grid in sorted(store.gridIndexes.items()):
+            keys = sorted(grid.cells.keys())
+            table = array('i', [key[0] for key in keys])
+            table.extend(key[1] for key in keys)
+            offset = 0
+            table.append(offset)
+            for key in keys:
+                offset += len(grid.cells[key])
+                table.append(offset)
+            for key in keys:
+                table.extend(grid.cells[key])
+            head = self.GRID_HEADER.pack(type_code, cell_size, grid.cellLat, grid.cellLon, len(keys))
+            sections.append((b'GIX ', head + table.tobytes()))
+        parts = []
+        pos = self.HEADER.size
+        for tag, chunk in sections:
+            pos += self.SECTION.size
+            # Daten ausgerichtet (Format der Version 2), gelesen wird mit array.frombytes
+            padding = self.__align(pos)
+            parts.append(self.SECTION.pack(tag, len(chunk)) + bytes(padding) + chunk)
+            pos += padding + len(chunk)
+        payload = b''.join(parts)
+        mtime_ns, size, digest = signature
+        header = self.HEADER.pack(self.MAGIC, self.VERSION, self.__byteorder(), mtime_ns, size, digest,
+                                  zlib.crc32(payload), len(sections))
+        tmp_file = self.cacheFile + ".tmp"
+        try:
+            with open(tmp_file, 'wb') as cache:
+                cache.write(header)
+                cache.write(payload)
+            os.replace(tmp_file, self.cacheFile)
+            self.log.debug("poi cache %s written..." % self.cacheFile)
+            return True
+        except OSError as msg:
+            # z.B. Stick schreibgeschützt, dann eben ohne Cache
+            self.log.warning("can't write poi cache %s: %s" % (self.cacheFile, msg))
+            try:
+                os.remove(tmp_file)
+            except OSError:
+                pass
+            return False
@@ -0,0 +1,255 @@
+#!/usr/bin/python3
+# coding=utf-8
+#
+# Spaltenspeicher für die POI aus der Steuerdatei
+
+from array import array
+from GeoIndex import GeoGridIndex
+
+__author__ = 'Dirk'
+__copyright__ = 'Copyright 2017'
+__license__ = 'GPL'
+__version__ = '0.1'
+
+
+class PoiStore:
+    """
+    Speichert die POI spaltenweise:
+    lat/lon als float64 array, radius/dir als int array, Typ als Code,
+    Titel, Notiz und Medienlisten in internierten Tabellen.
+    Ein POI ist nur noch ein Index (PoiView) in diese Spalten.
+    """
+    # Typcodes der POI (Tag im XML)
+    TYPE_POSITION = 0
+    TYPE_STOP = 1
+    TYPE_OTHER = 2
+    TYPE_NAMES = ('position', 'stop', 'other')
+    # Wert für fehlenden Radius/Richtung (wie im Parser)
+    NO_VALUE = -1
+
+    def __init__(self):
+        """Konstruktor, leerer Speicher"""
+        self.lat = array('d')
+        self.lon = array('d')
+        self.radius = array('i')
+        self.dir = array('i')
+        self.typeCode = array('b')
+        self.titleIdx = array('i')
+        self.noticeIdx = array('i')
+        self.mediaIdx = array('i')
+        # internierte Tabellen (Titel und Notizen teilen sich eine Tabelle)
+        self.strings = []
+        self.stringMap = {}
+        self.mediaLists = []
+        self.mediaMap = {}
+        # Gitterindizes je (Typcode, Zellengröße), werden bei Bedarf gebaut oder aus dem Cache geladen
+        self.gridIndexes = {}
+
+    @staticmethod
+    def from_poi_list(pois):
+        """
+        Speicher aus einer Liste von POI Dictonarys (parse_control_file) erzeugen
+        :param pois: Liste der POI
+        :return: PoiStore
+        """
+        store = PoiStore()
+        for poi in pois:
+            store.append(poi)
+        return store
+
+    @staticmethod
+    def type_code(type_name):
+        """
+        Typcode eines XML Tags
+        :param type_name: 'position' oder 'stop'
+        :return: Typcode
+        """
+        if type_name == 'position':
+            return PoiStore.TYPE_POSITION
+        if type_name == 'stop':
+            return PoiStore.TYPE_STOP
+        return PoiStore.TYPE_OTHER
+
+    def __intern_string(self, text):
+        """
+        privat, String in die Tabelle eintragen
+        :param text: String oder None
+        :return: Index in der Tabelle, -1 für None
+        """
+        if text is None:
+            return -1
+        idx = self.stringMap.get(text)
+        if idx is None:
+            idx = len(self.strings)
+            self.strings.append(text)
+            self.stringMap[text] = idx
+        return idx
+
+    def __intern_media(self, media_list):
+        """
+        privat, Medienliste in die Tabelle eintragen
+        :param media_list: Liste der Mediendateien
+        :return: Index in der Tabelle
+        """
+        media = tuple(media_list or ())
+        idx = self.mediaMap.get(media)
+        if idx is None:
+            idx = len(self.mediaLists)
+            self.mediaLists.append(media)
+            self.mediaMap[media] = idx
+        return idx
+
+    @staticmethod
+    def __to_float(value):
+        """privat, Koordinate nach float, ungültig wird NaN"""
+        try:
+            return float(value)
+        except (TypeError, ValueError):
+            return float('nan')
+
+    @staticmethod
+    def __to_int(value):
+        """privat, Radius/Richtung nach int, fehlend wird NO_VALUE"""
+        try:
+            return int(value)
+        except (TypeError, ValueError):
+            return PoiStore.NO_VALUE
+
+    def append(self, poi):
+        """
+        einen POI anhängen
+        :param poi: Dictonary wie aus parse_control_file ('type', 'lat', 'lon', 'radius', ...)
+        :return: Index des POI
+        """
+        self.lat.append(self.__to_float(poi.get('lat')))
+        self.lon.append(self.__to_float(poi.get('lon')))
+        self.radius.append(self.__to_int(poi.get('radius')))
+        self.dir.append(self.__to_int(poi.get('dir')))
+        self.typeCode.append(self.type_code(poi.get('type')))
+        self.titleIdx.append(self.__intern_string(poi.get('title')))
+        self.noticeIdx.append(self.__intern_string(poi.get('notice')))
+        self.mediaIdx.append(self.__intern_media(poi.get('medium')))
+        # vorhandene Indizes passen nicht mehr
+        self.gridIndexes = {}
+        return len(self.lat) - 1
+
+    def indices_of_type(self, type_name):
+        """
+        Indizes aller POI eines Typs
+        :param type_name: 'position' oder 'stop'
+        :return: Liste der Indizes
+        """
+        code = self.type_code(type_name)
+        return [idx for idx, poi_type in enumerate(self.typeCode) if poi_type == code]
+
+    def views_of_type(self, type_name):
+        """
+        alle POI eines Typs als PoiView
+        :param type_name: 'position' oder 'stop'
+        :return: Liste der PoiView
+        """
+        return [PoiView(self, idx) for idx in self.indices_of_type(type_name)]
+
+    def get_grid_index(self, type_name, cell_size=GeoGridIndex.DEFAULT_CELL_SIZE):
+        """
+        Gitterindex über alle POI eines Typs (wird einmal gebaut und gemerkt)
+        :param type_name: 'position' oder 'stop'
+        :param cell_size: Zellengröße in Metern
+        :return: GeoGridIndex
+        """
+        key = (self.type_code(type_name), int(cell_size))
+        grid = self.gridIndexes.get(key)
+        if grid is None:
+            grid = GeoGridIndex(cell_size)
+            grid.build(self.lat, self.lon, self.indices_of_type(type_name))
+            self.gridIndexes[key] = grid
+        return grid
+
+    def view(self, idx):
+        """
+        POI mit Index idx
+        :param idx: Index
+        :return: PoiView
+        """
+        return PoiView(self, idx)
+
+    def string(self, idx):
+        """
+        String aus der internierten Tabelle
+        :param idx: Index oder -1
+        :return: String oder None
+        """
+        if idx < 0:
+            return None
+        return self.strings[idx]
+
+    def __len__(self):
+        """Anzahl der POI"""
+        return len(self.lat)
+
+    def __iter__(self):
+        """alle POI als PoiView"""
+        return (PoiView(self, idx) for idx in range(len(self.lat)))
+
+
+class PoiView:
+    """
+    leichtgewichtige Sicht auf einen POI im PoiStore,
+    lesbar wie das bisherige Dictonary (poi['title'], poi['lat'], ...)
+    """
+    __slots__ = ('store', 'index')
+    KEYS = ('type', 'title', 'lat', 'lon', 'radius', 'dir', 'notice', 'medium')
+
+    def __init__(self, store, index):
+        """
+        Konstruktor
+        :param store: PoiStore
+        :param index: Index des POI
+        """
+        self.store = store
+        self.index = index
+
+    def __getitem__(self, key):
+        """dict-artiger Zugriff"""
+        store = self.store
+        idx = self.index
+        if key == 'lat':
+            return store.lat[idx]
+        if key == 'lon':
+            return store.lon[idx]
+        if key == 'radius':
+            return store.radius[idx]
+        if key == 'title':
+            return store.string(store.titleIdx[idx])
+        if key == 'notice':
+            return store.string(store.noticeIdx[idx])
+        if key == 'medium':
+            return store.mediaLists[store.mediaIdx[idx]]
+        if key == 'type':
+            return PoiStore.TYPE_NAMES[store.typeCode[idx]]
+        if key == 'dir':
+            return store.dir[idx]
+        raise KeyError(key)
+
+    def get(self, key, default=None):
+        """dict-artiger Zugriff mit Vorgabe"""
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def as_dict(self):
+        """
+        den POI als Dictonary (für Log und Debug)
+        :return: Dictonary
+        """
+        return {key: self[key] for key in PoiView.KEYS}
+
+    def __eq__(self, other):
+        return isinstance(other, PoiView) and self.store is other.store and self.index == other.index
+
+    def __hash__(self):
+        return hash((id(self.store), self.index))
+
+    def __repr__(self):
+        return str(self.as_dict())
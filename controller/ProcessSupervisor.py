@@ -0,0 +1,308 @@
+#!/usr/bin/python3
+# coding=utf-8
+#
+# Überwachung eines Prozesses (KODI) über die gemerkte PID statt Suche über alle Prozesse
+
+import os
+import sys
+import select
+import logging
+import subprocess
+from time import time, sleep
+from threading import Thread, Lock, Event, current_thread
+import psutil
+
+__author__ = 'Dirk'
+__copyright__ = 'Copyright 2017'
+__license__ = 'GPL'
+__version__ = '0.1'
+
+
+class ProcessSupervisor:
+    """
+    Merkt sich die PID eines Prozesses (von spawn() oder einmaliger Suche)
+    und prüft nur noch diese über /proc/<pid>/stat.
+    Erst wenn der Prozess weg ist, wird wieder über alle Prozesse gesucht.
+    Mit start_watch() meldet ein Thread das Ende des Prozesses sofort (pidfd, sonst /proc im Takt).
+    """
+    # Takt für die Überwachung, wenn es kein pidfd gibt
+    WATCH_INTERVAL = 0.1
+    # Takt für wait_exit(), wenn es kein pidfd gibt
+    WAIT_INTERVAL = 0.05
+
+    def __init__(self, logger, process_name):
+        """
+        Konstruktor
+        :param logger: Programmlogger
+        :param process_name: Name des Prozesses (wie in /proc/<pid>/comm)
+        """
+        self.log = logger
+        self.processName = process_name
+        self.pid = None
+        self.lastPid = None
+        self.isChild = False
+        self.lock = Lock()
+        self.startCount = 0
+        self.exitCount = 0
+        self.scanCount = 0
+        self.lastExitTime = 0
+        self.callBackExit = None
+        self.watchThread = None
+        self.watchQuit = Event()
+
+    def spawn(self, exec_path, *args):
+        """
+        Prozess starten und die PID merken
+        :param exec_path: Programm
+        :param args: Parameter
+        :return: PID
+        """
+        pid = os.spawnl(os.P_NOWAIT, exec_path, exec_path, *args)
+        self.track(pid, is_child=True)
+        return pid
+
+    def track(self, pid, is_child=False):
+        """
+        PID übernehmen (neuer Start oder gefunden)
+        :param pid: PID
+        :param is_child: selbst gestartet (dann mit waitpid aufräumen)?
+        :return: None
+        """
+        self.lock.acquire()
+        if pid != self.lastPid:
+            if self.lastPid is not None:
+                self.log.info("%s runs with new pid %d (was %d)..." % (self.processName, pid, self.lastPid))
+            self.startCount += 1
+            self.isChild = is_child
+        self.pid = pid
+        self.lastPid = pid
+        callback = self.callBackExit
+        self.lock.release()
+        self.log.debug("track %s with pid %d..." % (self.processName, pid))
+        if callback is not None:
+            # Überwachung auf den neuen Prozess umstellen
+            self.start_watch(callback)
+
+    def get_pid(self):
+        """
+        gemerkte PID
+        :return: PID oder None
+        """
+        return self.pid
+
+    def is_running(self):
+        """
+        Läuft der Prozess?
+        Zuerst die gemerkte PID prüfen, nur wenn die weg ist über alle Prozesse suchen
+        :return: True, wenn ja
+        """
+        pid = self.pid
+        if pid is not None:
+            if self.is_alive(pid):
+                return True
+            self.__mark_exit(pid)
+        pid = self.scan()
+        if pid is None:
+            return False
+        self.track(pid)
+        return True
+
+    def is_alive(self, pid):
+        """
+        Lebt der Prozess mit der PID (und ist es noch unser Prozess)?
+        :param pid: PID
+        :return: lebt?
+        """
+        if self.isChild and pid == self.pid:
+            # eigenes Kind, ein beendeter Prozess ist bis zum waitpid ein Zombie,
+            # die PID kann bis dahin nicht neu vergeben werden (Name direkt nach spawn noch der vom fork)
+            try:
+                return os.waitpid(pid, os.WNOHANG)[0] == 0
+            except ChildProcessError:
+                # schon aufgeräumt (z.B. vom Überwachungsthread)
+                return False
+        try:
+            with open("/proc/%d/stat" % pid, 'rb') as stat_file:
+                stat = stat_file.read()
+        except OSError:
+            return False
+        # "pid (comm) state ...", comm kann Leerzeichen und Klammern enthalten
+        start = stat.find(b'(')
+        end = stat.rfind(b')')
+        if start < 0 or end < 0:
+            return False
+        name = stat[start + 1:end].decode('utf-8', 'replace')
+        state = stat[end + 2:end + 3]
+        # PID könnte inzwischen ein anderer Prozess sein
+        return name == self.processName[:15] and state not in (b'Z', b'X')
+
+    def scan(self):
+        """
+        über alle Prozesse suchen (teuer, nur als Rückfall)
+        :return: PID oder None
+        """
+        self.scanCount += 1
+        for proc in psutil.process_iter(['name']):
+            if proc.info['name'] == self.processName:
+                return proc.pid
+        return None
+
+    def __mark_exit(self, pid):
+        """
+        privat, Prozess ist beendet
+        :param pid: PID des beendeten Prozesses
+        :return: True, wenn das Ende neu erkannt wurde
+        """
+        self.lock.acquire()
+        if self.pid != pid:
+            self.lock.release()
+            return False
+        self.pid = None
+        self.exitCount += 1
+        self.lastExitTime = time()
+        self.lock.release()
+        self.log.warning("%s with pid %d is gone..." % (self.processName, pid))
+        return True
+
+    def wait_exit(self, timeout):
+        """
+        warten, bis der Prozess endet
+        :param timeout: maximale Wartezeit in Sekunden
+        :return: True, wenn der Prozess beendet ist
+        """
+        pid = self.pid
+        if pid is None:
+            return True
+        end_time = time() + timeout
+        pid_fd = self.__open_pidfd(pid)
+        try:
+            while True:
+                if not self.is_alive(pid):
+                    self.__mark_exit(pid)
+                    return True
+                rest = end_time - time()
+                if rest <= 0:
+                    return False
+                if pid_fd is not None:
+                    # pidfd wird lesbar, wenn der Prozess endet
+                    select.select([pid_fd], [], [], rest)
+                else:
+                    sleep(min(rest, ProcessSupervisor.WAIT_INTERVAL))
+        finally:
+            if pid_fd is not None:
+                os.close(pid_fd)
+
+    def __open_pidfd(self, pid):
+        """
+        privat, pidfd öffnen (Linux >= 5.3, Python >= 3.9)
+        :param pid: PID
+        :return: Filedescriptor oder None
+        """
+        if not hasattr(os, 'pidfd_open'):
+            return None
+        try:
+            return os.pidfd_open(pid)
+        except OSError:
+            return None
+
+    def start_watch(self, callback):
+        """
+        Thread starten, der das Ende des Prozesses sofort meldet
+        :param callback: Funktion mit (pid), wird im Thread aufgerufen
+        :return: True, wenn ein Prozess überwacht wird
+        """
+        self.stop_watch()
+        self.lock.acquire()
+        self.callBackExit = callback
+        pid = self.pid
+        self.lock.release()
+        if pid is None:
+            return False
+        self.watchQuit = Event()
+        self.watchThread = Thread(target=self.__watch, args=(pid, self.watchQuit), daemon=True)
+        self.watchThread.start()
+        return True
+
+    def stop_watch(self):
+        """Überwachung beenden (z.B. vor einem gewollten Beenden)"""
+        self.lock.acquire()
+        self.callBackExit = None
+        thread = self.watchThread
+        self.watchThread = None
+        self.lock.release()
+        self.watchQuit.set()
+        if thread is not None and thread is not current_thread():
+            thread.join(1)
+
+    def __watch(self, pid, quit_event):
+        """
+        privat, Thread: auf das Ende des Prozesses warten
+        :param pid: PID
+        :param quit_event: beendet die Überwachung
+        :return: None
+        """
+        pid_fd = self.__open_pidfd(pid)
+        try:
+            while True:
+                if pid_fd is not None:
+                    # pidfd wird lesbar, wenn der Prozess endet, nicht endlos blockieren, damit stop_watch() greift
+                    select.select([pid_fd], [], [], 0.5)
+                else:
+                    quit_event.wait(ProcessSupervisor.WATCH_INTERVAL)
+                if quit_event.is_set():
+                    return
+                if not self.is_alive(pid):
+                    break
+        finally:
+            if pid_fd is not None:
+                os.close(pid_fd)
+        self.__mark_exit(pid)
+        self.lock.acquire()
+        callback = self.callBackExit
+        self.lock.release()
+        if callback is not None:
+            callback(pid)
+
+    def get_stats(self):
+        """
+        Statistik der Überwachung
+        :return: Dictonary mit pid, starts, restarts, exits, scans
+        """
+        return {'pid': self.pid, 'starts': self.startCount, 'restarts': max(0, self.startCount - 1),
+                'exits': self.exitCount, 'scans': self.scanCount}
+
+
+def main():
+    """Main zum Testen: sleep als Prozess überwachen und gegen die Suche über alle Prozesse messen"""
+    log = logging.getLogger("supervisor")
+    log.setLevel(logging.DEBUG)
+    log.addHandler(logging.StreamHandler(sys.stdout))
+    supervisor = ProcessSupervisor(log, "sleep")
+    supervisor.spawn("/bin/sleep", "30")
+    loops = 200
+    start = time()
+    for _ in range(loops):
+        supervisor.is_running()
+    cached = (time() - start) / loops
+    start = time()
+    for _ in range(20):
+        supervisor.scan()
+    scanned = (time() - start) / 20
+    log.info("is_running cached pid: %.3f ms, full scan: %.3f ms" % (cached * 1000.0, scanned * 1000.0))
+    exited = Event()
+    exit_time = []
+
+    def on_exit(pid):
+        exit_time.append(time())
+        exited.set()
+
+    supervisor.start_watch(on_exit)
+    kill_time = time()
+    subprocess.run(['/bin/kill', str(supervisor.get_pid())])
+    if exited.wait(5):
+        log.info("exit detected after %.1f ms" % ((exit_time[0] - kill_time) * 1000.0))
+    log.info("stats: %s" % supervisor.get_stats())
+
+
+if __name__ == '__main__':
+    main()
@@ -10,7 +10,9 @@ import logging.handlers
 import signal
 from pathlib import Path
 from MainController import MainObject
+from urllib.parse import urlparse
 from KodiControl import KodiException, KodiControl
+from AsyncKodiControl import AsyncKodiControl
 from MediaControl import MediaControl
 
 """
@@ -28,6 +30,8 @@ control_file = usb_mount_point + "/busControl.xml"
 log_file = "/var/log/mediaplayer/mediaplay.log"
 marker_file = "/home/pi/mediaplayer/controller/x-session.mark"
 socket_file = "/home/pi/mediaplayer/controller/show_display.sock"
+# Medien einzeln abspielen, MainObject.PLAY_MODE_PLAYLIST schaltet den Playlist Betrieb (ohne Lücken) ein
+play_mode = MainObject.PLAY_MODE_SINGLE
 
 
 def make_logger(my_log_level):
@@ -98,8 +102,8 @@ def main_prog():
         if not media_control.mount_usb_device(usb_mount_point):
             log.error("ERROR: can't mount usb stick, abort!")
             return
-        time.sleep(3)
-        is_mounted = media_control.check_is_mounted(usb_mount_point)
+        # bis zu 3 Sekunden auf den Mount warten, eine Änderung der Mounts weckt sofort
+        is_mounted = media_control.wait_is_mounted(usb_mount_point, 3)
         if is_mounted:
             break
         loop_count += 1
@@ -151,8 +155,13 @@ def main_prog():
     #
     # das Mainobjekt macht den Rest
     #
-    media_control.load_media_list(usb_mount_point, False)
-    main_obj = MainObject(log, kodi_control, media_control, kodi_url, socket_file, control_file)
+    # rekursiv, die Wiedergabe kann schon mit dem ersten Fund beginnen
+    media_control.load_media_list(usb_mount_point, True, wait=False)
+    # Status und POI über den asyncio Client (TCP), eine langsame Antwort hält so keinen POI auf
+    kodi_async = AsyncKodiControl(log, urlparse(kodi_url).hostname or "localhost", supervisor=kodi_control.supervisor)
+    kodi_async.start_loop_thread()
+    main_obj = MainObject(log, kodi_control, media_control, kodi_url, socket_file, control_file, play_mode,
+                          kodi_async)
     signal.signal(signal.SIGINT, lambda signal, frame: main_obj.quit_app())
     # etwas warten um dem kodi noch zeit zu geben sich zu sortieren
     time.sleep(5)
@@ -160,6 +169,7 @@ def main_prog():
     #
     # aufraumen
     #
+    kodi_async.stop_loop_thread()
     del kodi_control
     time.sleep(2)
     del media_control
@@ -0,0 +1,319 @@
+#!/usr/bin/python3
+# coding=utf-8
+#
+# Überwachung der Steuerdatei auf dem Stick über inotify statt stat je Abfrage
+
+import os
+import sys
+import errno
+import struct
+import select
+import ctypes
+import ctypes.util
+import logging
+import tempfile
+from time import time, sleep
+from threading import Thread, Lock, Event
+
+__author__ = 'Dirk'
+__copyright__ = 'Copyright 2017'
+__license__ = 'GPL'
+__version__ = '0.1'
+
+
+class StickWatcher(Thread):
+    """
+    Thread, der die Steuerdatei und das Verzeichnis (Mountpoint des Sticks) über inotify überwacht
+    und nur bei Ereignissen nachsieht, ob die Datei noch da ist.
+    is_present() liest nur das Flag im Speicher.
+    Ohne inotify (z.B. nicht Linux) wird im Takt mit stat nachgesehen.
+    """
+    # inotify Konstanten aus <sys/inotify.h>
+    IN_ATTRIB = 0x00000004
+    IN_MOVED_FROM = 0x00000040
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    IN_DELETE = 0x00000200
+    IN_DELETE_SELF = 0x00000400
+    IN_MOVE_SELF = 0x00000800
+    IN_UNMOUNT = 0x00002000
+    IN_Q_OVERFLOW = 0x00004000
+    IN_IGNORED = 0x00008000
+    IN_NONBLOCK = 0o4000
+    IN_CLOEXEC = 0o2000000
+    # Kopf eines Ereignisses: wd, mask, cookie, len
+    EVENT_HEADER = struct.Struct('iIII')
+    # Masken für die Datei und das Verzeichnis
+    FILE_MASK = IN_ATTRIB | IN_DELETE_SELF | IN_MOVE_SELF
+    DIR_MASK = IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF
+    # Takt ohne inotify
+    POLL_INTERVAL = 1.0
+    READ_SIZE = 4096
+
+    def __init__(self, logger, control_file):
+        """
+        Konstruktor
+        :param logger: Programmlogger
+        :param control_file: Steuerdatei auf dem Stick (das Verzeichnis ist der Mountpoint)
+        """
+        Thread.__init__(self)
+        self.daemon = True
+        self.log = logger
+        self.controlFile = control_file
+        self.controlDir = os.path.dirname(os.path.abspath(control_file))
+        self.controlName = os.path.basename(control_file)
+        self.isPresent = os.path.isfile(control_file)
+        self.isRunning = False
+        self.quitEvent = Event()
+        # Pipe zum Wecken des Threads bei quit_thread(), select() wartet so ohne Timeout
+        self.wakeRead, self.wakeWrite = os.pipe()
+        os.set_blocking(self.wakeRead, False)
+        os.set_blocking(self.wakeWrite, False)
+        self.wakeCount = 0
+        self.lock = Lock()
+        self.callBackGone = None
+        self.inotifyFd = None
+        self.eventCount = 0
+        self.checkCount = 0
+        self.libc = None
+        self.log.debug("stick watcher for %s instantiate..." % control_file)
+
+    def __del__(self):
+        """Destruktor"""
+        for fd in (self.wakeRead, self.wakeWrite):
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+
+    def set_on_gone(self, callback):
+        """
+        Callback, wenn die Steuerdatei verschwindet
+        :param callback: Funktion ohne Parameter, wird im Thread aufgerufen
+        :return: None
+        """
+        self.lock.acquire()
+        self.callBackGone = callback
+        self.lock.release()
+
+    def clear_on_gone(self):
+        """Callback für das Verschwinden löschen"""
+        self.set_on_gone(None)
+
+    def is_present(self):
+        """
+        Ist die Steuerdatei da? (nur das Flag, kein Zugriff auf den Stick)
+        :return: vorhanden?
+        """
+        return self.isPresent
+
+    def is_inotify(self):
+        """
+        Läuft die Überwachung über inotify?
+        :return: inotify?
+        """
+        return self.inotifyFd is not None
+
+    def quit_thread(self):
+        """Thread beenden"""
+        self.log.debug("stick watcher should quit...")
+        self.isRunning = False
+        self.quitEvent.set()
+        try:
+            os.write(self.wakeWrite, b'q')
+        except OSError:
+            # Pipe voll, der Thread wird ohnehin geweckt
+            pass
+
+    def get_stats(self):
+        """
+        Statistik der Überwachung
+        :return: Dictonary mit inotify, wakeups, events, checks, present
+        """
+        return {'inotify': self.is_inotify(), 'wakeups': self.wakeCount, 'events': self.eventCount,
+                'checks': self.checkCount, 'present': self.isPresent}
+
+    def run(self):
+        """
+        Hauptschleife des Thread
+        :return: None
+        """
+        self.isRunning = True
+        if self.__open_inotify():
+            self.__check()
+            try:
+                self.__inotify_loop()
+            finally:
+                self.__close_inotify()
+        while self.isRunning:
+            # ohne inotify oder nach dem Aushängen (Watches weg)
+            self.__check()
+            self.quitEvent.wait(StickWatcher.POLL_INTERVAL)
+        self.log.debug("stick watcher ends...")
+
+    def __open_inotify(self):
+        """
+        privat, inotify über die libc öffnen und die Watches setzen
+        :return: Erfolgreich?
+        """
+        try:
+            self.libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+            self.libc.inotify_add_watch.argtypes = (ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32)
+            fd = self.libc.inotify_init1(StickWatcher.IN_NONBLOCK | StickWatcher.IN_CLOEXEC)
+        except (OSError, AttributeError) as msg:
+            self.log.warning("no inotify (%s), poll control file..." % msg)
+            return False
+        if fd < 0:
+            self.log.warning("inotify_init1 failed (%s), poll control file..." % os.strerror(ctypes.get_errno()))
+            return False
+        self.inotifyFd = fd
+        if self.__add_watch(self.controlDir, StickWatcher.DIR_MASK) < 0:
+            self.__close_inotify()
+            return False
+        # die Datei selbst (ATTRIB bei unlink, auch wenn der Eintrag über einen anderen Pfad verschwindet)
+        self.__add_watch(self.controlFile, StickWatcher.FILE_MASK)
+        self.log.debug("stick watcher uses inotify on %s..." % self.controlDir)
+        return True
+
+    def __add_watch(self, path, mask):
+        """
+        privat, Watch setzen
+        :param path: Datei oder Verzeichnis
+        :param mask: Ereignisse
+        :return: Watch Descriptor oder < 0
+        """
+        wd = self.libc.inotify_add_watch(self.inotifyFd, os.fsencode(path), mask)
+        if wd < 0:
+            err = ctypes.get_errno()
+            if err != errno.ENOENT:
+                self.log.warning("can't watch %s: %s" % (path, os.strerror(err)))
+        return wd
+
+    def __close_inotify(self):
+        """privat, inotify schliessen"""
+        if self.inotifyFd is not None:
+            os.close(self.inotifyFd)
+            self.inotifyFd = None
+
+    def __inotify_loop(self):
+        """
+        privat, auf Ereignisse warten, bis der Thread endet oder der Stick ausgehängt wird
+        :return: None
+        """
+        while self.isRunning:
+            readable, _w, _x = select.select([self.inotifyFd, self.wakeRead], [], [])
+            self.wakeCount += 1
+            if self.wakeRead in readable:
+                try:
+                    os.read(self.wakeRead, 64)
+                except BlockingIOError:
+                    pass
+                continue
+            try:
+                data = os.read(self.inotifyFd, StickWatcher.READ_SIZE)
+            except BlockingIOError:
+                continue
+            unmounted = False
+            recheck = False
+            pos = 0
+            while pos + StickWatcher.EVENT_HEADER.size <= len(data):
+                wd, mask, _cookie, length = StickWatcher.EVENT_HEADER.unpack_from(data, pos)
+                pos += StickWatcher.EVENT_HEADER.size
+                name = data[pos:pos + length].split(b'\0', 1)[0]
+                pos += length
+                self.eventCount += 1
+                if mask & StickWatcher.IN_UNMOUNT:
+                    unmounted = True
+                if mask & StickWatcher.IN_Q_OVERFLOW or not name or os.fsdecode(name) == self.controlName:
+                    recheck = True
+                if name and mask & (StickWatcher.IN_CREATE | StickWatcher.IN_MOVED_TO) \
+                        and os.fsdecode(name) == self.controlName:
+                    # Datei ist wieder da, neue Inode überwachen
+                    self.__add_watch(self.controlFile, StickWatcher.FILE_MASK)
+            if unmounted:
+                self.log.warning("stick with %s unmounted..." % self.controlFile)
+                self.__set_present(False)
+                return
+            if recheck:
+                self.__check()
+                if not os.path.isdir(self.controlDir):
+                    # Mountpoint selbst ist weg
+                    return
+
+    def __check(self):
+        """
+        privat, einmal nachsehen (stat), ob die Datei da ist
+        :return: None
+        """
+        self.checkCount += 1
+        self.__set_present(os.path.isfile(self.controlFile))
+
+    def __set_present(self, is_present):
+        """
+        privat, Flag setzen und beim Verschwinden den Callback rufen
+        :param is_present: Datei vorhanden?
+        :return: None
+        """
+        was_present = self.isPresent
+        self.isPresent = is_present
+        if was_present == is_present:
+            return
+        if is_present:
+            self.log.info("control file %s is back..." % self.controlFile)
+            return
+        self.log.info("control file %s is gone..." % self.controlFile)
+        self.lock.acquire()
+        callback = self.callBackGone
+        self.lock.release()
+        if callback is not None:
+            callback()
+
+
+def main():
+    """Main zum Testen: Datei löschen und Zeit bis zur Meldung, Kosten je Abfrage gegen stat"""
+    log = logging.getLogger("stick")
+    log.setLevel(logging.INFO)
+    log.addHandler(logging.StreamHandler(sys.stdout))
+    test_dir = tempfile.mkdtemp()
+    control_file = os.path.join(test_dir, "busControl.xml")
+    open(control_file, 'w').close()
+    watcher = StickWatcher(log, control_file)
+    gone = Event()
+    watcher.set_on_gone(gone.set)
+    watcher.start()
+    loops = 100000
+    start = time()
+    for _ in range(loops):
+        watcher.is_present()
+    flag_time = (time() - start) / loops
+    start = time()
+    for _ in range(loops):
+        os.path.isfile(control_file)
+    stat_time = (time() - start) / loops
+    log.info("is_present: %.3f us, stat: %.3f us per call" % (flag_time * 1e6, stat_time * 1e6))
+    # andere Dateien im Verzeichnis ändern nichts
+    open(os.path.join(test_dir, "other.jpg"), 'w').close()
+    remove_time = time()
+    os.remove(control_file)
+    if gone.wait(5):
+        log.info("control file gone detected after %.2f ms" % ((time() - remove_time) * 1000.0))
+    else:
+        log.error("control file gone NOT detected!")
+    log.info("stats: %s" % watcher.get_stats())
+    # neue Datei, dann 2 s Ruhe: ohne Ereignis darf der Thread nicht aufwachen
+    open(control_file, 'w').close()
+    sleep(0.5)
+    wakeups = watcher.get_stats()['wakeups']
+    sleep(2)
+    log.info("idle 2 s: %d wakeups" % (watcher.get_stats()['wakeups'] - wakeups))
+    start = time()
+    watcher.quit_thread()
+    watcher.join(2)
+    log.info("quit after %.2f ms, thread alive: %s" % ((time() - start) * 1000.0, watcher.is_alive()))
+    os.remove(control_file)
+    os.remove(os.path.join(test_dir, "other.jpg"))
+    os.rmdir(test_dir)
+
+
+if __name__ == '__main__':
+    main()
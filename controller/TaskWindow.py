@@ -3,12 +3,11 @@
 import time
 import sys
 import signal
-import re
-import threading
 import logging
 import logging.handlers
 from time import sleep
 from IpcUnixThreadedServer import IpcUnixThreadedServer
+import DisplayProtocol
 from PyQt5.QtGui import *
 from PyQt5.QtWidgets import *
 from PyQt5.QtCore import *
@@ -38,15 +37,12 @@ class TaskWindow(QMainWindow, TaskWindow_auto.Ui_TaskWindow):
     KEY_02 = 16
     KEY_03 = 18
     HEADLINE = "ANZEIGE STATUS"
-    # Reguläre Ausdrücke vorcompiliert, Objektglobal
-    rxTitle = re.compile(r"^title:.*", re.IGNORECASE)
-    rxInfo = re.compile(r"^info:.*", re.IGNORECASE)
-    rxClear = re.compile(r"^clear$", re.IGNORECASE)
-    rxGpsUnlock = re.compile(r"^unlock$", re.IGNORECASE)
-    rxGpsLock = re.compile(r"^lock$", re.IGNORECASE)
-    rxGpsUndef = re.compile(r"^undef$", re.IGNORECASE)
-    rxQuit = re.compile(r"^quit$", re.IGNORECASE)
-    rxDP = re.compile(r':')
+    # Änderungen innerhalb dieser Zeit (ms) werden zu einem Neuzeichnen zusammengefasst
+    FRAME_MS = 16
+    # Reihenfolge beim Anwenden der Felder eines Updates
+    FIELD_ORDER = ('clear', 'lock', 'title', 'info', 'clock')
+    # Nachrichten vom Server Thread, "queued" in den GUI Thread
+    messageSignal = pyqtSignal(object)
 
     def __init__(self, _logging, _s_file):
         """Konstruktor"""
@@ -63,6 +59,8 @@ class TaskWindow(QMainWindow, TaskWindow_auto.Ui_TaskWindow):
         # GPS Zeit unterwegs...
         self.gps_is_lock = False
         self.timer = None
+        # gesammelte Änderungen bis zum nächsten Neuzeichnen
+        self.pendingUpdate = {}
         #
         # Fenster/GUI initialisieren
         #
@@ -118,10 +116,18 @@ class TaskWindow(QMainWindow, TaskWindow_auto.Ui_TaskWindow):
         #
         # Unix-Socket Server erzeugen
         #
+        # Kommandos eines Updates -> Methode (statt Kette regulärer Ausdrücke)
+        self.commands = {'clear': self.__cmd_clear, 'lock': self.__cmd_lock, 'title': self.__cmd_title,
+                         'info': self.__cmd_info, 'clock': self.__cmd_clock}
+        # Timer für das zusammengefasste Neuzeichnen
+        self.repaintTimer = QTimer(self)
+        self.repaintTimer.setSingleShot(True)
+        self.repaintTimer.setInterval(TaskWindow.FRAME_MS)
+        self.repaintTimer.timeout.connect(self.__flush_updates)
+        # der Server ruft emit() in seinem Thread, rec_message läuft dann im GUI Thread (kein Lock nötig)
+        self.messageSignal.connect(self.rec_message, Qt.QueuedConnection)
         self.msgServer = IpcUnixThreadedServer(self.log, self.socketFile)
-        self.msgServer.set_on_recive(self.rec_message)
-        # Sperre für das Zugreifen auf die GUI
-        self.lock = threading.Lock()
+        self.msgServer.set_on_recive(self.messageSignal.emit)
         self.msgServer.start()
         self.infoLabel.setText("bereit für Anwendung...")
         self.timeLabel.setText("--:--")
@@ -195,40 +201,86 @@ class TaskWindow(QMainWindow, TaskWindow_auto.Ui_TaskWindow):
             indicator.setPalette(self.paletteInactiv)
             self.log.debug("key {} released!".format(bcmpin))
 
-    def rec_message(self, msg_str):
+    def rec_message(self, message):
         """
-        Callback für Messageserver
-        :param msg_str: Die Nachricht
+        Slot für Nachrichten vom Messageserver (läuft im GUI Thread)
+        Die Änderungen werden gesammelt und einmal je Frame angewendet
+        :param message: Rahmen (Bytes, DisplayProtocol) oder alte Textnachricht
         :return: None
         """
-        self.log.info("recice: %s" % msg_str)
+        if isinstance(message, bytes):
+            try:
+                update = DisplayProtocol.decode_frame(message)
+            except ValueError as msg:
+                self.log.error("invalid display frame: %s" % msg)
+                return
+        else:
+            update = DisplayProtocol.parse_legacy(message)
+        self.log.info("recice: %s" % update)
+        if not update:
+            return
+        if update.get('quit'):
+            self.__flush_updates()
+            self.quit_app()
+            return
+        if update.get('clear'):
+            # frühere Texte sind mit clear hinfällig, der GPS Zustand nicht
+            self.pendingUpdate = {key: value for key, value in self.pendingUpdate.items() if key == 'lock'}
+        self.pendingUpdate.update(update)
+        if not self.repaintTimer.isActive():
+            self.repaintTimer.start()
+
+    def __flush_updates(self):
+        """
+        privat, gesammelte Änderungen auf einmal anwenden (ein Neuzeichnen)
+        :return: None
+        """
+        self.repaintTimer.stop()
+        update = self.pendingUpdate
+        self.pendingUpdate = {}
+        if not update:
+            return
+        self.setUpdatesEnabled(False)
         try:
-            self.lock.acquire()
-            if self.rxTitle.match(msg_str):
-                kdo, msg = self.rxDP.split(msg_str)
-                self.haedLabel.setText(msg)
-            elif self.rxInfo.match(msg_str):
-                kdo, msg = self.rxDP.split(msg_str)
-                self.infoLabel.setText(msg)
-            elif self.rxClear.match(msg_str):
-                self.haedLabel.setText("IDLE")
-                self.infoLabel.setText("")
-                self.timeLabel.setText("--:--")
-            elif self.rxGpsUnlock.match(msg_str):
-                self.keyWidgetCase.setPalette(self.paletteGpsNoLock)
-                self.gps_is_lock = False
-                self.timeLabel.setText("--:--")
-            elif self.rxGpsLock.match(msg_str):
-                self.keyWidgetCase.setPalette(self.paletteGpsLock)
-                self.gps_is_lock = True
-            elif self.rxGpsUndef.match(msg_str):
-                self.keyWidgetCase.setPalette(self.paletteBackground)
-                self.gps_is_lock = False
-                self.timeLabel.setText("--:--")
-            elif self.rxQuit.match(msg_str):
-                self.quit_app()
+            for field in TaskWindow.FIELD_ORDER:
+                if field in update:
+                    self.commands[field](update[field])
         finally:
-            self.lock.release()
+            self.setUpdatesEnabled(True)
+
+    def __cmd_clear(self, _value):
+        """privat, Anzeige leeren"""
+        self.haedLabel.setText("IDLE")
+        self.infoLabel.setText("")
+        self.timeLabel.setText("--:--")
+
+    def __cmd_lock(self, lock):
+        """
+        privat, GPS Zustand anzeigen
+        :param lock: DisplayProtocol.LOCK_ON, LOCK_OFF oder LOCK_UNDEF
+        """
+        if lock == DisplayProtocol.LOCK_ON:
+            self.keyWidgetCase.setPalette(self.paletteGpsLock)
+            self.gps_is_lock = True
+            return
+        if lock == DisplayProtocol.LOCK_OFF:
+            self.keyWidgetCase.setPalette(self.paletteGpsNoLock)
+        else:
+            self.keyWidgetCase.setPalette(self.paletteBackground)
+        self.gps_is_lock = False
+        self.timeLabel.setText("--:--")
+
+    def __cmd_title(self, title):
+        """privat, Überschrift setzen"""
+        self.haedLabel.setText(title)
+
+    def __cmd_info(self, info):
+        """privat, Infotext setzen"""
+        self.infoLabel.setText(info)
+
+    def __cmd_clock(self, clock):
+        """privat, Uhrzeit setzen ("" == unbekannt)"""
+        self.timeLabel.setText(clock or "--:--")
 
 
 def main():